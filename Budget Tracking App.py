@@ -3,219 +3,51 @@
 # ************ BEGIN ************ #
 
 
-# Import sqlite3 library
+# Import libraries used by the menu and the command line
+import argparse
+import os
 import sqlite3
-
-# Connect to the sqlite database called "expense_tracker.db"
-# Get a cursor object
-conn = sqlite3.connect("expense_tracker.db")
-cursor = conn.cursor()
-
-
-# Create tables if they don't exist
-cursor.execute(
-    """
-    CREATE TABLE IF NOT EXISTS expenses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category_id INTEGER,
-        amount REAL NOT NULL,
-        date DATE NOT NULL,
-        FOREIGN KEY (category_id) REFERENCES categories (id)
-    )
-    """
-)
-
-cursor.execute(
-    """
-    CREATE TABLE IF NOT EXISTS income (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category TEXT NOT NULL,
-        amount REAL NOT NULL,
-        date DATE NOT NULL
-    )
-    """
-)
-
-cursor.execute(
-    """
-    CREATE TABLE IF NOT EXISTS categories (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL UNIQUE
-    )
-    """
-)
-
-cursor.execute(
-    """
-    CREATE TABLE IF NOT EXISTS budgets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category_id INTEGER,
-        budget_amount REAL NOT NULL,
-        FOREIGN KEY (category_id) REFERENCES categories (id)
-    )
-    """
+import sys
+import time
+
+# Import the ledger API
+from budget_tracker import (
+    API_WORKERS,
+    DATABASE_PATH,
+    DEFAULT_CURRENCY,
+    DUPLICATE_MODES,
+    FORECAST_MAX_MONTHS,
+    FORECAST_MIN_MONTHS,
+    IMPORT_CHUNK_SIZE,
+    QUERY_SORT_COLUMNS,
+    STORAGE_PROFILES,
+    BudgetRepository,
+    ConsoleAlertSink,
+    LedgerQuery,
+    LogFileAlertSink,
+    WebhookAlertSink,
+    consolidate_ledgers,
+    consolidated_report_rows,
+    export_consolidated_report,
+    format_money,
+    load_snapshot,
+    parse_amount,
+    print_ledger_rows,
+    serve,
+    summarize_snapshot,
 )
 
-cursor.execute(
-    """
-    CREATE TABLE IF NOT EXISTS financial_goals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        goal_name TEXT NOT NULL,
-        target_amount REAL NOT NULL,
-        progress_amount REAL,
-        date DATE NOT NULL
-    )
-    """
-)
-
-conn.commit()
-
-
-
-# Function to add a new expense category
-# Check if the category already exists
-# Insert a new category into the 'categories' table
-def add_category(name):
-    try:
-        cursor.execute("SELECT id FROM categories WHERE name = ?", (name.lower(),))
-        existing_category = cursor.fetchone()
-
-        if existing_category is None:
-            cursor.execute("INSERT INTO categories (name) VALUES (?)", (name.lower(),))
-            conn.commit()
-            print(f"Category '{name}' added successfully.")
-        else:
-            raise ValueError(f"Category '{name}' already exists.")
-    except ValueError as ve:
-        print(f"Error: {ve}")
-    except sqlite3.Error as se:
-        print(f"SQLite Error: {se}")
-
-
-# Function to add a new expense
-# Insert a new expense into the 'expenses' table
-def add_expense(category_name, amount, date):
-    try:
-        cursor.execute("SELECT id, name FROM categories")
-        categories = cursor.fetchall()
-
-        category_names = [category[1].lower() for category in categories]
-
-        if category_name.lower() in category_names:
-            existing_category_id = next(
-                (category[0] for category in categories if category[1].lower() == category_name.lower()),
-                None
-            )
-            cursor.execute(
-                "INSERT INTO expenses (category_id, amount, date) VALUES (?, ?, ?)",
-                (existing_category_id, amount, date),
-            )
-            conn.commit()
-            print("Expense added successfully.")
-        else:
-            print(f"Category '{category_name}' does not exist. Existing categories: {', '.join(category_names)}")
-
-            print("Existing Categories:")
-            for category in categories:
-                print(category[1])
-
-            add_category_choice = input("Enter 'yes' (case-sensitive) to add or any other key to cancel: ")
-            if add_category_choice.lower() == 'yes':
-                add_category(category_name)
-                add_expense(category_name, amount, date)
-            else:
-                print("Expense not added. Please add the category first.")
-    except ValueError as ve:
-        print(f"Error: {ve}")           
-    except sqlite3.Error as se:
-        print(f"SQLite Error: {se}")
-
-
-# Function to update an expense amount
-def update_expense_amount():
-    try:
-        cursor.execute("SELECT id, amount FROM expenses")
-        expenses = cursor.fetchall()
-
-        if not expenses:
-            print("No expenses found.")
-            return
-        print("\nValid Expenses:")
-        print("{:5} {:10}".format("ID", "Amount"))
-        print("=" *25)
-        for expense in expenses:
-            print("{:5} {:10}".format(expense[0], expense[1]))
-
-        expense_id = input("Enter the ID of the expense to update: ")
 
-        try:
-            expense_id = int(expense_id)
-            new_amount = float(input("Enter the new expense amount: "))
-            cursor. execute(
-                "UPDATE expenses SET amount = ? WHERE id = ?", (new_amount, expense_id)
-            )
-            conn.commit()
-            print("Expense amount updated successfully.")
-        except ValueError as ve:
-            print(f"Error: Invalid input for ID or new amount.")
-    
-    except sqlite3.Error as se:
-        print(f"SQLite Error: {se}")
+# Setting this to any value loads expenses and income into memory for the session
+IN_MEMORY_LEDGER = os.environ.get("BUDGET_TRACKER_IN_MEMORY")
 
-
-# Function to delete an expense category
-def delete_expense_category_from_database(expense_name):
-    cursor.execute("SELECT * FROM expenses")
-    expenses = cursor.fetchall()
-
-    if not expenses:
-        print("No expenses found.")
-        return
-
-    print("Current Expense Categories:")
-    print("{:<5} {:<15}".format("ID", "Expense Name"))
-    print("=" * 25)
-    for expense in expenses:
-        print("{:<5} {:<15}".format(expense[0], expense[1]))
-
-    try:
-        cursor.execute(
-            "DELETE FROM expenses WHERE category_id IN (SELECT id FROM categories WHERE name = ?)",
-            (expense_name,),
-        )
-        cursor.execute("DELETE FROM categories WHERE name = ?", (expense_name,))
-        conn.commit()
-        print(f"Expense '{expense_name}' deleted successfully.")
-    except ValueError as ve:
-        print(f"Error: {ve}")
-    except sqlite3.Error as se:
-        print(f"SQLite Error: {se}")
-
-
-# Function to track pending expenses
-def track_pending_expenses():
-    cursor.execute("SELECT * FROM expenses WHERE amount > 0")
-    pending_expenses = cursor.fetchall()
-
-    if not pending_expenses:
-        print("No pending expenses found.")
-        return
-
-    print("\nPending Expenses:")
-    print("{:<5} {:<15} {:<10} {:<10}".format("ID", "Category", "Amount", "Date"))
-    print("=" * 40)
-
-    for expense in pending_expenses:
-        expense_id, category_id, amount, date = expense
-        cursor.execute("SELECT name FROM categories WHERE id = ?", (category_id,))
-        category_name = cursor.fetchone()[0]
-        print(
-            "{:<5} {:<15} {:<10} {:<10}".format(expense_id, category_name, amount, date)
-        )
+# Setting this to a file path turns instrumentation on and writes the metrics there on exit
+# A path ending in .prom gets Prometheus text, anything else JSON; "-" prints them
+METRICS_PATH = os.environ.get("BUDGET_TRACKER_METRICS")
 
 
 # Function to handle additional expense functionalities
-def additional_expense_options():
+def additional_expense_options(repository):
     print("\nAdditional Expense Options:")
     print("\na. Update Expense Amount")
     print("b. Delete Expense Category from Database")
@@ -224,22 +56,17 @@ def additional_expense_options():
     choice = input("\nEnter your choice (a, b, c, d): ")
 
     if choice == "a":
-        try:
-            expense_name = input("Enter expense name to update: ")
-            new_amount = float(input("Enter new expense amount: "))
-            update_expense_amount(expense_name, new_amount)
-        except ValueError:
-            print("Invalid input. Please enter valid values.")
+        repository.update_expense_amount()
 
     elif choice == "b":
         try:
             expense_name = input("Enter expense name to delete: ")
-            delete_expense_category_from_database(expense_name)
+            repository.delete_expense_category_from_database(expense_name)
         except ValueError:
             print("Invalid input. Please enter a valid expense name.")
 
     elif choice == "c":
-        track_pending_expenses()
+        repository.track_pending_expenses()
     
     elif choice == "d":
         return
@@ -248,363 +75,576 @@ def additional_expense_options():
         print("Invalid choice. Returning to main menu.")
 
 
-# Function to view all expenses
-def view_expenses():
-    print("View Expenses Function Called")
-    cursor.execute("SELECT * FROM expenses")
-    expenses = cursor.fetchall()
-
-    if expenses:
-        print("{:<5} {:<15} {:<10} {:<10}".format("ID", "Category", "Amount", "Date"))
-        print("=" * 40)
-        for expense in expenses:
-            expense_id, category_id, amount, date = expense
-            cursor.execute("SELECT name FROM categories WHERE id = ?", (category_id,))
-            category_name = cursor.fetchone()[0]
-            print(
-                "{:<5} {:<15} {:<10} {:<10}".format(
-                    expense_id, category_name, amount, date
-                )
-            )
-    else:
-        print("No expenses found.")
-    print("View Expenses Function Completed")
+# Function to handle recurring transaction options
+def recurring_options(repository):
+    print("\nRecurring Transactions:")
+    print("\na. Add Recurring Rule")
+    print("b. View Recurring Rules")
+    print("c. Post Due Recurring Entries")
+    print("d. Delete Recurring Rule")
+    print("e. Go Back to Main Menu")
+    choice = input("\nEnter your choice (a, b, c, d, e): ")
 
+    if choice == "a":
+        name = input("Enter rule name (e.g. rent): ")
+        kind = {"e": "expense", "i": "income"}.get(input("Is it an (e)xpense or (i)ncome? ").strip().lower()[:1])
+        category_name = input("Enter category name: ")
+        try:
+            amount = parse_amount(input("Enter amount: "))
+        except ValueError:
+            print("Error: Please enter a valid numeric amount.")
+            return
+        schedule = input("Enter schedule (daily, weekly, monthly or 'day-of-month month day-of-week'): ")
+        start_date = input("Enter first date (YYYY-MM-DD): ")
+        end_date = input("Enter last date (YYYY-MM-DD) or press Enter for none: ").strip()
+        currency = input(f"Enter currency code (blank for {DEFAULT_CURRENCY}): ")
+        repository.add_recurring_rule(name, kind, category_name, amount, schedule, start_date, end_date, currency)
 
-# Function to view expenses by category
-# Display available categories
-# Get user input for the category name
-# Fetch category_id for the given category_name
-# Fetch expenses for the specified category_id
-def view_expenses_by_category():
-    cursor.execute("SELECT name FROM categories")
-    categories = cursor.fetchall()
-
-    print("Available Categories:")
-    for category in categories:
-        print(category[0])
-
-    category_name = input("Enter the name of the category: ")
-
-    cursor.execute("SELECT id FROM categories WHERE name = ?", (category_name,))
-    category_id = cursor.fetchone()
+    elif choice == "b":
+        repository.view_recurring_rules()
 
-    if category_id is not None:
-        cursor.execute(
-            "SELECT * FROM expenses WHERE LOWER(category_id) = LOWER(?)", (category_id[0],)
-        )
-        expenses = cursor.fetchall()
+    elif choice == "c":
+        result = repository.run_recurring_rules()
+        print(f"Posted {result['expenses']} recurring expenses and {result['income']} recurring income entries.")
 
-        if expenses:
-            print(f"\nExpenses for category '{category_name}':")
-            for expense in expenses:
-                expense_id, _, amount, date = expense
-                print(f"ID: {expense_id}, Amount: {amount}, Date: {date}")
+    elif choice == "d":
+        try:
+            rule_id = int(input("Enter the ID of the rule to delete: "))
+        except ValueError:
+            print("Error: Invalid rule ID.")
+            return
+        if repository.delete_recurring_rule(rule_id):
+            print("Recurring rule deleted. Entries it already posted are kept.")
         else:
-            print(f"No expenses found for category '{category_name}'.")
-    else:
-        print(f"Category '{category_name}' not found.")
-
-
-# Function to add income
-def add_income(category_name, amount, date):
-    try:
-        category_name = category_name.lower()
-        cursor.execute(
-            "INSERT INTO income (category, amount, date) VALUES (?, ?, ?)",
-            (category_name, amount, date),
-        )
-        conn.commit()
-        print(
-            f"Income entry of {amount} added successfully for category '{category_name}' on {date}."
-        )
-    except sqlite3.IntegrityError as ie:
-        print(ie)
+            print(f"No recurring rule with ID {rule_id}.")
 
+    elif choice == "e":
+        return
 
-# Function to view all income entries
-def view_income(category_name=None):
-    if category_name:
-        cursor.execute("SELECT * FROM income WHERE LOWER(category) = LOWER(?)", (category_name,))
     else:
-        cursor.execute("SELECT * FROM income")
-
-    income_entries = cursor.fetchall()
+        print("Invalid choice. Returning to main menu.")
 
-    if income_entries:
-        print("{:<5} {:<15} {:<10} {:<10}".format("ID", "Category", "Amount", "Date"))
-        print("=" * 40)
-        for entry in income_entries:
-            income_id, category, amount, date = entry
-            print(
-                "{:<5} {:<15} {:<10} {:<10}".format(income_id, category, amount, date)
-            )
-    else:
-        print("No income entries found.")
 
+# Function to run a command-line subcommand instead of the menu
+def run_command_line(repository, arguments):
+    parser = argparse.ArgumentParser(description="Budget Tracker command line")
+    parser.add_argument("--profile", choices=list(STORAGE_PROFILES), help="Storage profile to use")
+    parser.add_argument("--alerts", action="store_true", help="Print budget alerts as expenses are written")
+    parser.add_argument("--alert-log", help="Append budget alerts to this file as JSON lines")
+    parser.add_argument("--alert-webhook", help="POST budget alerts as JSON to this URL")
+    parser.add_argument(
+        "--metrics", help="Time operations and count their SQL work; write the metrics to this file, or - to print them"
+    )
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], help="Format of --metrics")
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        default=bool(IN_MEMORY_LEDGER),
+        help="Load expenses and income into memory and answer reads from there; on if BUDGET_TRACKER_IN_MEMORY is set",
+    )
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subcommands.add_parser("import", help="Bulk import a CSV or JSONL file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--kind", choices=["expense", "income"], default="expense")
+    import_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    import_parser.add_argument("--no-create-categories", action="store_true")
+    import_parser.add_argument(
+        "--duplicates",
+        choices=DUPLICATE_MODES,
+        default="allow",
+        help="Insert rows that match existing entries anyway, skip them, or insert and report them",
+    )
 
-# Function to view income by category
-def view_income_by_category(category_name):
-    cursor.execute("SELECT * FROM income WHERE LOWER(category) = LOWER(?)", (category_name,))
-    income_entries = cursor.fetchall()
+    subcommands.add_parser("migrate", help="Upgrade the database schema in place")
+    subcommands.add_parser("rebuild-rollup", help="Rebuild the monthly category totals")
+    subcommands.add_parser("check-rollup", help="Check the monthly category totals against the expenses")
+
+    report_parser = subcommands.add_parser("budget-report", help="Show budget vs actual for a month")
+    report_parser.add_argument("--month", help="Month as YYYY-MM, defaults to this month")
+    report_parser.add_argument("--currency", help=f"Currency of the budgets, defaults to {DEFAULT_CURRENCY}")
+
+    serve_parser = subcommands.add_parser("serve", help="Serve the ledger as an HTTP/JSON API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--workers", type=int, default=API_WORKERS)
+    serve_parser.add_argument("--instrument", action="store_true", help="Serve the pool's metrics at GET /metrics")
+
+    subcommands.add_parser("goals", help="Show progress, required monthly rate and ETA of every goal")
+    subcommands.add_parser("refresh-goals", help="Recompute the progress of linked goals from the ledger")
+    subcommands.add_parser("check-goals", help="Check the progress of linked goals against the ledger")
+
+    query_parser = subcommands.add_parser("query", help="List expenses or income matching several filters")
+    query_parser.add_argument("--kind", choices=["expense", "income"], default="expense")
+    query_parser.add_argument("--from", dest="start", help="First date to include (YYYY-MM-DD)")
+    query_parser.add_argument("--to", dest="end", help="Last date to include (YYYY-MM-DD)")
+    query_parser.add_argument("--category", action="append", help="Category to include; repeat for several")
+    query_parser.add_argument("--min", type=parse_amount, help="Smallest amount to include, in --currency")
+    query_parser.add_argument("--max", type=parse_amount, help="Largest amount to include, in --currency")
+    query_parser.add_argument("--sort", choices=QUERY_SORT_COLUMNS, default="date")
+    query_parser.add_argument("--desc", action="store_true", help="Sort newest or largest first")
+    query_parser.add_argument("--limit", type=int)
+    query_parser.add_argument(
+        "--currency", help=f"Only entries in this currency; --min and --max default it to {DEFAULT_CURRENCY}"
+    )
 
-    if income_entries:
-        print("{:<5} {:<15} {:<10} {:<10}".format("ID", "Category", "Amount", "Date"))
-        print("=" * 40)
-        for entry in income_entries:
-            income_id, category, amount, date = entry
-            print("{:<5} {:<15} {:<10} {:<10}".format(income_id, category, amount, date))
-    else:
-        print("No income entries found for category '{}'.".fomat(category_name))
-        
+    export_parser = subcommands.add_parser("export-snapshot", help="Export expenses and income as a columnar snapshot")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
 
-# Function to set budget for a catagory
-def set_budget(category_name, budget_amount):
-    try:
-        category_name = category_name.lower()
-        cursor.execute(
-            "INSERT OR REPLACE INTO budgets (category_id, budget_amount) VALUES ((SELECT id FROM categories WHERE LOWER(name) = LOWER(?)), ?)",
-            (category_name, budget_amount),
-        )
-        conn.commit()
-        print(
-            f"Budget of {budget_amount} set successfully for category '{category_name}'."
-        )
-    except sqlite3.Error as se:
-        print(f"SQLite Error: {se}")
+    summary_parser = subcommands.add_parser(
+        "snapshot-summary", help="Total a columnar snapshot by category and month"
+    )
+    summary_parser.add_argument("directory")
+    summary_parser.add_argument("--table", choices=["expenses", "income"], default="expenses")
+    summary_parser.add_argument("--currency", default=DEFAULT_CURRENCY)
+
+    recurring_parser = subcommands.add_parser("add-recurring", help="Add a recurring expense or income rule")
+    recurring_parser.add_argument("name")
+    recurring_parser.add_argument("--kind", choices=["expense", "income"], default="expense")
+    recurring_parser.add_argument("--category", required=True)
+    recurring_parser.add_argument("--amount", type=parse_amount, required=True)
+    recurring_parser.add_argument(
+        "--schedule", default="monthly", help="daily, weekly, monthly or 'day-of-month month day-of-week'"
+    )
+    recurring_parser.add_argument("--start", required=True, help="First date of the rule (YYYY-MM-DD)")
+    recurring_parser.add_argument("--end", help="Last date of the rule (YYYY-MM-DD)")
+    recurring_parser.add_argument("--currency")
 
+    subcommands.add_parser("recurring", help="List the recurring rules")
 
-# Function to view budget for a category
-def view_budget(category_name):
-    category_name = category_name.lower()
-    cursor.execute(
-        "SELECT budget_amount FROM budgets WHERE category_id = (SELECT id FROM categories WHERE name = ?)",
-        (category_name,),
+    run_recurring_parser = subcommands.add_parser(
+        "run-recurring", help="Post every occurrence of the recurring rules that is due"
     )
-    budget_amount = cursor.fetchone()
-
-    if budget_amount is not None:
-        print(f"The budget for category '{category_name}' is: {budget_amount[0]}")
-    else:
-        print(
-            f"Budget not set for category '{category_name}'. Please consider setting a budget for better financial management."
-        )
+    run_recurring_parser.add_argument("--today", help="Post occurrences up to this date (YYYY-MM-DD)")
 
+    subcommands.add_parser("memory-report", help="Load the ledger into memory and report its size per row")
 
-# Function to set financial goals
-def set_financial_goals(goal_name, target_amount, date):
-    progress_amount = 0
-    cursor.execute(
-        "INSERT INTO financial_goals (goal_name, target_amount, progress_amount, date) VALUES (?, ?, ?, ?)",
-        (goal_name, target_amount, progress_amount, date),
+    consolidate_parser = subcommands.add_parser(
+        "consolidate", help="Total every ledger file in a directory per category and month, in parallel"
     )
-    conn.commit()
-    print(
-        f"Financial goal '{goal_name}' of {target_amount} set successfully. Target date: {date}."
+    consolidate_parser.add_argument("directory")
+    consolidate_parser.add_argument("--pattern", default="*.db", help="Ledger file names to include")
+    consolidate_parser.add_argument("--workers", type=int, help="Worker processes, defaults to the number of CPUs")
+    consolidate_parser.add_argument("--month", help="Only report this month, as YYYY-MM")
+    consolidate_parser.add_argument("--output", help="Write the report to this .csv or .json file instead of printing it")
+
+    forecast_parser = subcommands.add_parser("forecast", help="Project the balance and every category ahead")
+    forecast_parser.add_argument(
+        "--months", type=int, default=6, help=f"Months ahead, {FORECAST_MIN_MONTHS} to {FORECAST_MAX_MONTHS}"
     )
+    forecast_parser.add_argument("--currency", help=f"Currency to forecast, defaults to {DEFAULT_CURRENCY}")
+    forecast_parser.add_argument("--daily", action="store_true", help="Print the projected balance of every day")
 
+    duplicates_parser = subcommands.add_parser("duplicates", help="Find identical entries already in the ledger")
+    duplicates_parser.add_argument("--kind", choices=["expense", "income"], default="expense")
+    duplicates_parser.add_argument("--delete", action="store_true", help="Delete all but the first entry of each group")
 
-# Function to view progress towards financial goals
-def view_progress_towards_goals():
-    cursor.execute("SELECT DISTINCT * FROM financial_goals")
-    goals = cursor.fetchall()
-
-    if not goals:
-        print("No goals in progress.")
-        return
+    archive_parser = subcommands.add_parser(
+        "archive", help="Move closed years out of the live tables into one archive file per year"
+    )
+    archive_parser.add_argument(
+        "--before", type=int, default=int(time.strftime("%Y")), help="Archive every year before this one"
+    )
 
-    for goal in goals:
+    subcommands.add_parser("archives", help="List the archived years")
+    subcommands.add_parser("compact-archives", help="VACUUM the archive files and the live ledger")
+
+    args = parser.parse_args(arguments)
+    if args.profile:
+        repository.storage_profile = args.profile
+    alert_sinks = []
+    if args.alerts:
+        alert_sinks.append(ConsoleAlertSink())
+    if args.alert_log:
+        alert_sinks.append(LogFileAlertSink(args.alert_log))
+    if args.alert_webhook:
+        alert_sinks.append(WebhookAlertSink(args.alert_webhook))
+    if alert_sinks:
+        repository.enable_budget_alerts(alert_sinks)
+    if args.metrics:
+        repository.enable_profiling(args.metrics, args.metrics_format)
+    if args.in_memory and repository.memory is None:
+        try:
+            repository.enable_memory_mode()
+        except ImportError:
+            print("Error: The in-memory ledger needs NumPy. Install it with 'pip install numpy'.")
+            return 1
+
+    if args.command == "import":
+        result = repository.bulk_import(
+            args.path, args.kind, args.chunk_size, not args.no_create_categories, args.duplicates
+        )
         print(
-            f"Goal Name: {goal[1]}, Target Amount: {goal[2]}, Progress Amount: {goal[3]}, Date: {goal[4]}"
+            f"Imported {result['rows']} {args.kind} rows ({result['skipped']} skipped) "
+            f"in {result['seconds']:.2f}s: {result['rows_per_sec']:.0f} rows/sec."
         )
-
-
-# Add sample data
-def add_sample_data():
-    cursor.execute("SELECT COUNT(*) FROM categories WHERE name IN ('utilities', 'salary')")
-    existing_category_count = cursor.fetchone()[0]
-
-    if existing_category_count < 2:
-        cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES ('utilities')")
-        cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES ('salary')")
-        conn.commit() 
-
-    def insert_category(name):
-        cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (name.lower(),))
-    
-    def insert_expense(category_name, amount, date):
-        category_name = category_name.lower()
-        cursor.execute("SELECT id FROM categories WHERE name = ?", (category_name,))
-        category_id = cursor.fetchone()
-
-        if category_id is not None:
-            cursor.execute(
-                "INSERT OR IGNORE INTO expenses (category_id, amount, date) VALUES (?, ?, ?)",
-                (category_id[0], amount, date),
-            )
-    
-    def insert_income(category_name, amount, date):
-        category_name = category_name.lower()
-        cursor.execute(
-            "INSERT OR IGNORE INTO income (category, amount, date) VALUES (?, ?, ?)",
-            (category_name, amount, date),
+        if args.duplicates != "allow" and result["duplicates"]:
+            action = "skipped" if args.duplicates == "skip" else "imported and flagged"
+            rows = ", ".join(str(number) for number in result["duplicate_rows"][:20])
+            more = " ..." if result["duplicates"] > 20 else ""
+            print(f"{result['duplicates']} rows matched existing entries and were {action}: rows {rows}{more}")
+    elif args.command == "migrate":
+        print(f"Database schema is at version {repository.migrate_database()}.")
+    elif args.command == "rebuild-rollup":
+        print(f"Rebuilt {repository.rebuild_monthly_totals()} monthly category totals.")
+    elif args.command == "check-rollup":
+        mismatches = repository.check_monthly_totals()
+        for category_id, month, currency, rollup_total, actual_total in mismatches:
+            print(f"Category {category_id} {month} {currency}: rollup {rollup_total}, expenses {actual_total}")
+        if mismatches:
+            print(f"{len(mismatches)} monthly totals are out of date. Run 'rebuild-rollup' to fix them.")
+            return 1
+        print("Monthly category totals are consistent.")
+    elif args.command == "budget-report":
+        repository.view_budget_report(args.month, args.currency)
+    elif args.command == "serve":
+        repository.close()
+        serve(repository.path, args.host, args.port, args.workers, alert_sinks, args.instrument)
+    elif args.command == "goals":
+        repository.view_progress_towards_goals()
+    elif args.command == "refresh-goals":
+        print(f"Refreshed the progress of {repository.refresh_goal_progress()} linked goals.")
+    elif args.command == "check-goals":
+        mismatches = repository.check_goal_progress()
+        for goal_id, stored, actual in mismatches:
+            print(f"Goal {goal_id}: stored progress {stored}, ledger {actual}")
+        if mismatches:
+            print(f"{len(mismatches)} goals are out of date. Run 'refresh-goals' to fix them.")
+            return 1
+        print("Linked goal progress is consistent.")
+    elif args.command == "query":
+        query = LedgerQuery(args.kind).between(args.start, args.end)
+        if args.currency:
+            query.in_currency(args.currency)
+        query.amount_between(args.min, args.max)
+        if args.category:
+            query.in_categories(*args.category)
+        query.order_by(args.sort, args.desc)
+        if args.limit is not None:
+            query.limit(args.limit)
+        print_ledger_rows(repository.run_query(query), "No matching entries found.")
+    elif args.command == "export-snapshot":
+        try:
+            manifest = repository.export_snapshot(args.directory, args.chunk_size)
+        except ImportError:
+            print("Error: Snapshots need NumPy. Install it with 'pip install numpy'.")
+            return 1
+        for table, details in manifest["tables"].items():
+            print(f"{table}: {details['rows']} rows, {len(details['categories'])} categories")
+        print(f"Snapshot written to {args.directory} in {manifest['seconds']:.2f}s.")
+    elif args.command == "snapshot-summary":
+        try:
+            summary = summarize_snapshot(load_snapshot(args.directory), args.table, args.currency)
+        except ImportError:
+            print("Error: Snapshots need NumPy. Install it with 'pip install numpy'.")
+            return 1
+        except (OSError, ValueError) as error:
+            print(f"Error: Could not read the snapshot: {error}")
+            return 1
+        print("{:<15} {:<8} {:>15}".format("Category", "Month", f"Total {args.currency.upper()}"))
+        print("=" * 40)
+        for name in sorted(summary):
+            for month, total in sorted(summary[name].items()):
+                print("{:<15} {:<8} {:>15}".format(name, month, format_money(total, args.currency)))
+    elif args.command == "add-recurring":
+        repository.add_recurring_rule(
+            args.name, args.kind, args.category, args.amount, args.schedule, args.start, args.end, args.currency
         )
+    elif args.command == "recurring":
+        repository.view_recurring_rules()
+    elif args.command == "run-recurring":
+        import datetime
 
-    def insert_budget(category_name, budget_amount):
-        category_name = category_name.lower()
-        cursor.execute(
-            "INSERT OR IGNORE INTO budgets (category_id, budget_amount) VALUES ((SELECT id FROM categories WHERE name = ?), ?)",
-            (category_name, budget_amount),
+        try:
+            today = datetime.date.fromisoformat(args.today) if args.today else None
+        except ValueError:
+            print("Error: --today must be a date in YYYY-MM-DD format.")
+            return 1
+        result = repository.run_recurring_rules(today)
+        print(
+            f"Caught up {result['rules']} recurring rules: {result['expenses']} expenses and "
+            f"{result['income']} income entries posted in {result['seconds']:.2f}s."
         )
-    
-    def insert_goal(goal_name, target_amount, date):
-        goal_name_lower = goal_name.lower()
-
-        cursor.execute(
-            "SELECT COUNT(*) FROM financial_goals WHERE goal_name = ?", (goal_name_lower,)
+    elif args.command == "memory-report":
+        try:
+            memory = repository.memory or repository.enable_memory_mode()
+        except ImportError:
+            print("Error: The in-memory ledger needs NumPy. Install it with 'pip install numpy'.")
+            return 1
+        print("{:<8} {:>10} {:>12} {:>12} {:>12} {:>10}".format("Table", "Rows", "Columns KB", "Used KB", "Strings KB", "Bytes/row"))
+        for kind, details in memory.memory_report().items():
+            print(
+                "{:<8} {:>10} {:>12.0f} {:>12.0f} {:>12.0f} {:>10.1f}".format(
+                    kind,
+                    details["rows"],
+                    details["columns"] / 1024,
+                    details["used"] / 1024,
+                    details["interned"] / 1024,
+                    details["bytes_per_row"],
+                )
+            )
+        print(f"Loaded in {memory.stats['load_seconds']:.2f}s.")
+    elif args.command == "consolidate":
+        report = consolidate_ledgers(args.directory, args.workers, args.pattern)
+        for path, error in report["failed"]:
+            print(f"Skipped {path}: {error}")
+        if args.output:
+            written = export_consolidated_report(report, args.output, args.month)
+            print(f"Wrote {written} rows to {args.output}.")
+        else:
+            row_format = "{:<8} {:<15} {:<8} {:<4} {:>14} {:>8} {:>8} {:>14} {:>7} {:<4}"
+            print(
+                row_format.format(
+                    "Kind", "Category", "Month", "Cur", "Total", "Entries", "Ledgers", "Budget", "Used %", ""
+                )
+            )
+            print("=" * 100)
+            for kind, category, month, currency, total, entries, ledgers, budget, percent_used in (
+                consolidated_report_rows(report, args.month)
+            ):
+                print(
+                    row_format.format(
+                        kind,
+                        category,
+                        month,
+                        currency,
+                        format_money(total, currency),
+                        entries,
+                        ledgers,
+                        "-" if budget is None else format_money(budget, currency),
+                        "-" if percent_used is None else f"{percent_used:.0f}%",
+                        "OVER" if budget and total > budget else "",
+                    )
+                )
+        print(
+            f"Consolidated {report['ledgers']} of {report['files']} ledgers with {report['workers']} workers "
+            f"in {report['seconds']:.2f}s."
         )
-        goal_exists = cursor.fetchone()[0] > 0
-
-        if not goal_exists:
-            cursor.execute(
-                "INSERT INTO financial_goals (goal_name, target_amount, progress_amount, date) VALUES (?, ?, 0, ?)",
-                (goal_name, target_amount, date),
+    elif args.command == "forecast":
+        repository.view_cash_flow_forecast(args.months, args.currency, args.daily)
+    elif args.command == "duplicates":
+        if args.delete:
+            print(f"Deleted {repository.remove_duplicates(args.kind)} duplicate {args.kind} entries.")
+            return 0
+        groups = repository.find_duplicates(args.kind)
+        if not groups:
+            print(f"No duplicate {args.kind} entries found.")
+            return 0
+        print("{:<30} {:<15} {:>12} {:<8} {:<10} {}".format("IDs", "Category", "Amount", "Currency", "Date", "Reference"))
+        for ids, category, amount, currency, date, reference in groups:
+            id_list = ", ".join(str(row_id) for row_id in ids)
+            print(
+                "{:<30} {:<15} {:>12} {:<8} {:<10} {}".format(
+                    id_list, category, format_money(amount, currency), currency, date, reference or ""
+                )
             )
-    insert_goal("vacation", 15000.0, "2024-06-30")
-
-    insert_expense("utilities", 1200.0, "2024-01-19")
-    insert_income("salary", 45000.0, "2024-01-25")
-
-    insert_category("groceries")
-    insert_category("entertainment")
-
-    insert_budget("groceries", 3000.00)
-    insert_budget("entertainment", 1500.0)
-
-    conn.commit()
-
+        print(f"{len(groups)} groups, {sum(len(ids) - 1 for ids, *_ in groups)} extra entries.")
+    elif args.command == "archive":
+        try:
+            results = repository.archive_years(args.before)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 1
+        for year, expense_rows, income_rows in results:
+            print(f"{year}: archived {expense_rows} expenses and {income_rows} income entries.")
+        if not results:
+            print(f"Nothing dated before {args.before} is left in the live tables.")
+    elif args.command == "archives":
+        archives = repository.list_archives()
+        if not archives:
+            print("No archived years.")
+        print("{:<6} {:<30} {:>10} {:>10} {:>10}  {}".format("Year", "File", "Expenses", "Income", "Size KB", "Archived"))
+        for year, path, expense_rows, income_rows, archived_at, size in archives:
+            size = "missing" if size is None else f"{size / 1024:.0f}"
+            print("{:<6} {:<30} {:>10} {:>10} {:>10}  {}".format(year, path, expense_rows, income_rows, size, archived_at))
+    elif args.command == "compact-archives":
+        for path, before, after in repository.compact_archives():
+            print(f"{os.path.basename(path)}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+    return 0
 
 
 # Display menu options to user
 # Proceed based on user input
 # Close database connection when exiting program
-print("\n*** Welcome to the Budget Tracker! ***")
-try:
-    add_sample_data()
-    while True:
-        print("\nExpense Tracker Menu:")
-        print("\n1.  Add Expense")
-        print("2.  View Expenses")
-        print("3.  View Expenses by Category")
-        print("4.  Add Income")
-        print("5.  View Income")
-        print("6.  View Income by Category")
-        print("7.  Set Budget for a Category")
-        print("8.  View Budget for a Category")
-        print("9.  Set Financial Goals")
-        print("10. View Progress towards Financial Goals")
-        print("11. Add New Category")
-        print("12. Quit")
-
-        choice = input("\nEnter your choice: ")
-
-        if choice == "1":
-            category_name = input("Enter category name: ")
-            amount = float(input("Enter expense amount: "))
-            date = input("Enter expense date (YYYY-MM-DD): ")
-
-            try:
-                amount = float(amount)
-                add_expense(category_name, amount, date)
-                additional_expense_options()
-            except ValueError:
-                print("Error: Please enter a valid numeric amount.")
-
-        elif choice == "2":
-            try:
-                view_expenses()
-            except sqlite3.Error as se:
-                print(f"SQLite Error: {se}")
-            additional_expense_options()
-
-        elif choice == "3":
-            view_expenses_by_category()
-
-        elif choice == "4":
-            category_name = input("Enter category name: ")
-            amount = float(input("Enter income amount: "))
-            date = input("Enter income date (YYYY-MM-DD): ")
-
-            try:
-                add_expense(category_name, amount, date)
-                additional_expense_options()
-            except ValueError:
-                print("Error: Please enter a valid numeric amount.")
-
-        elif choice == "5":
-            print("\nView Income Options:")
-            print("a. View all income")
-            print("b. View income by category")
-            view_income_choice = input("\nEnter your choice (a, b): ")
-
-            if view_income_choice == "a":
-                view_income()
-            elif view_income_choice == "b":
-                cursor.execute("SELECT name FROM categories")
-                categories = cursor.fetchall()
-
-                print("\nAvailable Categories:")
-                for category in categories:
-                    print(category[0])
-
-                category_name = input("Enter the name of the category: ")
-                view_income(category_name)
-            else:
-                print("Invalid choice. Returning to main menu.")
-
-        elif choice == "6":
-            category_name = input("Enter category name: ")
-            view_income_by_category(category_name)
-
-        elif choice == "7":
-            category_name = input("Enter category name: ")
-            budget_amount = float(input("Enter budget amount: "))
-            set_budget(category_name, budget_amount)
-
-        elif choice == "8":
-            category_name = input("Enter category name: ")
-            view_budget(category_name)
-
-        elif choice == "9":
-            goal_name = input("Enter financial goal name: ")
-            target_amount = float(input("Enter target amount for the goal: "))
-            date = input("Enter goal date (YYYY-MM-DD): ")
-            set_financial_goals(goal_name, target_amount, date)
+def run_menu(repository):
+    print("\n*** Welcome to the Budget Tracker! ***")
+    try:
+        repository.add_sample_data()
+        repository.enable_budget_alerts([ConsoleAlertSink()])
+        caught_up = repository.run_recurring_rules()
+        if caught_up["expenses"] or caught_up["income"]:
             print(
-                f"Financial goal '{goal_name}' successfully added with a target amount of {target_amount} on {date}."
+                f"Posted {caught_up['expenses']} recurring expenses and {caught_up['income']} recurring income entries."
             )
+        while True:
+            print("\nExpense Tracker Menu:")
+            print("\n1.  Add Expense")
+            print("2.  View Expenses")
+            print("3.  View Expenses by Category")
+            print("4.  Add Income")
+            print("5.  View Income")
+            print("6.  View Income by Category")
+            print("7.  Set Budget for a Category")
+            print("8.  View Budget for a Category")
+            print("9.  Set Financial Goals")
+            print("10. View Progress towards Financial Goals")
+            print("11. Add New Category")
+            print("12. Budget vs Actual Report")
+            print("13. Search Expenses and Income")
+            print("14. Recurring Transactions")
+            print("15. Cash Flow Forecast")
+            print("16. Quit")
+
+            choice = input("\nEnter your choice: ")
+
+            if choice == "1":
+                category_name = input("Enter category name: ")
+                amount = input("Enter expense amount: ")
+                date = input("Enter expense date (YYYY-MM-DD): ")
+                currency = input(f"Enter currency code (blank for {DEFAULT_CURRENCY}): ")
+
+                try:
+                    amount = parse_amount(amount)
+                    repository.add_expense(category_name, amount, date, currency)
+                    additional_expense_options(repository)
+                except ValueError:
+                    print("Error: Please enter a valid numeric amount.")
+
+            elif choice == "2":
+                try:
+                    repository.view_expenses()
+                except sqlite3.Error as se:
+                    print(f"SQLite Error: {se}")
+                additional_expense_options(repository)
+
+            elif choice == "3":
+                repository.view_expenses_by_category()
+
+            elif choice == "4":
+                category_name = input("Enter category name: ")
+                amount = input("Enter income amount: ")
+                date = input("Enter income date (YYYY-MM-DD): ")
+                currency = input(f"Enter currency code (blank for {DEFAULT_CURRENCY}): ")
+
+                try:
+                    repository.add_income(category_name, parse_amount(amount), date, currency)
+                except ValueError:
+                    print("Error: Please enter a valid numeric amount.")
+
+            elif choice == "5":
+                print("\nView Income Options:")
+                print("a. View all income")
+                print("b. View income by category")
+                view_income_choice = input("\nEnter your choice (a, b): ")
+
+                if view_income_choice == "a":
+                    repository.view_income()
+                elif view_income_choice == "b":
+                    print("\nAvailable Categories:")
+                    for name in repository.get_category_names():
+                        print(name)
+
+                    category_name = input("Enter the name of the category: ")
+                    repository.view_income(category_name)
+                else:
+                    print("Invalid choice. Returning to main menu.")
+
+            elif choice == "6":
+                category_name = input("Enter category name: ")
+                repository.view_income_by_category(category_name)
+
+            elif choice == "7":
+                category_name = input("Enter category name: ")
+                budget_amount = parse_amount(input("Enter budget amount: "))
+                repository.set_budget(category_name, budget_amount)
+
+            elif choice == "8":
+                category_name = input("Enter category name: ")
+                repository.view_budget(category_name)
+
+            elif choice == "9":
+                goal_name = input("Enter financial goal name: ")
+                target_amount = parse_amount(input("Enter target amount for the goal: "))
+                date = input("Enter goal date (YYYY-MM-DD): ")
+                link = input("Track progress from (e)xpenses, (i)ncome, or leave blank: ").strip().lower()
+                kind = {"e": "expense", "i": "income"}.get(link[:1])
+                category_name = start_date = None
+                if kind:
+                    category_name = input(f"Enter the {kind} category to track: ")
+                    start_date = input("Count entries from (YYYY-MM-DD, blank for today): ").strip() or None
+                repository.set_financial_goals(goal_name, target_amount, date, kind, category_name, start_date)
+
+            elif choice == "10":
+                repository.view_progress_towards_goals()
+
+            elif choice == "11":
+                new_category_name = input("Enter new category name: ")
+                repository.add_category(new_category_name)
+                print(f"Category '{new_category_name}' added successfully.")
+
+            elif choice == "12":
+                month = input("Enter month (YYYY-MM) or press Enter for this month: ").strip()
+                repository.view_budget_report(month or None)
+
+            elif choice == "13":
+                repository.search_ledger()
+
+            elif choice == "14":
+                recurring_options(repository)
+
+            elif choice == "15":
+                months = input(
+                    f"Enter months ahead ({FORECAST_MIN_MONTHS}-{FORECAST_MAX_MONTHS}) or press Enter for 6: "
+                ).strip()
+                try:
+                    repository.view_cash_flow_forecast(int(months) if months else 6)
+                except ValueError:
+                    print("Error: Please enter a whole number of months.")
+
+            elif choice == "16":
+                print("Goodbye, remember to budget!")
+                break
 
-        elif choice == "10":
-            view_progress_towards_goals()
-        
-        elif choice == "11":
-            new_category_name = input("Enter new category name: ")
-            add_category(new_category_name)
-            print(f"Category '{new_category_name}' added successfully.")
+            else:
+                print("Invalid choice. Please try again.")
 
-        elif choice == "12":
-            print("Goodbye, remember to budget!")
-            break
 
-        else:
-            print("Invalid choice. Please try again.")
+    except Exception as e:
+        print(f"An error occured: {e}")
 
+    finally:
+        repository.close()
+        print("Database connection closed.")
 
-except Exception as e:
-    print(f"An error occured: {e}")
 
-finally:
-    conn.close()
-    print("Database connection closed.")
+# Run a command-line subcommand when one is given, otherwise the menu
+# BUDGET_TRACKER_METRICS turns instrumentation on for the menu as well, and
+# BUDGET_TRACKER_IN_MEMORY answers its reads from the in-memory ledger
+def main(arguments=None):
+    arguments = sys.argv[1:] if arguments is None else arguments
+    repository = BudgetRepository(DATABASE_PATH)
+    if METRICS_PATH:
+        repository.enable_profiling(METRICS_PATH)
+    try:
+        # The command line opens the ledger only after it has applied --profile
+        if arguments:
+            return run_command_line(repository, arguments)
+        if IN_MEMORY_LEDGER:
+            try:
+                repository.enable_memory_mode()
+            except ImportError:
+                print("Error: The in-memory ledger needs NumPy. Install it with 'pip install numpy'.")
+                return 1
+        run_menu(repository)
+        return 0
+    finally:
+        repository.close()
+        if repository.profiler is not None:
+            repository.profiler.write()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
 
 # ****************** END OF CODE ********************* #
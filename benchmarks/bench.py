@@ -0,0 +1,1610 @@
+# Benchmarks and self-checks for the budget_tracker package
+# Run them from anywhere, for example:
+#   python benchmarks/bench.py suite --rows 100000 --output results.json
+#   python benchmarks/bench.py compare baseline.json results.json
+# Every benchmark works on scratch ledgers that scratch_ledger() makes in a
+# temporary directory; --ledger runs the suite on a copy of an existing one
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import itertools
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Import the ledger API from the repository root this script lives in
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from budget_tracker import (
+    DEFAULT_CURRENCY,
+    IMPORT_CHUNK_SIZE,
+    STORAGE_PROFILES,
+    BudgetRepository,
+    HttpError,
+    LedgerPool,
+    LedgerQuery,
+    LedgerServer,
+    LogFileAlertSink,
+    consolidate_ledgers,
+    consolidated_report_rows,
+    format_money,
+    load_snapshot,
+    read_http_request,
+    recurring_occurrences,
+    send_json,
+    summarize_snapshot,
+)
+
+
+
+# Category names used by the synthetic ledger generator, most common first
+# Ledgers with more expense categories get numbered names for the rest
+SYNTHETIC_EXPENSE_CATEGORIES = (
+    "groceries",
+    "rent",
+    "utilities",
+    "transport",
+    "dining",
+    "entertainment",
+    "health",
+    "insurance",
+    "clothing",
+    "travel",
+    "education",
+    "gifts",
+)
+
+SYNTHETIC_INCOME_CATEGORIES = ("salary", "freelance", "interest", "dividends", "refunds")
+
+
+
+# Function to fill a new ledger file with a reproducible synthetic history
+# Entries are spread evenly over `years` whole years ending with end_year and
+# written in date order, the way a real ledger grows. Categories are drawn
+# from a Zipf-like distribution with exponent skew, so a few categories hold
+# most rows, and amounts vary log-normally around a typical amount per category
+# Every expense category gets a budget close to its typical monthly spend and
+# two goals are linked to the largest expense and income categories
+# The same arguments always give the same ledger
+# Returns the row counts and load time
+def generate_synthetic_ledger(
+    path,
+    expenses=100000,
+    income=None,
+    categories=len(SYNTHETIC_EXPENSE_CATEGORIES),
+    years=3,
+    skew=1.1,
+    seed=2024,
+    end_year=2024,
+    chunk_size=IMPORT_CHUNK_SIZE,
+):
+    import datetime
+    import random
+
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        raise ValueError(f"'{path}' already exists. Synthetic ledgers are only written to new files.")
+    if expenses < 0 or categories < 1 or years < 1:
+        raise ValueError("Expenses must not be negative and categories and years must be at least 1.")
+    income = expenses // 20 if income is None else income
+
+    rng = random.Random(seed)
+    first_day = datetime.date(end_year - years + 1, 1, 1).toordinal()
+    day_count = datetime.date(end_year, 12, 31).toordinal() - first_day + 1
+    dates = [datetime.date.fromordinal(first_day + offset).isoformat() for offset in range(day_count)]
+    multipliers = [rng.lognormvariate(0, 0.5) for _ in range(4096)]
+    average_multiplier = sum(multipliers) / len(multipliers)
+
+    # Typical amounts are in minor units
+    expense_names = [
+        SYNTHETIC_EXPENSE_CATEGORIES[number] if number < len(SYNTHETIC_EXPENSE_CATEGORIES) else f"category {number}"
+        for number in range(categories)
+    ]
+    expense_weights = [1 / rank ** skew for rank in range(1, categories + 1)]
+    expense_typical = [rng.randint(500, 20000) for _ in range(categories)]
+    income_weights = [1 / rank ** skew for rank in range(1, len(SYNTHETIC_INCOME_CATEGORIES) + 1)]
+    income_typical = [rng.randint(50000, 500000) for _ in SYNTHETIC_INCOME_CATEGORIES]
+
+    repository = BudgetRepository(path, profile="fast")
+    start = time.perf_counter()
+    with repository.write_transaction():
+        category_ids = [repository.record_category(name) for name in expense_names]
+        months = years * 12
+        total_weight = sum(expense_weights)
+        repository.cursor.executemany(
+            "INSERT INTO budgets (category_id, budget_amount, currency) VALUES (?, ?, ?)",
+            [
+                (
+                    category_id,
+                    int(round(expenses / months * weight / total_weight * typical * average_multiplier, -2)),
+                    DEFAULT_CURRENCY,
+                )
+                for category_id, weight, typical in zip(category_ids, expense_weights, expense_typical)
+            ],
+        )
+
+    tables = (
+        ("expenses", expenses, category_ids, expense_weights, expense_typical, "category_id"),
+        ("income", income, SYNTHETIC_INCOME_CATEGORIES, income_weights, income_typical, "category"),
+    )
+    for table, rows, keys, weights, typical, key_column in tables:
+        cumulative_weights = list(itertools.accumulate(weights))
+        for offset in range(0, rows, chunk_size):
+            count = min(chunk_size, rows - offset)
+            picks = rng.choices(range(len(keys)), cum_weights=cumulative_weights, k=count)
+            scales = rng.choices(multipliers, k=count)
+            values = [
+                (keys[pick], max(int(typical[pick] * scale), 1), DEFAULT_CURRENCY, dates[row * day_count // rows])
+                for row, pick, scale in zip(range(offset, offset + count), picks, scales)
+            ]
+            with repository.write_transaction():
+                repository.cursor.executemany(
+                    f"INSERT INTO {table} ({key_column}, amount, currency, date) VALUES (?, ?, ?, ?)", values
+                )
+    load_seconds = time.perf_counter() - start
+
+    for kind, name, typical, rows in (
+        ("expense", expense_names[0], expense_typical[0], expenses),
+        ("income", SYNTHETIC_INCOME_CATEGORIES[0], income_typical[0], income),
+    ):
+        repository.record_goal(
+            f"synthetic {kind} goal",
+            format_money(max(int(rows * typical * average_multiplier), 100)),
+            dates[-1],
+            kind,
+            name,
+            dates[0],
+        )
+    repository.close()
+
+    return {
+        "path": str(path),
+        "expenses": expenses,
+        "income": income,
+        "categories": categories,
+        "first_date": dates[0],
+        "last_date": dates[-1],
+        "seed": seed,
+        "seconds": load_seconds,
+        "rows_per_sec": (expenses + income) / load_seconds if load_seconds > 0 else 0.0,
+    }
+
+
+
+# Function to copy a ledger file and its yearly archives into another directory
+# Uses the SQLite online backup, so a ledger that is in use is copied consistently
+# Returns the path of the copy, which keeps the file name of the original
+def copy_ledger(path, directory):
+    folder = os.path.dirname(os.path.abspath(path))
+    names = [os.path.basename(path)]
+    source = sqlite3.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        names += [row[0] for row in source.execute("SELECT path FROM archives")]
+    except sqlite3.OperationalError:
+        # Ledger without archives, or one that was never migrated
+        pass
+    finally:
+        source.close()
+
+    for name in names:
+        source = sqlite3.connect(pathlib.Path(folder, name).resolve().as_uri() + "?mode=ro", uri=True)
+        destination = sqlite3.connect(os.path.join(directory, os.path.basename(name)))
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+    return os.path.join(directory, names[0])
+
+
+
+# Function to give a benchmark a ledger path in a new temporary directory
+# With expenses the ledger is filled by generate_synthetic_ledger(path, expenses, **options),
+# otherwise the file is left for the benchmark to create. Other scratch files can
+# go next to it; the directory is removed when the block ends
+# Yields the path and the generator's summary, or None for an empty ledger
+@contextlib.contextmanager
+def scratch_ledger(expenses=None, name="benchmark.db", **options):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, name)
+        generation = None if expenses is None else generate_synthetic_ledger(path, expenses, **options)
+        yield path, generation
+
+
+
+# Function to time the main ledger operations on a synthetic or existing ledger
+# Covers inserts, listings, category filters, budget lookups and goal views;
+# every case runs once to warm up and is then timed `runs` times. An existing
+# ledger is benchmarked on a copy, since opening it migrates it and some cases write
+# Returns a dict ready for json.dumps with the environment under "meta"
+def run_benchmark_suite(rows=100000, runs=5, seed=2024, ledger=None, inserts=100):
+    import datetime
+    import platform
+    import statistics
+    import subprocess
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    with scratch_ledger(rows if ledger is None else None, "suite.db", seed=seed) as (path, generation):
+        if ledger is not None:
+            path = copy_ledger(ledger, os.path.dirname(path))
+        repository = BudgetRepository(path, profile="fast")
+
+        # Pick the busiest and the quietest category and the last month with data
+        repository.cursor.execute(
+            """
+            SELECT c.name FROM monthly_category_totals t JOIN categories c ON c.id = t.category_id
+            GROUP BY t.category_id ORDER BY SUM(t.entry_count) DESC
+            """
+        )
+        names = [row[0] for row in repository.cursor.fetchall()] or ["benchmark"]
+        busiest, quietest = names[0], names[-1]
+        repository.cursor.execute("SELECT MIN(date), MAX(date), COUNT(*) FROM expenses")
+        first_date, last_date, expense_count = repository.cursor.fetchone()
+        last_date = last_date or datetime.date.today().isoformat()
+        first_date = first_date or last_date
+        month = last_date[:7]
+        today = datetime.date.fromisoformat(f"{month}-15")
+        middle_date = datetime.date.fromordinal(
+            (datetime.date.fromisoformat(first_date).toordinal() + datetime.date.fromisoformat(last_date).toordinal())
+            // 2
+        ).isoformat()
+        busiest_id = repository.get_category_id(busiest) or repository.record_category(busiest)
+
+        def insert_rows(write):
+            with repository.write_transaction():
+                repository.cursor.execute("SAVEPOINT benchmark")
+                for number in range(inserts):
+                    write(number)
+                repository.cursor.execute("ROLLBACK TO benchmark")
+                repository.cursor.execute("RELEASE benchmark")
+
+        def drain(query):
+            for _ in repository.run_query(query):
+                pass
+
+        cases = {
+            "insert_expense": (
+                inserts,
+                lambda: insert_rows(lambda number: repository.record_expense(busiest_id, "12.34", last_date)),
+            ),
+            "insert_income": (
+                inserts,
+                lambda: insert_rows(lambda number: repository.record_income("salary", "1234.56", last_date)),
+            ),
+            "list_first_page": (1, lambda: repository.fetch_ledger_page("expense")),
+            "list_middle_page": (1, lambda: repository.fetch_ledger_page("expense", after=(middle_date, 0))),
+            "list_income_page": (1, lambda: repository.fetch_ledger_page("income", after=(middle_date, 0))),
+            "filter_busiest_category_month": (
+                1,
+                lambda: drain(LedgerQuery("expense").in_categories(busiest).between(f"{month}-01", f"{month}-31")),
+            ),
+            "filter_quietest_category": (1, lambda: drain(LedgerQuery("expense").in_categories(quietest))),
+            "filter_amount_range_month": (
+                1,
+                lambda: drain(LedgerQuery("expense").between(f"{month}-01", f"{month}-31").amount_between(100, 150)),
+            ),
+            "budget_lookup": (1, lambda: repository.get_monthly_spend(busiest, month)),
+            "budget_report": (1, lambda: repository.build_budget_report(month, today)),
+            "goal_report": (1, lambda: repository.build_goal_report(today)),
+            "goal_refresh": (1, lambda: repository.refresh_goal_progress()),
+        }
+
+        results = {}
+        for name, (operations, case) in cases.items():
+            case()
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                case()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = {
+                "runs": runs,
+                "operations": operations,
+                "min_ms": min(timings),
+                "median_ms": statistics.median(timings),
+                "mean_ms": statistics.fmean(timings),
+                "us_per_operation": statistics.median(timings) * 1000 / operations,
+            }
+        repository.close()
+
+    return {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "ledger": ledger,
+            "expenses": expense_count,
+            "seed": seed if ledger is None else None,
+            "generation": generation,
+        },
+        "results": results,
+    }
+
+
+
+# Function to compare two benchmark suite results by median time
+# Returns a list of (case, baseline_ms, current_ms, change) tuples, change being
+# the relative difference, and the cases slower by more than tolerance
+def compare_benchmark_results(baseline, current, tolerance=0.2):
+    rows = []
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        baseline_ms = baseline["results"][name]["median_ms"]
+        change = (result["median_ms"] - baseline_ms) / baseline_ms if baseline_ms else 0.0
+        rows.append((name, baseline_ms, result["median_ms"], change))
+        if change > tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+
+# Function to compare the bulk import with the per-row add_expense path
+# Both runs use a scratch database so the real ledger is not touched
+def benchmark_import(rows=20000):
+    import random
+
+    categories = SYNTHETIC_EXPENSE_CATEGORIES[:5]
+    sample = [
+        (
+            random.choice(categories),
+            round(random.uniform(1, 500), 2),
+            f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+        )
+        for _ in range(rows)
+    ]
+
+    with scratch_ledger(name="expenses.db") as (path, _):
+        directory = os.path.dirname(path)
+        csv_path = os.path.join(directory, "expenses.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["category", "amount", "date"])
+            writer.writerows(sample)
+
+        results = {}
+        for mode in ("per_row", "bulk"):
+            repository = BudgetRepository(os.path.join(directory, f"{mode}.db"))
+            repository.cursor.executemany("INSERT INTO categories (name) VALUES (?)", [(name,) for name in categories])
+            repository.conn.commit()
+            repository.invalidate_category_cache()
+
+            start = time.perf_counter()
+            if mode == "per_row":
+                with open(os.devnull, "w") as devnull:
+                    stdout = sys.stdout
+                    sys.stdout = devnull
+                    try:
+                        for category_name, amount, date in sample:
+                            repository.add_expense(category_name, amount, date)
+                    finally:
+                        sys.stdout = stdout
+            else:
+                repository.bulk_import(csv_path, "expense")
+            seconds = time.perf_counter() - start
+            results[mode] = {"rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds}
+            repository.close()
+
+    results["speedup"] = results["per_row"]["seconds"] / results["bulk"]["seconds"]
+    return results
+
+
+
+# Function to benchmark the budget report against a per-category loop
+# A synthetic ledger of one year, with a budget for every category, is reported on
+def benchmark_budget_report(expenses=1000000, categories=1000, month="2024-06"):
+    import datetime
+
+    with scratch_ledger(expenses, "report_benchmark.db", categories=categories, years=1, end_year=int(month[:4])) as (
+        path,
+        generation,
+    ):
+        repository = BudgetRepository(path)
+        load_seconds = generation["seconds"]
+
+        # Run the report once so the NumPy import is not timed
+        today = datetime.date(*(int(part) for part in month.split("-")), 15)
+        repository.build_budget_report(month, today)
+        start = time.perf_counter()
+        repository.build_budget_report(month, today)
+        vectorized_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        repository.cursor.execute("SELECT category_id, budget_amount FROM budgets")
+        for category_id, budget_amount in repository.cursor.fetchall():
+            loop_cursor = repository.conn.cursor()
+            loop_cursor.execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE category_id = ? AND date BETWEEN ? AND ?",
+                (category_id, f"{month}-01", f"{month}-31"),
+            )
+            spent = loop_cursor.fetchone()[0]
+            burn_rate = spent // today.day
+            max(burn_rate * 30 - budget_amount, 0)
+        loop_seconds = time.perf_counter() - start
+
+        repository.close()
+
+    return {
+        "expenses": expenses,
+        "categories": categories,
+        "load_seconds": load_seconds,
+        "vectorized_seconds": vectorized_seconds,
+        "loop_seconds": loop_seconds,
+        "speedup": loop_seconds / vectorized_seconds if vectorized_seconds else 0.0,
+    }
+
+
+
+# Function to measure the write cost of each storage profile
+# Each profile writes the same rows once with a commit per row and once
+# inside a single write_transaction(); the per-commit time is mostly fsync
+def benchmark_storage_profiles(rows=2000):
+    results = {}
+    with scratch_ledger() as (path, _):
+        for name in STORAGE_PROFILES:
+            storage_profile_results = {}
+            for mode in ("per_commit", "batched"):
+                repository = BudgetRepository(os.path.join(os.path.dirname(path), f"{name}_{mode}.db"), name)
+                category_id = repository.record_category("benchmark")
+
+                start = time.perf_counter()
+                if mode == "per_commit":
+                    for number in range(rows):
+                        repository.cursor.execute(
+                            "INSERT INTO expenses (category_id, amount, date) VALUES (?, ?, ?)",
+                            (category_id, number * 100 + 50, "2024-01-01"),
+                        )
+                        repository.commit_writes()
+                else:
+                    with repository.write_transaction():
+                        for number in range(rows):
+                            repository.cursor.execute(
+                                "INSERT INTO expenses (category_id, amount, date) VALUES (?, ?, ?)",
+                                (category_id, number * 100 + 50, "2024-01-01"),
+                            )
+                            repository.commit_writes()
+                seconds = time.perf_counter() - start
+                storage_profile_results[mode] = {"seconds": seconds, "rows_per_sec": rows / seconds}
+                repository.close()
+
+            per_commit = storage_profile_results["per_commit"]["seconds"]
+            batched = storage_profile_results["batched"]["seconds"]
+            storage_profile_results["commit_cost_ms"] = max(per_commit - batched, 0.0) / rows * 1000
+            results[name] = storage_profile_results
+    return results
+
+
+
+# Function to stress the pool with reader threads while writes keep flowing
+# Returns reads/sec and writes/sec for each number of reader threads
+def benchmark_pool(thread_counts=(1, 2, 4, 8), seconds=2.0, rows=50000):
+    import random
+
+    results = []
+    with scratch_ledger(rows, "pool_benchmark.db", years=1) as (path, _):
+        for thread_count in thread_counts:
+            with LedgerPool(path) as pool:
+                stop = threading.Event()
+                reads = [0] * thread_count
+
+                def read_loop(index):
+                    repository = pool.reader()
+                    while not stop.is_set():
+                        date = f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+                        repository.fetch_ledger_page("expense", after=(date, 0))
+                        reads[index] += 1
+
+                def write_loop(counter):
+                    while not stop.is_set():
+                        futures = [
+                            pool.add_expense(random.choice(SYNTHETIC_EXPENSE_CATEGORIES), 9.99, "2024-06-01")
+                            for _ in range(100)
+                        ]
+                        for future in futures:
+                            future.result()
+                        counter[0] += len(futures)
+
+                writes = [0]
+                threads = [threading.Thread(target=read_loop, args=(index,)) for index in range(thread_count)]
+                threads.append(threading.Thread(target=write_loop, args=(writes,)))
+                for thread in threads:
+                    thread.start()
+                time.sleep(seconds)
+                stop.set()
+                for thread in threads:
+                    thread.join()
+
+            results.append(
+                {
+                    "threads": thread_count,
+                    "reads_per_sec": sum(reads) / seconds,
+                    "writes_per_sec": writes[0] / seconds,
+                }
+            )
+    return results
+
+
+
+# Function to load-test the HTTP API with concurrent keep-alive clients
+# Starts a temporary server on a scratch database when no port is given
+# Returns requests/sec and p50/p99 latency in milliseconds
+def load_test(port=None, host="127.0.0.1", requests=2000, concurrency=50):
+    import random
+
+    async def client(count, latencies):
+        reader, writer = await asyncio.open_connection(host, server_port)
+        try:
+            for _ in range(count):
+                if random.random() < 0.8:
+                    body = b""
+                    request = f"GET /expenses?limit=50&from=2024-{random.randint(1, 12):02d}-01 HTTP/1.1\r\nHost: {host}\r\n\r\n"
+                else:
+                    body = json.dumps({"category": "groceries", "amount": 12.5, "date": "2024-06-01"}).encode("utf-8")
+                    request = (
+                        f"POST /expenses HTTP/1.1\r\nHost: {host}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                    )
+                start = time.perf_counter()
+                writer.write(request.encode("latin-1") + body)
+                await writer.drain()
+                await read_http_response(reader)
+                latencies.append(time.perf_counter() - start)
+        finally:
+            writer.close()
+
+    async def run():
+        nonlocal server_port
+        server = None
+        with contextlib.ExitStack() as stack:
+            if server_port is None:
+                path, _ = stack.enter_context(scratch_ledger(20000, "load_test.db", years=1))
+                server = await LedgerServer(path, host, 0).start()
+                server_port = server.port
+
+            latencies = []
+            per_client = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+            start = time.perf_counter()
+            await asyncio.gather(*(client(count, latencies) for count in per_client if count))
+            seconds = time.perf_counter() - start
+
+            if server is not None:
+                await server.close()
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "seconds": seconds,
+            "requests_per_sec": len(latencies) / seconds,
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        }
+
+    server_port = port
+    return asyncio.run(run())
+
+
+
+# Function to read one HTTP response, plain or chunked, and return its status and body
+async def read_http_response(reader):
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        body = b""
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+    else:
+        body = await reader.readexactly(int(headers.get("content-length") or 0))
+    return status, body
+
+
+
+# Function to run a local webhook that prints every JSON body posted to it
+# Used as the target of --alert-webhook while trying out budget alerts
+def serve_webhook_stub(host="127.0.0.1", port=8090):
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await read_http_request(reader)
+                if request is None:
+                    break
+                method, path, _, headers, body = request
+                print(f"{method} {path} {body.decode('utf-8', 'replace')}")
+                await send_json(writer, 200, {"received": True}, headers.get("connection", "").lower() != "close")
+        except (HttpError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, host, port)
+        print(f"Webhook stub listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Webhook stub stopped.")
+
+
+
+# Function to time selective LedgerQuery runs over a large synthetic ledger
+# Each query is run once to warm the statement cache, then timed
+def benchmark_queries(expenses=1000000, categories=200, runs=20):
+    with scratch_ledger(expenses, "query_benchmark.db", categories=categories, years=10) as (path, generation):
+        repository = BudgetRepository(path, profile="fast")
+        load_seconds = generation["seconds"]
+        repository.cursor.execute("ANALYZE")
+
+        queries = {
+            "one category, one month": lambda: LedgerQuery("expense")
+            .in_categories(SYNTHETIC_EXPENSE_CATEGORIES[7])
+            .between("2024-03-01", "2024-03-31"),
+            "three categories, one week": lambda: LedgerQuery("expense")
+            .in_categories(*SYNTHETIC_EXPENSE_CATEGORIES[1:4])
+            .between("2023-06-01", "2023-06-07")
+            .order_by("amount", True),
+            "one day, amount bounds": lambda: LedgerQuery("expense")
+            .between("2022-11-15", "2022-11-15")
+            .amount_between(100, 200),
+            "latest 50": lambda: LedgerQuery("expense").order_by("date", True).limit(50),
+        }
+        results = {"expenses": expenses, "load_seconds": load_seconds, "queries": {}}
+        for name, make_query in queries.items():
+            rows = len(list(repository.run_query(make_query())))
+            start = time.perf_counter()
+            for _ in range(runs):
+                for _ in repository.run_query(make_query()):
+                    pass
+            results["queries"][name] = {"rows": rows, "ms": (time.perf_counter() - start) / runs * 1000}
+        repository.close()
+    return results
+
+
+
+# Function to compare a columnar snapshot with a CSV dump of the same ledger
+# Load time covers reading every amount, category and date back in and
+# totalling the amounts, so both formats do the same work
+def benchmark_snapshot(expenses=1000000, categories=200):
+    with scratch_ledger(expenses, "snapshot_benchmark.db", categories=categories, years=5) as (path, _):
+        directory = os.path.dirname(path)
+        repository = BudgetRepository(path, profile="fast")
+
+        csv_path = os.path.join(directory, "expenses.csv")
+        start = time.perf_counter()
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["id", "category", "amount", "currency", "date"])
+            writer.writerows(
+                repository.cursor.execute(
+                    """
+                    SELECT e.id, c.name, e.amount, e.currency, e.date
+                    FROM expenses e JOIN categories c ON c.id = e.category_id
+                    """
+                )
+            )
+        csv_export_seconds = time.perf_counter() - start
+
+        snapshot_path = os.path.join(directory, "snapshot")
+        start = time.perf_counter()
+        repository.export_snapshot(snapshot_path)
+        snapshot_export_seconds = time.perf_counter() - start
+        repository.close()
+
+        start = time.perf_counter()
+        with open(csv_path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader)
+            csv_total = sum(int(row[2]) for row in reader)
+        csv_load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot = load_snapshot(snapshot_path)
+        snapshot_total = int(snapshot["expenses"]["amount"].sum())
+        snapshot_load_seconds = time.perf_counter() - start
+
+        snapshot_bytes = sum(path.stat().st_size for path in pathlib.Path(snapshot_path).iterdir())
+        csv_bytes = os.path.getsize(csv_path)
+        del snapshot
+
+    return {
+        "expenses": expenses,
+        "csv": {"bytes": csv_bytes, "export_seconds": csv_export_seconds, "load_seconds": csv_load_seconds},
+        "snapshot": {
+            "bytes": snapshot_bytes,
+            "export_seconds": snapshot_export_seconds,
+            "load_seconds": snapshot_load_seconds,
+        },
+        "totals_match": csv_total == snapshot_total,
+    }
+
+
+
+# Function to check that money totals stay exact over many random entries
+# Random minor-unit amounts go into a scratch ledger and are totalled by SQLite,
+# by the monthly rollup and by NumPy over a snapshot; each total must equal the
+# Python integer sum. The float total a REAL column would give is kept for contrast
+def check_money_exactness(entries=10000000, categories=50, seed=2024):
+    import random
+
+    generator = random.Random(seed)
+    dates = [f"{year}-{month:02d}-{day:02d}" for year in range(2015, 2025) for month in range(1, 13) for day in range(1, 29)]
+    expected_total = 0
+    float_total = 0.0
+    with scratch_ledger(name="money_check.db") as (path, _):
+        directory = os.path.dirname(path)
+        repository = BudgetRepository(path, profile="fast")
+        with repository.write_transaction():
+            category_ids = [repository.record_category(f"category {number}") for number in range(categories)]
+        start = time.perf_counter()
+        with repository.write_transaction():
+            for offset in range(0, entries, IMPORT_CHUNK_SIZE):
+                count = min(IMPORT_CHUNK_SIZE, entries - offset)
+                amounts = [int(generator.random() * 99999999) + 1 for _ in range(count)]
+                rows = zip(generator.choices(category_ids, k=count), amounts, generator.choices(dates, k=count))
+                expected_total += sum(amounts)
+                float_total = sum((amount / 100 for amount in amounts), float_total)
+                repository.cursor.executemany(
+                    "INSERT INTO expenses (category_id, amount, currency, date) VALUES (?, ?, 'USD', ?)", rows
+                )
+        load_seconds = time.perf_counter() - start
+
+        repository.cursor.execute("SELECT SUM(amount) FROM expenses")
+        sqlite_total = repository.cursor.fetchone()[0]
+        repository.cursor.execute("SELECT SUM(total) FROM monthly_category_totals")
+        rollup_total = repository.cursor.fetchone()[0]
+        rollup_mismatches = len(repository.check_monthly_totals())
+
+        try:
+            repository.export_snapshot(os.path.join(directory, "snapshot"))
+            snapshot = load_snapshot(os.path.join(directory, "snapshot"))
+            numpy_total = int(snapshot["expenses"]["amount"].sum())
+            snapshot_summary_total = sum(
+                sum(months.values()) for months in summarize_snapshot(snapshot).values()
+            )
+            del snapshot
+        except ImportError:
+            numpy_total = snapshot_summary_total = None
+        repository.close()
+
+    totals = [sqlite_total, rollup_total, numpy_total, snapshot_summary_total]
+    return {
+        "entries": entries,
+        "load_seconds": load_seconds,
+        "expected_total": expected_total,
+        "sqlite_total": sqlite_total,
+        "rollup_total": rollup_total,
+        "numpy_total": numpy_total,
+        "snapshot_summary_total": snapshot_summary_total,
+        "rollup_mismatches": rollup_mismatches,
+        "float_error": float_total - expected_total / 100,
+        "exact": rollup_mismatches == 0 and all(total in (None, expected_total) for total in totals),
+    }
+
+
+
+# Function to compare expense write latency with budget alerts off and on
+# Every category has a budget and writes cross the thresholds, so the alerting
+# path does real work; alerts go to a log file in the scratch directory
+def benchmark_alerts(rows=20000, categories=50):
+    import random
+
+    sample = [
+        (random.randint(1, categories), random.randint(100, 20000), f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}")
+        for _ in range(rows)
+    ]
+    results = {}
+    with scratch_ledger() as (path, _):
+        directory = os.path.dirname(path)
+        for mode in ("off", "on"):
+            repository = BudgetRepository(os.path.join(directory, f"alerts_{mode}.db"), profile="fast")
+            for number in range(categories):
+                category_id = repository.record_category(f"category {number}")
+                repository.record_budget(category_id, "500")
+            monitor = None
+            if mode == "on":
+                monitor = repository.enable_budget_alerts([LogFileAlertSink(os.path.join(directory, "alerts.log"))])
+
+            latencies = []
+            for category_id, amount, date in sample:
+                start = time.perf_counter()
+                repository.record_expense(category_id, format_money(amount), date)
+                latencies.append(time.perf_counter() - start)
+            repository.close()
+
+            latencies.sort()
+            results[mode] = {
+                "mean_us": sum(latencies) / rows * 1000000,
+                "p50_us": latencies[rows // 2] * 1000000,
+                "p99_us": latencies[min(rows - 1, int(rows * 0.99))] * 1000000,
+                "alerts": monitor.stats["alerts"] if monitor else 0,
+            }
+    results["overhead_us"] = results["on"]["mean_us"] - results["off"]["mean_us"]
+    return results
+
+
+
+# Function to time the recurring scheduler catching up on years of daily rules
+# The rules start years ago and have never run, so the first run posts every
+# occurrence; the second run must post nothing
+def benchmark_recurring(rules=1, years=10):
+    import datetime
+
+    today = datetime.date.today()
+    start_date = today - datetime.timedelta(days=round(365.25 * years))
+    with scratch_ledger(name="recurring.db") as (path, _):
+        repository = BudgetRepository(path, profile="fast")
+        for number in range(rules):
+            kind = "income" if number % 2 else "expense"
+            repository.record_recurring_rule(
+                f"rule {number}", kind, f"category {number}", "12.34", "daily", start_date.isoformat()
+            )
+
+        expansion_start = time.perf_counter()
+        expected = sum(
+            len(recurring_occurrences("daily", start_date, start_date, today)) for _ in range(rules)
+        )
+        expansion_seconds = time.perf_counter() - expansion_start
+
+        first = repository.run_recurring_rules(today)
+        second = repository.run_recurring_rules(today)
+        repository.cursor.execute("SELECT (SELECT COUNT(*) FROM expenses) + (SELECT COUNT(*) FROM income)")
+        stored = repository.cursor.fetchone()[0]
+        repository.close()
+
+    posted = first["expenses"] + first["income"]
+    return {
+        "rules": rules,
+        "occurrences": expected,
+        "expansion_seconds": expansion_seconds,
+        "seconds": first["seconds"],
+        "rows_per_sec": posted / first["seconds"] if first["seconds"] > 0 else 0.0,
+        "second_run_rows": second["expenses"] + second["income"],
+        "idempotent": posted == expected == stored and second["expenses"] + second["income"] == 0,
+    }
+
+
+
+# Function to measure what instrumentation costs per operation
+# "bare" calls the undecorated methods, "off" the decorated ones with
+# instrumentation off and "on" with it on. All modes share one scratch ledger
+# and take turns over several rounds; the best round of each mode is kept
+def benchmark_instrumentation(rows=20000, rounds=3):
+    results = {mode: {"write_us": float("inf"), "read_us": float("inf")} for mode in ("bare", "off", "on")}
+    with scratch_ledger(name="instrument.db") as (path, _):
+        repository = BudgetRepository(path, profile="fast")
+        category_id = repository.record_category("benchmark")
+        for _ in range(rounds):
+            for mode in results:
+                record_expense = BudgetRepository.record_expense
+                fetch_ledger_page = BudgetRepository.fetch_ledger_page
+                if mode == "bare":
+                    record_expense = record_expense.__wrapped__
+                    fetch_ledger_page = fetch_ledger_page.__wrapped__
+                if mode == "on":
+                    repository.enable_profiling()
+
+                start = time.perf_counter()
+                for number in range(rows):
+                    record_expense(repository, category_id, "12.34", f"2024-{number % 12 + 1:02d}-15")
+                write_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for number in range(rows):
+                    fetch_ledger_page(repository, "expense", (f"2024-{number % 12 + 1:02d}-15", number), None, 20)
+                read_seconds = time.perf_counter() - start
+
+                if mode == "on":
+                    results[mode]["metrics"] = repository.profiler.to_dict()
+                    repository.disable_profiling()
+                results[mode]["write_us"] = min(results[mode]["write_us"], write_seconds / rows * 1000000)
+                results[mode]["read_us"] = min(results[mode]["read_us"], read_seconds / rows * 1000000)
+        repository.close()
+    return results
+
+
+
+# Function to time the read menu queries against SQLite and against the in-memory ledger
+# Both repositories read the same synthetic ledger and must return the same rows
+def benchmark_memory(rows=500000, runs=20):
+    with scratch_ledger(rows, "memory_benchmark.db") as (path, _):
+        sqlite_repository = BudgetRepository(path)
+        memory_repository = BudgetRepository(path)
+
+        start = time.perf_counter()
+        memory = memory_repository.enable_memory_mode()
+        load_seconds = time.perf_counter() - start
+
+        sqlite_repository.cursor.execute("SELECT date FROM expenses ORDER BY date LIMIT 1 OFFSET ?", (rows // 2,))
+        middle_date = sqlite_repository.cursor.fetchone()[0]
+        month = middle_date[:7]
+        busiest = SYNTHETIC_EXPENSE_CATEGORIES[0]
+        cases = {
+            "first page": lambda repository: repository.fetch_ledger_page("expense"),
+            "page at middle date": lambda repository: repository.fetch_ledger_page("expense", after=(middle_date, 0)),
+            "previous page": lambda repository: repository.fetch_ledger_page("expense", before=(middle_date, 0)),
+            "income page by category": lambda repository: repository.fetch_ledger_page(
+                "income", after=(middle_date, 0), category_name=SYNTHETIC_INCOME_CATEGORIES[1]
+            ),
+            "expenses by category": lambda repository: list(
+                repository.run_query(LedgerQuery("expense").in_categories(busiest).order_by("id"))
+            ),
+            "search month and amount": lambda repository: list(
+                repository.run_query(
+                    LedgerQuery("expense").between(f"{month}-01", f"{month}-31").amount_between(50, 150)
+                )
+            ),
+            "largest 20 expenses": lambda repository: list(
+                repository.run_query(LedgerQuery("expense").order_by("amount", True).limit(20))
+            ),
+            "monthly spend": lambda repository: repository.get_monthly_spend(busiest, month),
+        }
+
+        results = {}
+        consistent = True
+        for name, case in cases.items():
+            timings = {}
+            for label, repository in (("sqlite", sqlite_repository), ("memory", memory_repository)):
+                case(repository)
+                start = time.perf_counter()
+                for _ in range(runs):
+                    result = case(repository)
+                timings[label] = (time.perf_counter() - start) / runs * 1000
+                timings[f"{label}_result"] = [tuple(row) for row in result] if isinstance(result, list) else result
+            consistent = consistent and timings.pop("sqlite_result") == timings.pop("memory_result")
+            results[name] = timings
+
+        category_id = memory_repository.get_category_id(busiest)
+        start = time.perf_counter()
+        for _ in range(runs):
+            memory_repository.record_expense(category_id, "12.34", middle_date)
+            memory_repository.fetch_ledger_page("expense", after=(middle_date, 0))
+        append_ms = (time.perf_counter() - start) / runs * 1000
+        report = memory.memory_report()
+        sqlite_repository.close()
+        memory_repository.close()
+
+    return {
+        "rows": rows,
+        "load_seconds": load_seconds,
+        "queries": results,
+        "append_ms": append_ms,
+        "memory": report,
+        "consistent": consistent,
+    }
+
+
+
+# Function to time consolidation of many synthetic ledgers with more and more worker processes
+# Every worker count must produce the same merged report
+def benchmark_consolidation(ledgers=32, rows=20000, worker_counts=(1, 2, 4, 8)):
+    from concurrent.futures import ProcessPoolExecutor
+
+    with scratch_ledger(name="ledger_0000.db") as (path, _):
+        directory = os.path.dirname(path)
+        paths = [os.path.join(directory, f"ledger_{number:04d}.db") for number in range(ledgers)]
+        with ProcessPoolExecutor() as executor:
+            futures = [
+                executor.submit(generate_synthetic_ledger, path, rows, seed=2024 + number)
+                for number, path in enumerate(paths)
+            ]
+            for future in futures:
+                future.result()
+
+        results = []
+        baseline = None
+        for workers in worker_counts:
+            report = consolidate_ledgers(directory, workers)
+            rows_found = consolidated_report_rows(report)
+            baseline = baseline or rows_found
+            results.append(
+                {
+                    "workers": workers,
+                    "seconds": report["seconds"],
+                    "ledgers_per_sec": report["ledgers"] / report["seconds"] if report["seconds"] > 0 else 0.0,
+                    "worker_seconds": report["worker_seconds"],
+                    "consistent": rows_found == baseline and not report["failed"],
+                }
+            )
+    return {"ledgers": ledgers, "rows": rows, "cpus": os.cpu_count(), "results": results}
+
+
+
+# Function to time a full forecast build against an incremental update
+# After inserts the incrementally updated forecast must match one built from scratch
+def benchmark_forecast(rows=500000, months=12, inserts=100):
+    import datetime
+
+    import numpy as np
+
+    with scratch_ledger(rows, "forecast_benchmark.db") as (path, generation):
+        today = datetime.date.fromisoformat(generation["last_date"])
+        repository = BudgetRepository(path, profile="fast")
+
+        start = time.perf_counter()
+        repository.build_cash_flow_forecast(months, today)
+        full_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        repository.build_cash_flow_forecast(months, today)
+        cached_seconds = time.perf_counter() - start
+
+        category_id = repository.get_category_id(SYNTHETIC_EXPENSE_CATEGORIES[0])
+        with repository.write_transaction():
+            for number in range(inserts):
+                repository.record_expense(category_id, "12.34", (today - datetime.timedelta(days=number % 90)).isoformat())
+        start = time.perf_counter()
+        incremental = repository.build_cash_flow_forecast(months, today)
+        incremental_seconds = time.perf_counter() - start
+
+        repository.forecasts = {}
+        rebuilt = repository.build_cash_flow_forecast(months, today)
+        repository.close()
+
+    order = [incremental["categories"].index(category) for category in rebuilt["categories"]]
+    return {
+        "rows": rows,
+        "days": len(rebuilt["days"]),
+        "categories": len(rebuilt["categories"]),
+        "full_seconds": full_seconds,
+        "cached_seconds": cached_seconds,
+        "incremental_seconds": incremental_seconds,
+        "inserts": inserts,
+        "consistent": bool(
+            np.allclose(incremental["balance"], rebuilt["balance"])
+            and np.allclose(incremental["cumulative"][order], rebuilt["cumulative"])
+        ),
+    }
+
+
+
+# Function to time duplicate detection on a synthetic ledger
+# Half of the ledger is exported again together with new rows that carry a
+# bank reference and imported with duplicates skipped; the file is then
+# imported again with duplicates allowed, so the scan must find every file row
+def benchmark_dedup(rows=200000):
+    with scratch_ledger(rows, "dedup_benchmark.db", years=1) as (path, _):
+        csv_path = os.path.join(os.path.dirname(path), "overlap.csv")
+        repository = BudgetRepository(path, profile="fast")
+
+        overlap = rows // 2
+        new_rows = rows // 10
+        repository.cursor.execute(
+            """
+            SELECT c.name, e.amount, e.currency, e.date
+            FROM expenses e JOIN categories c ON c.id = e.category_id
+            ORDER BY e.id LIMIT ? OFFSET ?
+            """,
+            (overlap, rows - overlap),
+        )
+        exported = repository.cursor.fetchall()
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["category", "amount", "currency", "date", "reference"])
+            for category, amount, currency, date in exported:
+                writer.writerow([category, format_money(amount, currency), currency, date, ""])
+            for number in range(new_rows):
+                category, amount, currency, date = exported[number % len(exported)]
+                writer.writerow([category, format_money(amount, currency), currency, date, f"TX{number:08d}"])
+
+        start = time.perf_counter()
+        backfilled = repository.fill_fingerprints("expense")
+        backfill_seconds = time.perf_counter() - start
+        extra_before = sum(len(group[0]) - 1 for group in repository.find_duplicates("expense"))
+
+        skipped = repository.bulk_import(csv_path, "expense", duplicates="skip")
+        allowed = repository.bulk_import(csv_path, "expense")
+
+        start = time.perf_counter()
+        groups = repository.find_duplicates("expense")
+        scan_seconds = time.perf_counter() - start
+        repository.cursor.execute("SELECT COUNT(*) FROM expenses")
+        ledger_rows = repository.cursor.fetchone()[0]
+        repository.close()
+
+    return {
+        "rows": rows,
+        "file_rows": overlap + new_rows,
+        "backfilled": backfilled,
+        "backfill_seconds": backfill_seconds,
+        "allow_rows_per_sec": allowed["rows_per_sec"],
+        "skip_rows_per_sec": (overlap + new_rows) / skipped["seconds"] if skipped["seconds"] > 0 else 0.0,
+        "skipped_duplicates": skipped["duplicates"],
+        "skipped_imported": skipped["rows"],
+        "scan_rows": ledger_rows,
+        "scan_seconds": scan_seconds,
+        "extra_entries": sum(len(group[0]) - 1 for group in groups) - extra_before,
+        "expected_duplicates": overlap,
+        "expected_new": new_rows,
+    }
+
+
+
+# Function to time hot and historical queries before and after archiving
+# A synthetic ledger is generated, timed, archived up to its last year and
+# timed again; the rollup, goals and whole-history totals must be unchanged
+def benchmark_archive(rows=500000, years=5, runs=20):
+    with scratch_ledger(rows, "archive_benchmark.db", years=years) as (path, generation):
+        last_year = int(generation["last_date"][:4])
+        busiest = SYNTHETIC_EXPENSE_CATEGORIES[0]
+        repository = BudgetRepository(path, profile="fast")
+
+        queries = {
+            "live month, one category": lambda: LedgerQuery("expense")
+            .in_categories(busiest)
+            .between(f"{last_year}-06-01", f"{last_year}-06-30"),
+            "live year, amount range": lambda: LedgerQuery("expense")
+            .between(f"{last_year}-01-01", f"{last_year}-12-31")
+            .amount_between(100, 101),
+            "whole history, one category": lambda: LedgerQuery("expense").in_categories(busiest).amount_between(
+                100, 110
+            ),
+        }
+
+        def measure():
+            timings = {}
+            for name, make_query in queries.items():
+                rows_found = len(list(repository.run_query(make_query())))
+                start = time.perf_counter()
+                for _ in range(runs):
+                    for _ in repository.run_query(make_query()):
+                        pass
+                timings[name] = {"rows": rows_found, "ms": (time.perf_counter() - start) / runs * 1000}
+            start = time.perf_counter()
+            for _ in range(runs):
+                repository.cursor.execute("SELECT COUNT(*), SUM(amount) FROM expenses")
+                live = repository.cursor.fetchone()
+            timings["live table scan"] = {"rows": live[0], "ms": (time.perf_counter() - start) / runs * 1000}
+            repository.cursor.execute(f"SELECT COUNT(*), SUM(amount) FROM {repository.history_table('expenses')}")
+            return timings, repository.cursor.fetchone()
+
+        before, history_before = measure()
+        start = time.perf_counter()
+        archived = repository.archive_years(last_year)
+        archive_seconds = time.perf_counter() - start
+        after, history_after = measure()
+        compacted = repository.compact_archives()
+        consistent = (
+            history_before == history_after
+            and not repository.check_monthly_totals()
+            and not repository.check_goal_progress()
+        )
+        repository.close()
+
+    return {
+        "rows": rows,
+        "archived": archived,
+        "archive_seconds": archive_seconds,
+        "compacted": [(os.path.basename(path), before_bytes, after_bytes) for path, before_bytes, after_bytes in compacted],
+        "before": before,
+        "after": after,
+        "consistent": consistent,
+    }
+
+
+
+# Run one benchmark from the command line
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Budget Tracker benchmarks")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    suite_parser = subcommands.add_parser(
+        "suite", help="Time inserts, listings, filters, budgets and goals and save the results as JSON"
+    )
+    suite_parser.add_argument("--rows", type=int, default=100000, help="Expenses in the synthetic ledger")
+    suite_parser.add_argument("--runs", type=int, default=5)
+    suite_parser.add_argument("--seed", type=int, default=2024)
+    suite_parser.add_argument("--ledger", help="Benchmark this existing ledger instead of a synthetic one")
+    suite_parser.add_argument("--output", help="Write the results to this JSON file")
+
+    compare_parser = subcommands.add_parser(
+        "compare", help="Compare two benchmark-suite result files and flag regressions"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown, 0.2 is 20%%")
+
+    generate_parser = subcommands.add_parser("generate-ledger", help="Write a reproducible synthetic ledger to a new file")
+    generate_parser.add_argument("path")
+    generate_parser.add_argument("--expenses", type=int, default=100000)
+    generate_parser.add_argument("--income", type=int, help="Income rows, defaults to one per 20 expenses")
+    generate_parser.add_argument("--categories", type=int, default=len(SYNTHETIC_EXPENSE_CATEGORIES))
+    generate_parser.add_argument("--years", type=int, default=3)
+    generate_parser.add_argument("--end-year", type=int, default=2024)
+    generate_parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the category distribution")
+    generate_parser.add_argument("--seed", type=int, default=2024)
+
+    benchmark_parser = subcommands.add_parser("import", help="Compare bulk and per-row imports")
+    benchmark_parser.add_argument("--rows", type=int, default=20000)
+
+    report_benchmark_parser = subcommands.add_parser(
+        "report", help="Compare the vectorized budget report with a per-category loop"
+    )
+    report_benchmark_parser.add_argument("--expenses", type=int, default=1000000)
+    report_benchmark_parser.add_argument("--categories", type=int, default=1000)
+
+    profile_benchmark_parser = subcommands.add_parser(
+        "profiles", help="Compare the write cost of the storage profiles"
+    )
+    profile_benchmark_parser.add_argument("--rows", type=int, default=2000)
+
+    pool_benchmark_parser = subcommands.add_parser(
+        "pool", help="Stress concurrent readers while a writer keeps inserting"
+    )
+    pool_benchmark_parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    pool_benchmark_parser.add_argument("--seconds", type=float, default=2.0)
+
+    load_test_parser = subcommands.add_parser("load-test", help="Load-test the HTTP API")
+    load_test_parser.add_argument("--host", default="127.0.0.1")
+    load_test_parser.add_argument("--port", type=int, help="Port of a running server; starts a scratch one if omitted")
+    load_test_parser.add_argument("--requests", type=int, default=2000)
+    load_test_parser.add_argument("--concurrency", type=int, default=50)
+
+    webhook_parser = subcommands.add_parser("webhook-stub", help="Run a local webhook that prints budget alerts")
+    webhook_parser.add_argument("--host", default="127.0.0.1")
+    webhook_parser.add_argument("--port", type=int, default=8090)
+
+    query_benchmark_parser = subcommands.add_parser(
+        "query", help="Time selective queries over a synthetic ledger"
+    )
+    query_benchmark_parser.add_argument("--expenses", type=int, default=1000000)
+    query_benchmark_parser.add_argument("--categories", type=int, default=200)
+
+    snapshot_benchmark_parser = subcommands.add_parser(
+        "snapshot", help="Compare snapshot size and load time with a CSV dump"
+    )
+    snapshot_benchmark_parser.add_argument("--expenses", type=int, default=1000000)
+
+    money_parser = subcommands.add_parser(
+        "money", help="Check that integer money totals are exact over random entries"
+    )
+    money_parser.add_argument("--entries", type=int, default=10000000)
+
+    alert_benchmark_parser = subcommands.add_parser(
+        "alerts", help="Compare expense write latency with budget alerts off and on"
+    )
+    alert_benchmark_parser.add_argument("--rows", type=int, default=20000)
+
+    recurring_benchmark_parser = subcommands.add_parser(
+        "recurring", help="Time the recurring scheduler catching up on years of daily rules"
+    )
+    recurring_benchmark_parser.add_argument("--rules", type=int, default=1)
+    recurring_benchmark_parser.add_argument("--years", type=int, default=10)
+
+    instrument_benchmark_parser = subcommands.add_parser(
+        "instrumentation", help="Measure what instrumentation costs per operation when off and on"
+    )
+    instrument_benchmark_parser.add_argument("--rows", type=int, default=20000)
+
+    memory_benchmark_parser = subcommands.add_parser(
+        "memory", help="Time the read queries against SQLite and against the in-memory ledger"
+    )
+    memory_benchmark_parser.add_argument("--rows", type=int, default=500000)
+    memory_benchmark_parser.add_argument("--runs", type=int, default=20)
+
+    consolidate_benchmark_parser = subcommands.add_parser(
+        "consolidate", help="Time consolidation of synthetic ledgers with more and more workers"
+    )
+    consolidate_benchmark_parser.add_argument("--ledgers", type=int, default=32)
+    consolidate_benchmark_parser.add_argument("--rows", type=int, default=20000)
+    consolidate_benchmark_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+
+    forecast_benchmark_parser = subcommands.add_parser(
+        "forecast", help="Time a full forecast build against an incremental update"
+    )
+    forecast_benchmark_parser.add_argument("--rows", type=int, default=500000)
+    forecast_benchmark_parser.add_argument("--months", type=int, default=12)
+
+    dedup_benchmark_parser = subcommands.add_parser(
+        "dedup", help="Time fingerprint backfill, deduplicating imports and the duplicate scan"
+    )
+    dedup_benchmark_parser.add_argument("--rows", type=int, default=200000)
+
+    archive_benchmark_parser = subcommands.add_parser(
+        "archive", help="Time hot and historical queries before and after archiving"
+    )
+    archive_benchmark_parser.add_argument("--rows", type=int, default=500000)
+    archive_benchmark_parser.add_argument("--years", type=int, default=5)
+
+    for name, help_text in (
+        ("indexes", "Show the query plans of the hot queries"),
+        ("category-cache", "Check the category cache against the database"),
+    ):
+        check_parser = subcommands.add_parser(name, help=help_text)
+        check_parser.add_argument("--rows", type=int, default=100000, help="Expenses in the synthetic ledger")
+        check_parser.add_argument("--ledger", help="Check a copy of this existing ledger instead of a synthetic one")
+
+    args = parser.parse_args(arguments)
+    if args.command == "suite":
+        results = run_benchmark_suite(args.rows, args.runs, args.seed, args.ledger)
+        print(f"Benchmarked {results['meta']['expenses']} expenses at commit {results['meta']['commit'] or 'unknown'}.")
+        print("{:<32} {:>10} {:>10} {:>12}".format("Case", "Median ms", "Min ms", "us per op"))
+        for name, result in results["results"].items():
+            print(
+                "{:<32} {:>10.3f} {:>10.3f} {:>12.1f}".format(
+                    name, result["median_ms"], result["min_ms"], result["us_per_operation"]
+                )
+            )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+            print(f"Results written to {args.output}.")
+    elif args.command == "compare":
+        try:
+            with open(args.baseline, encoding="utf-8") as file:
+                baseline = json.load(file)
+            with open(args.current, encoding="utf-8") as file:
+                current = json.load(file)
+        except (OSError, ValueError) as error:
+            print(f"Error: Could not read the results: {error}")
+            return 1
+        rows, regressions = compare_benchmark_results(baseline, current, args.tolerance)
+        print(
+            f"Baseline {baseline['meta'].get('commit') or 'unknown'} vs current {current['meta'].get('commit') or 'unknown'}"
+        )
+        print("{:<32} {:>12} {:>12} {:>8}".format("Case", "Baseline ms", "Current ms", "Change"))
+        for name, baseline_ms, current_ms, change in rows:
+            flag = "  slower" if name in regressions else ""
+            print("{:<32} {:>12.3f} {:>12.3f} {:>+7.0%}{}".format(name, baseline_ms, current_ms, change, flag))
+        if regressions:
+            print(f"{len(regressions)} cases are more than {args.tolerance:.0%} slower.")
+            return 1
+        print("No regressions.")
+    elif args.command == "generate-ledger":
+        try:
+            result = generate_synthetic_ledger(
+                args.path,
+                args.expenses,
+                args.income,
+                args.categories,
+                args.years,
+                args.skew,
+                args.seed,
+                args.end_year,
+            )
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 1
+        print(
+            f"Wrote {result['expenses']} expenses and {result['income']} income entries from {result['first_date']} "
+            f"to {result['last_date']} into {result['path']} in {result['seconds']:.2f}s: "
+            f"{result['rows_per_sec']:.0f} rows/sec."
+        )
+    elif args.command == "import":
+        results = benchmark_import(args.rows)
+        for mode in ("per_row", "bulk"):
+            print(f"{mode:<8} {results[mode]['seconds']:>8.2f}s {results[mode]['rows_per_sec']:>12.0f} rows/sec")
+        print(f"Bulk import is {results['speedup']:.1f}x faster.")
+    elif args.command == "report":
+        results = benchmark_budget_report(args.expenses, args.categories)
+        print(f"Loaded {results['expenses']} expenses in {results['categories']} categories in {results['load_seconds']:.2f}s.")
+        print(f"vectorized {results['vectorized_seconds'] * 1000:>10.2f} ms")
+        print(f"loop       {results['loop_seconds'] * 1000:>10.2f} ms")
+        print(f"The vectorized report is {results['speedup']:.1f}x faster.")
+    elif args.command == "profiles":
+        results = benchmark_storage_profiles(args.rows)
+        print("{:<10} {:>16} {:>16} {:>16}".format("Profile", "Per-commit rows/s", "Batched rows/s", "Commit cost ms"))
+        for name, result in results.items():
+            print(
+                "{:<10} {:>16.0f} {:>16.0f} {:>16.3f}".format(
+                    name,
+                    result["per_commit"]["rows_per_sec"],
+                    result["batched"]["rows_per_sec"],
+                    result["commit_cost_ms"],
+                )
+            )
+    elif args.command == "pool":
+        print("{:<8} {:>12} {:>12}".format("Threads", "Reads/sec", "Writes/sec"))
+        for result in benchmark_pool(tuple(args.threads), args.seconds):
+            print("{:<8} {:>12.0f} {:>12.0f}".format(result["threads"], result["reads_per_sec"], result["writes_per_sec"]))
+    elif args.command == "load-test":
+        result = load_test(args.port, args.host, args.requests, args.concurrency)
+        print(
+            f"{result['requests']} requests in {result['seconds']:.2f}s: {result['requests_per_sec']:.0f} req/sec, "
+            f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms"
+        )
+    elif args.command == "webhook-stub":
+        serve_webhook_stub(args.host, args.port)
+    elif args.command == "query":
+        results = benchmark_queries(args.expenses, args.categories)
+        print(f"Loaded {results['expenses']} expenses in {results['load_seconds']:.2f}s.")
+        print("{:<30} {:>8} {:>10}".format("Query", "Rows", "ms"))
+        for name, result in results["queries"].items():
+            print("{:<30} {:>8} {:>10.2f}".format(name, result["rows"], result["ms"]))
+    elif args.command == "snapshot":
+        results = benchmark_snapshot(args.expenses)
+        print("{:<10} {:>12} {:>12} {:>12}".format("Format", "Size MB", "Export s", "Load s"))
+        for name in ("csv", "snapshot"):
+            result = results[name]
+            print(
+                "{:<10} {:>12.2f} {:>12.2f} {:>12.3f}".format(
+                    name, result["bytes"] / 1048576, result["export_seconds"], result["load_seconds"]
+                )
+            )
+        print("Totals match." if results["totals_match"] else "Totals differ!")
+    elif args.command == "money":
+        result = check_money_exactness(args.entries)
+        print(f"Loaded {result['entries']} random entries in {result['load_seconds']:.2f}s.")
+        for name in ("expected_total", "sqlite_total", "rollup_total", "numpy_total", "snapshot_summary_total"):
+            total = result[name]
+            print("{:<24} {:>24}".format(name, "skipped (no NumPy)" if total is None else format_money(total)))
+        print(f"A float running total would be off by {result['float_error']:+.6f}.")
+        if not result["exact"]:
+            print("Integer totals do not match!")
+            return 1
+        print("All integer totals are exact.")
+    elif args.command == "alerts":
+        results = benchmark_alerts(args.rows)
+        print("{:<8} {:>10} {:>10} {:>10} {:>8}".format("Alerts", "Mean us", "p50 us", "p99 us", "Sent"))
+        for mode in ("off", "on"):
+            result = results[mode]
+            print(
+                "{:<8} {:>10.1f} {:>10.1f} {:>10.1f} {:>8}".format(
+                    mode, result["mean_us"], result["p50_us"], result["p99_us"], result["alerts"]
+                )
+            )
+        print(f"Alerting adds {results['overhead_us']:.1f} us per expense write.")
+    elif args.command == "recurring":
+        result = benchmark_recurring(args.rules, args.years)
+        print(
+            f"Expanded {result['occurrences']} occurrences of {result['rules']} daily rules "
+            f"in {result['expansion_seconds'] * 1000:.1f} ms."
+        )
+        print(f"Posted them in {result['seconds']:.3f}s: {result['rows_per_sec']:.0f} rows/sec.")
+        print(f"A second run posted {result['second_run_rows']} rows.")
+        if not result["idempotent"]:
+            print("Recurring rules were posted more or less than once!")
+            return 1
+        print("Every occurrence was posted exactly once.")
+    elif args.command == "instrumentation":
+        results = benchmark_instrumentation(args.rows)
+        print("{:<6} {:>10} {:>10}".format("Mode", "Write us", "Read us"))
+        for mode in ("bare", "off", "on"):
+            print("{:<6} {:>10.1f} {:>10.1f}".format(mode, results[mode]["write_us"], results[mode]["read_us"]))
+        print(
+            f"Instrumentation off adds {results['off']['write_us'] - results['bare']['write_us']:+.2f} us per write "
+            f"and {results['off']['read_us'] - results['bare']['read_us']:+.2f} us per read."
+        )
+    elif args.command == "memory":
+        try:
+            results = benchmark_memory(args.rows, args.runs)
+        except ImportError:
+            print("Error: The in-memory ledger needs NumPy. Install it with 'pip install numpy'.")
+            return 1
+        print(f"Loaded {results['rows']} expenses into memory in {results['load_seconds']:.2f}s.")
+        print("{:<26} {:>10} {:>10} {:>9}".format("Query", "SQLite ms", "Memory ms", "Speedup"))
+        for name, timings in results["queries"].items():
+            print(
+                "{:<26} {:>10.3f} {:>10.3f} {:>8.1f}x".format(
+                    name, timings["sqlite"], timings["memory"], timings["sqlite"] / max(timings["memory"], 1e-9)
+                )
+            )
+        print(f"Insert plus next page read: {results['append_ms']:.3f} ms")
+        for kind, details in results["memory"].items():
+            print(f"{kind}: {details['rows']} rows, {details['bytes_per_row']:.1f} bytes per row")
+        if not results["consistent"]:
+            print("SQLite and the in-memory ledger returned different rows!")
+            return 1
+        print("SQLite and the in-memory ledger returned the same rows.")
+    elif args.command == "consolidate":
+        results = benchmark_consolidation(args.ledgers, args.rows, tuple(args.workers))
+        print(f"{results['ledgers']} ledgers of {results['rows']} expenses on {results['cpus']} CPUs")
+        print("{:<8} {:>10} {:>12} {:>9}".format("Workers", "Seconds", "Ledgers/sec", "Speedup"))
+        first = results["results"][0]["seconds"]
+        for result in results["results"]:
+            print(
+                "{:<8} {:>10.3f} {:>12.1f} {:>8.2f}x".format(
+                    result["workers"], result["seconds"], result["ledgers_per_sec"], first / result["seconds"]
+                )
+            )
+        if not all(result["consistent"] for result in results["results"]):
+            print("Worker counts produced different reports!")
+            return 1
+    elif args.command == "forecast":
+        try:
+            results = benchmark_forecast(args.rows, args.months)
+        except ImportError:
+            print("Error: The forecast needs NumPy. Install it with 'pip install numpy'.")
+            return 1
+        print(
+            f"Forecast of {results['categories']} categories over {results['days']} days "
+            f"from {results['rows']} expenses:"
+        )
+        print(f"Full build:          {results['full_seconds'] * 1000:10.1f} ms")
+        print(f"Unchanged ledger:    {results['cached_seconds'] * 1000:10.1f} ms")
+        print(f"After {results['inserts']} inserts:   {results['incremental_seconds'] * 1000:10.1f} ms")
+        if not results["consistent"]:
+            print("The incrementally updated forecast differs from a full rebuild!")
+            return 1
+        print("The incrementally updated forecast matches a full rebuild.")
+    elif args.command == "dedup":
+        results = benchmark_dedup(args.rows)
+        print(
+            f"Fingerprinted {results['backfilled']} existing rows in {results['backfill_seconds']:.2f}s "
+            f"({results['backfilled'] / max(results['backfill_seconds'], 1e-9):.0f} rows/sec)."
+        )
+        print(
+            f"Import of {results['file_rows']} rows: {results['allow_rows_per_sec']:.0f} rows/sec allowing duplicates, "
+            f"{results['skip_rows_per_sec']:.0f} rows/sec skipping them."
+        )
+        print(f"Skipped {results['skipped_duplicates']} duplicates and imported {results['skipped_imported']} new rows.")
+        print(
+            f"Scanned {results['scan_rows']} rows in {results['scan_seconds']:.2f}s and found "
+            f"{results['extra_entries']} new duplicate entries (expected {results['file_rows']})."
+        )
+        if (
+            results["skipped_duplicates"] != results["expected_duplicates"]
+            or results["skipped_imported"] != results["expected_new"]
+            or results["extra_entries"] != results["file_rows"]
+        ):
+            return 1
+    elif args.command == "archive":
+        results = benchmark_archive(args.rows, args.years)
+        print(f"Archived {len(results['archived'])} years in {results['archive_seconds']:.2f}s.")
+        print("{:<30} {:>10} {:>10} {:>10} {:>10}".format("Query", "Rows", "Before ms", "Rows", "After ms"))
+        for name, before in results["before"].items():
+            after = results["after"][name]
+            print(
+                "{:<30} {:>10} {:>10.2f} {:>10} {:>10.2f}".format(name, before["rows"], before["ms"], after["rows"], after["ms"])
+            )
+        for name, before_bytes, after_bytes in results["compacted"]:
+            print(f"{name}: {before_bytes / 1024:.0f} KB -> {after_bytes / 1024:.0f} KB after VACUUM")
+        if not results["consistent"]:
+            print("History, rollup or goals changed while archiving!")
+            return 1
+        print("History totals, rollup and goals are unchanged.")
+    elif args.command in ("indexes", "category-cache"):
+        with scratch_ledger(args.rows if args.ledger is None else None) as (path, _):
+            if args.ledger is not None:
+                path = copy_ledger(args.ledger, os.path.dirname(path))
+            with BudgetRepository(path) as repository:
+                if args.command == "indexes":
+                    results = repository.check_query_plans()
+                    for name, plan, uses_index in results:
+                        print(f"{'OK ' if uses_index else 'SCAN'} {name:<25} {plan}")
+                    if not all(uses_index for _, _, uses_index in results):
+                        return 1
+                else:
+                    differences = repository.check_category_cache()
+                    for name, cached_id, stored_id in differences:
+                        print(f"Category '{name}': cached id {cached_id}, stored id {stored_id}")
+                    stats = repository.category_cache_stats
+                    print(f"Category cache: {stats['hits']} hits, {stats['misses']} misses, {stats['loads']} loads.")
+                    if differences:
+                        return 1
+                    print("Category cache is consistent.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
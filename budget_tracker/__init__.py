@@ -0,0 +1,86 @@
+# Budget Tracker: an importable ledger API with the menu and the command line
+# in "Budget Tracking App.py" as a thin front end over it
+
+from .alerts import (
+    BUDGET_ALERT_THRESHOLDS,
+    BudgetAlertMonitor,
+    ConsoleAlertSink,
+    LogFileAlertSink,
+    WebhookAlertSink,
+    format_budget_alert,
+)
+from .api import (
+    API_MAX_BODY,
+    API_WORKERS,
+    HTTP_STATUS,
+    HttpError,
+    LedgerServer,
+    read_http_request,
+    send_json,
+    send_text,
+    serve,
+)
+from .consolidate import (
+    consolidate_ledgers,
+    consolidated_report_rows,
+    export_consolidated_report,
+    merge_ledger_summaries,
+    summarize_ledger,
+)
+from .forecast import (
+    FORECAST_MAX_MONTHS,
+    FORECAST_MIN_MONTHS,
+    FORECAST_SEASONAL_MONTHS,
+    FORECAST_SMOOTHING,
+    CashFlowForecast,
+)
+from .memory import MEMORY_COLUMNS, MEMORY_KEY_SCALE, InMemoryLedger, LedgerColumns, LedgerRecord, epoch_day
+from .money import (
+    CURRENCY_EXPONENTS,
+    DEFAULT_CURRENCY,
+    MAX_MINOR_UNITS,
+    format_money,
+    normalize_category_name,
+    normalize_currency,
+    parse_amount,
+    to_minor_units,
+    transaction_fingerprint,
+)
+from .pool import WRITE_BATCH_SIZE, WRITE_RETRIES, WRITE_RETRY_DELAY, LedgerPool
+from .profiling import PROFILE_LATENCY_BUCKETS, PROFILE_PROGRESS_STEPS, LedgerProfiler, instrumented
+from .query import (
+    API_PAGE_SIZE,
+    LEDGER_ROW_FORMAT,
+    PAGE_SIZE,
+    QUERY_SORT_COLUMNS,
+    LedgerQuery,
+    build_ledger_sql,
+    print_ledger_rows,
+)
+from .recurring import (
+    RECURRING_MONTHS,
+    RECURRING_WEEKDAYS,
+    compile_recurring_schedule,
+    parse_schedule_field,
+    recurring_occurrences,
+)
+from .repository import (
+    BUSY_TIMEOUT,
+    DATABASE_PATH,
+    DAYS_PER_MONTH,
+    DEFAULT_STORAGE_PROFILE,
+    DUPLICATE_MODES,
+    IMPORT_CHUNK_SIZE,
+    STATEMENT_CACHE_SIZE,
+    STORAGE_PROFILES,
+    BudgetRepository,
+    read_import_chunks,
+)
+from .schema import ARCHIVE_FILE_FORMAT, ARCHIVE_TABLES, GOAL_PROGRESS_SQL, INDEXED_QUERIES, MIGRATIONS
+from .snapshot import (
+    SNAPSHOT_FORMAT_VERSION,
+    SNAPSHOT_MANIFEST,
+    SNAPSHOT_MISSING_DAY,
+    load_snapshot,
+    summarize_snapshot,
+)
@@ -0,0 +1,172 @@
+# Budget threshold alerts and the sinks they are sent to
+
+import json
+
+from .money import format_money
+
+
+# Percentages of a category budget that raise a budget alert when crossed
+BUDGET_ALERT_THRESHOLDS = (50, 80, 100)
+
+
+# Function to turn a budget alert into one readable line
+def format_budget_alert(alert):
+    return (
+        f"Budget alert: '{alert['category']}' has used {alert['percent']}% of its {alert['month']} budget "
+        f"({format_money(alert['spent'], alert['currency'])} of "
+        f"{format_money(alert['budget'], alert['currency'])} {alert['currency']})."
+    )
+
+
+# Alert sink that prints each alert
+class ConsoleAlertSink:
+    def send(self, alert):
+        print(format_budget_alert(alert))
+
+
+# Alert sink that appends each alert to a log file as one JSON line
+class LogFileAlertSink:
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(alert) + "\n")
+
+
+# Alert sink that POSTs each alert as JSON to a webhook, such as benchmarks/bench.py webhook-stub
+class WebhookAlertSink:
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alert).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+# Budget alerts evaluated on every expense write
+# Running totals per (category, currency, month) are kept in memory, so each
+# check is a dictionary update instead of a SUM query; a total is read from
+# the monthly rollup only the first time its key is touched. Alerts wait in
+# pending until the write commits and are dropped if it rolls back
+class BudgetAlertMonitor:
+    def __init__(self, repository, sinks, thresholds=BUDGET_ALERT_THRESHOLDS):
+        self.repository = repository
+        self.sinks = list(sinks)
+        self.thresholds = tuple(sorted(thresholds))
+        self.budgets = None
+        self.category_names = {}
+        self.totals = {}
+        self.levels = {}
+        self.pending = []
+        self.stats = {"checks": 0, "alerts": 0, "loads": 0}
+
+    # Function to load the latest budget of every category and currency
+    def load_budgets(self):
+        budget_cursor = self.repository.conn.cursor()
+        budget_cursor.execute(
+            """
+            SELECT b.category_id, b.currency, b.budget_amount, c.name
+            FROM budgets b
+            JOIN categories c ON c.id = b.category_id
+            WHERE b.id = (SELECT MAX(id) FROM budgets WHERE category_id = b.category_id AND currency = b.currency)
+            """
+        )
+        self.budgets = {}
+        for category_id, currency, budget_amount, name in budget_cursor.fetchall():
+            self.budgets[(category_id, currency)] = budget_amount
+            self.category_names[category_id] = name
+        budget_cursor.close()
+
+    # Function to find the highest threshold a total has reached
+    def level(self, total, budget):
+        reached = 0
+        for threshold in self.thresholds:
+            if total * 100 >= threshold * budget:
+                reached = threshold
+        return reached
+
+    # Function to check one expense
+    # written tells whether the expense is already in the monthly rollup;
+    # bulk writers check rows before their executemany and pass False
+    def record(self, category_id, currency, date, amount, written=True):
+        if self.budgets is None:
+            self.load_budgets()
+        budget = self.budgets.get((category_id, currency))
+        if not budget:
+            return
+        self.stats["checks"] += 1
+
+        key = (category_id, currency, str(date)[:7])
+        total = self.totals.get(key)
+        if total is None:
+            self.repository.cursor.execute(
+                "SELECT total FROM monthly_category_totals WHERE category_id = ? AND month = ? AND currency = ?",
+                (category_id, key[2], currency),
+            )
+            row = self.repository.cursor.fetchone()
+            previous = row[0] if row is not None else 0
+            if written:
+                previous -= amount
+            self.levels[key] = self.level(previous, budget)
+            self.stats["loads"] += 1
+            total = previous + amount
+        else:
+            total += amount
+        self.totals[key] = total
+
+        level = self.level(total, budget)
+        if level > self.levels[key]:
+            self.pending.append(
+                {
+                    "category": self.category_names.get(category_id, str(category_id)),
+                    "currency": currency,
+                    "month": key[2],
+                    "threshold": level,
+                    "percent": total * 100 // budget,
+                    "spent": total,
+                    "budget": budget,
+                }
+            )
+        self.levels[key] = level
+
+    # Function to pick up a new budget; totals of that category are reloaded on next use
+    def budget_changed(self, category_id, currency, budget_amount):
+        if self.budgets is None:
+            return
+        self.budgets[(category_id, currency)] = budget_amount
+        for key in [key for key in self.totals if key[0] == category_id and key[1] == currency]:
+            del self.totals[key]
+            del self.levels[key]
+
+    # Function to send the pending alerts once their writes are committed
+    # A failing sink is reported but never fails the write
+    def flush(self):
+        alerts, self.pending = self.pending, []
+        for alert in alerts:
+            self.stats["alerts"] += 1
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                except Exception as error:
+                    print(f"Warning: {type(sink).__name__} could not send a budget alert: {error}")
+
+    # Function to drop pending alerts and cached totals after a rollback
+    def discard(self):
+        self.pending = []
+        self.invalidate()
+
+    # Function to forget cached state after expenses or budgets change behind the monitor
+    def invalidate(self):
+        self.budgets = None
+        self.totals = {}
+        self.levels = {}
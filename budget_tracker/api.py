@@ -0,0 +1,379 @@
+# Asyncio HTTP/JSON API over a ledger file
+
+import asyncio
+import datetime
+import decimal
+import functools
+import json
+import urllib.parse
+
+from .money import format_money, normalize_category_name, normalize_currency, parse_amount, to_minor_units
+from .pool import LedgerPool
+from .query import API_PAGE_SIZE
+from .repository import DATABASE_PATH
+
+
+# Threads available to the HTTP API for SQLite reads
+API_WORKERS = 8
+
+# Largest request body the HTTP API accepts, in bytes
+API_MAX_BODY = 1024 * 1024
+
+# Reason phrases for the status codes the HTTP API sends
+HTTP_STATUS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# Error raised by request handlers to send a status code and message
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Error raised when a streamed response fails after its headers went out
+# The connection is dropped, since a second response would corrupt the exchange
+class _StreamAborted(Exception):
+    pass
+
+
+# Function to read one HTTP/1.1 request from a stream
+# Returns (method, path, query, headers, body) or None when the client closed
+# Raises HttpError for a malformed request or a body over API_MAX_BODY
+async def read_http_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line.")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(400, f"Invalid Content-Length '{headers['content-length']}'.")
+    if length > API_MAX_BODY:
+        raise HttpError(413, f"Request body is larger than {API_MAX_BODY} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    url = urllib.parse.urlsplit(target)
+    query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+    return method.upper(), url.path.rstrip("/") or "/", query, headers, body
+
+
+# Function to write a complete JSON response
+async def send_json(writer, status, payload, keep_alive=True):
+    await send_text(writer, status, json.dumps(payload), keep_alive, "application/json")
+
+
+# Function to write a complete text response
+async def send_text(writer, status, text, keep_alive=True, content_type="text/plain; charset=utf-8"):
+    body = text.encode("utf-8")
+    writer.write(
+        (
+            f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1")
+        + body
+    )
+    await writer.drain()
+
+
+# Asyncio HTTP/JSON front end over a ledger file
+# SQLite reads run on a bounded thread pool through LedgerPool readers and
+# writes go through the pool's writer queue, so the event loop never blocks
+# Routes: GET/POST /expenses, /income, /budgets, /goals and /categories
+# With instrument=True, GET /metrics returns the pool's counters as Prometheus
+# text, or as JSON with ?format=json
+# Amounts are sent as decimal strings in major units next to their currency;
+# posted JSON numbers are parsed as Decimal so no float rounding creeps in
+class LedgerServer:
+    def __init__(
+        self, path=DATABASE_PATH, host="127.0.0.1", port=8080, workers=API_WORKERS, alert_sinks=None, instrument=False
+    ):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.alert_sinks = alert_sinks
+        self.instrument = instrument
+        self.pool = None
+        self.executor = None
+        self.server = None
+
+    # Function to open the ledger and start listening
+    async def start(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ledger-api")
+        self.pool = await loop.run_in_executor(
+            self.executor,
+            functools.partial(LedgerPool, self.path, alert_sinks=self.alert_sinks, instrument=self.instrument),
+        )
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    # Function to stop listening and close the ledger
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.pool.close)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    # Function to run a read against the calling worker thread's repository
+    async def _read(self, method_name, *args):
+        def run():
+            return getattr(self.pool.reader(), method_name)(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_http_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as error:
+                    await send_json(writer, error.status, {"error": str(error)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(writer, method, path, query, body, keep_alive)
+                except _StreamAborted:
+                    break
+                except HttpError as error:
+                    await send_json(writer, error.status, {"error": str(error)}, keep_alive)
+                except ValueError as error:
+                    await send_json(writer, 400, {"error": str(error)}, keep_alive)
+                except Exception as error:
+                    await send_json(writer, 500, {"error": str(error)}, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _dispatch(self, writer, method, path, query, body, keep_alive):
+        if path == "/metrics" and self.instrument:
+            if method != "GET":
+                raise HttpError(405, f"Method {method} is not allowed.")
+            output_format = "json" if query.get("format") == "json" else "prometheus"
+            content_type = "application/json" if output_format == "json" else "text/plain; version=0.0.4; charset=utf-8"
+            await send_text(writer, 200, self.pool.metrics().dump(output_format), keep_alive, content_type)
+            return
+
+        routes = {
+            "/expenses": (self._list_expenses, self._add_expense),
+            "/income": (self._list_income, self._add_income),
+            "/budgets": (self._list_budgets, self._set_budget),
+            "/goals": (self._list_goals, self._add_goal),
+            "/categories": (self._list_categories, self._add_category),
+        }
+        if path not in routes:
+            raise HttpError(404, f"Unknown path '{path}'.")
+        list_handler, add_handler = routes[path]
+
+        if method == "GET":
+            await list_handler(writer, query, keep_alive)
+        elif method == "POST":
+            try:
+                data = json.loads(body or b"{}", parse_float=decimal.Decimal)
+            except json.JSONDecodeError:
+                raise HttpError(400, "Request body must be JSON.")
+            if not isinstance(data, dict):
+                raise HttpError(400, "Request body must be a JSON object.")
+            await send_json(writer, 201, await add_handler(data), keep_alive)
+        else:
+            raise HttpError(405, f"Method {method} is not allowed.")
+
+    # Function to stream a keyset-paged listing as a chunked JSON array
+    # Only one page is held in memory however long the listing is
+    async def _stream_listing(self, writer, kind, query, keep_alive):
+        category_name = query.get("category")
+        after = None
+        if query.get("from"):
+            try:
+                after = (datetime.date.fromisoformat(query["from"]).isoformat(), 0)
+            except ValueError:
+                raise HttpError(400, "Query parameter 'from' must be a date in YYYY-MM-DD format.") from None
+        limit = None
+        if query.get("limit"):
+            try:
+                limit = int(query["limit"])
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                raise HttpError(400, "Query parameter 'limit' must be a positive whole number.")
+
+        writer.write(
+            (
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/json\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+        )
+
+        def write_chunk(data):
+            writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+
+        try:
+            write_chunk(b"[")
+            sent = 0
+            while limit is None or sent < limit:
+                page_size = API_PAGE_SIZE if limit is None else min(API_PAGE_SIZE, limit - sent)
+                rows = await self._read("fetch_ledger_page", kind, after, None, page_size, category_name)
+                if not rows:
+                    break
+                items = ",".join(
+                    json.dumps(
+                        {
+                            "id": row_id,
+                            "category": category,
+                            "amount": format_money(amount, currency),
+                            "currency": currency,
+                            "date": date,
+                        }
+                    )
+                    for row_id, category, amount, date, currency in rows
+                )
+                write_chunk(("," if sent else "").encode("utf-8") + items.encode("utf-8"))
+                await writer.drain()
+                sent += len(rows)
+                after = (rows[-1][3], rows[-1][0])
+            write_chunk(b"]")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except Exception as error:
+            raise _StreamAborted(str(error)) from error
+
+    async def _list_expenses(self, writer, query, keep_alive):
+        await self._stream_listing(writer, "expense", query, keep_alive)
+
+    async def _list_income(self, writer, query, keep_alive):
+        await self._stream_listing(writer, "income", query, keep_alive)
+
+    async def _list_budgets(self, writer, query, keep_alive):
+        budgets = await self._read("list_budgets")
+        await send_json(
+            writer,
+            200,
+            [
+                {"category": name, "amount": format_money(amount, currency), "currency": currency}
+                for name, amount, currency in budgets
+            ],
+            keep_alive,
+        )
+
+    async def _list_goals(self, writer, query, keep_alive):
+        goals = await self._read("list_goals")
+        await send_json(
+            writer,
+            200,
+            [
+                {
+                    "id": goal_id,
+                    "name": name,
+                    "target_amount": format_money(target, currency),
+                    "progress_amount": format_money(progress, currency),
+                    "currency": currency,
+                    "date": date,
+                }
+                for goal_id, name, target, progress, date, currency in goals
+            ],
+            keep_alive,
+        )
+
+    async def _list_categories(self, writer, query, keep_alive):
+        categories = await self._read("load_category_map")
+        await send_json(writer, 200, sorted(categories, key=categories.get), keep_alive)
+
+    async def _add_expense(self, data):
+        expense_id = await asyncio.wrap_future(
+            self.pool.add_expense(
+                _field(data, "category"), parse_amount(_field(data, "amount")), _field(data, "date"), data.get("currency")
+            )
+        )
+        return {"id": expense_id}
+
+    async def _add_income(self, data):
+        income_id = await asyncio.wrap_future(
+            self.pool.add_income(
+                _field(data, "category"), parse_amount(_field(data, "amount")), _field(data, "date"), data.get("currency")
+            )
+        )
+        return {"id": income_id}
+
+    async def _set_budget(self, data):
+        currency = normalize_currency(data.get("currency"))
+        amount = to_minor_units(_field(data, "amount"), currency)
+        await asyncio.wrap_future(
+            self.pool.set_budget(_field(data, "category"), format_money(amount, currency), currency)
+        )
+        return {
+            "category": normalize_category_name(data["category"]),
+            "amount": format_money(amount, currency),
+            "currency": currency,
+        }
+
+    async def _add_goal(self, data):
+        goal_id = await asyncio.wrap_future(
+            self.pool.set_financial_goal(
+                _field(data, "name"),
+                parse_amount(_field(data, "target_amount")),
+                _field(data, "date"),
+                data.get("kind"),
+                data.get("category"),
+                data.get("start_date"),
+                data.get("currency"),
+            )
+        )
+        return {"id": goal_id}
+
+    async def _add_category(self, data):
+        category_id = await asyncio.wrap_future(self.pool.add_category(_field(data, "name")))
+        return {"id": category_id, "name": normalize_category_name(data["name"])}
+
+
+# Function to read a required field from a JSON request body
+def _field(data, name):
+    if data.get(name) in (None, ""):
+        raise HttpError(400, f"Missing field '{name}'.")
+    return data[name]
+
+
+# Function to serve the HTTP API until interrupted
+def serve(path=DATABASE_PATH, host="127.0.0.1", port=8080, workers=API_WORKERS, alert_sinks=None, instrument=False):
+    async def run():
+        server = await LedgerServer(path, host, port, workers, alert_sinks, instrument).start()
+        print(f"Serving {path} on http://{server.host}:{server.port}")
+        try:
+            await server.server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Server stopped.")
+
@@ -0,0 +1,150 @@
+# Consolidated report over a directory of ledger files
+
+import csv
+import json
+import os
+import pathlib
+import sqlite3
+import time
+
+from .money import format_money
+from .repository import BudgetRepository
+
+
+# Function to total one ledger file for a consolidated report
+# Runs in a worker process with its own read-only connection: expense totals
+# come straight from the monthly rollup, income is totalled per category and
+# month, and the latest budget of every category and currency is read.
+# The result holds only plain tuples, so it pickles cheaply back to the parent
+def summarize_ledger(path):
+    start = time.perf_counter()
+    summary = {"path": path, "expenses": [], "income": [], "budgets": [], "error": None}
+    repository = BudgetRepository(path, read_only=True)
+    try:
+        repository.cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'monthly_category_totals'"
+        )
+        if not repository.cursor.fetchone()[0]:
+            summary["error"] = "not a migrated ledger"
+            return summary
+        repository.cursor.execute(
+            """
+            SELECT c.name, t.month, t.currency, t.total, t.entry_count
+            FROM monthly_category_totals t JOIN categories c ON c.id = t.category_id
+            """
+        )
+        summary["expenses"] = repository.cursor.fetchall()
+        repository.cursor.execute(
+            f"""
+            SELECT category_key, substr(date, 1, 7), currency, SUM(amount), COUNT(*)
+            FROM {repository.history_table("income")}
+            GROUP BY category_key, substr(date, 1, 7), currency
+            """
+        )
+        summary["income"] = repository.cursor.fetchall()
+        repository.cursor.execute(
+            """
+            SELECT c.name, b.currency, b.budget_amount
+            FROM budgets b JOIN categories c ON c.id = b.category_id
+            WHERE b.id = (SELECT MAX(id) FROM budgets WHERE category_id = b.category_id AND currency = b.currency)
+            """
+        )
+        summary["budgets"] = repository.cursor.fetchall()
+    except sqlite3.Error as error:
+        summary["error"] = str(error)
+    finally:
+        repository.close()
+        summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+# Function to merge ledger summaries into one consolidated report
+# Totals are keyed by (category, month, currency) and hold [total, entries, ledgers];
+# the combined budget of a category is the sum of the budgets of every ledger
+def merge_ledger_summaries(summaries):
+    report = {"ledgers": 0, "failed": [], "expenses": {}, "income": {}, "budgets": {}}
+    for summary in summaries:
+        if summary["error"] is not None:
+            report["failed"].append((summary["path"], summary["error"]))
+            continue
+        report["ledgers"] += 1
+        for kind in ("expenses", "income"):
+            totals = report[kind]
+            for category, month, currency, total, entries in summary[kind]:
+                cell = totals.setdefault((category, month, currency), [0, 0, 0])
+                cell[0] += total
+                cell[1] += entries
+                cell[2] += 1
+        for category, currency, budget_amount in summary["budgets"]:
+            report["budgets"][(category, currency)] = report["budgets"].get((category, currency), 0) + budget_amount
+    return report
+
+
+# Function to build the consolidated report of every ledger file in a directory
+# Ledgers are summarized in parallel by a process pool, several per task so
+# that small ledgers do not drown in messaging; workers=1 runs them in this process
+def consolidate_ledgers(directory, workers=None, pattern="*.db"):
+    from concurrent.futures import ProcessPoolExecutor
+
+    paths = sorted(str(path) for path in pathlib.Path(directory).glob(pattern) if path.is_file())
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1 or len(paths) < 2:
+        summaries = [summarize_ledger(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            summaries = list(
+                executor.map(summarize_ledger, paths, chunksize=max(1, len(paths) // (workers * 4)))
+            )
+    report = merge_ledger_summaries(summaries)
+    report["files"] = len(paths)
+    report["workers"] = workers
+    report["seconds"] = time.perf_counter() - start
+    report["worker_seconds"] = sum(summary["seconds"] for summary in summaries)
+    return report
+
+
+# Function to list the rows of a consolidated report, optionally for one month
+# Rows are (kind, category, month, currency, total, entries, ledgers, budget, percent used)
+# Budget and percent used are None for income and for expenses without a budget
+def consolidated_report_rows(report, month=None):
+    rows = []
+    for kind, totals in (("expense", report["expenses"]), ("income", report["income"])):
+        for (category, row_month, currency), (total, entries, ledgers) in sorted(totals.items()):
+            if month is not None and row_month != month:
+                continue
+            budget = report["budgets"].get((category, currency)) if kind == "expense" else None
+            percent_used = total / budget * 100 if budget else None
+            rows.append((kind, category, row_month, currency, total, entries, ledgers, budget, percent_used))
+    return rows
+
+
+# Function to export a consolidated report as JSON, or as CSV for any other extension
+# Amounts are written in major units
+def export_consolidated_report(report, path, month=None):
+    fields = ["kind", "category", "month", "currency", "total", "entries", "ledgers", "budget", "percent_used"]
+    records = []
+    for kind, category, row_month, currency, total, entries, ledgers, budget, percent_used in consolidated_report_rows(
+        report, month
+    ):
+        records.append(
+            {
+                "kind": kind,
+                "category": category,
+                "month": row_month,
+                "currency": currency,
+                "total": format_money(total, currency),
+                "entries": entries,
+                "ledgers": ledgers,
+                "budget": None if budget is None else format_money(budget, currency),
+                "percent_used": None if percent_used is None else round(percent_used, 1),
+            }
+        )
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if path.lower().endswith(".json"):
+            json.dump({"ledgers": report["ledgers"], "failed": report["failed"], "rows": records}, file, indent=2)
+        else:
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(records)
+    return len(records)
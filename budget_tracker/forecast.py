@@ -0,0 +1,155 @@
+# Cash flow forecast over the monthly totals of a ledger
+
+
+# Cash flow forecasts run from 3 to 12 months ahead
+# Smoothing is the weight of the latest month in the exponentially smoothed level;
+# seasonal indexes by calendar month need at least two complete years of history
+FORECAST_MIN_MONTHS = 3
+FORECAST_MAX_MONTHS = 12
+FORECAST_SMOOTHING = 0.3
+FORECAST_SEASONAL_MONTHS = 24
+
+
+# Cash flow forecast for one currency, kept up to date incrementally
+# History is held as int64 matrices of minor units per category: one column per
+# month and one per day of the month. New rows are folded in with np.add.at,
+# so bringing the forecast up to date costs only the rows written since the
+# last update. Income and expense categories are kept apart as (kind, name)
+class CashFlowForecast:
+    def __init__(self, currency, smoothing=FORECAST_SMOOTHING):
+        import numpy as np
+
+        self.currency = currency
+        self.smoothing = smoothing
+        self.categories = []
+        self.category_codes = {}
+        self.first_month = None
+        self.monthly = np.zeros((0, 0), dtype=np.int64)
+        self.day_of_month = np.zeros((0, 31), dtype=np.int64)
+        self.last_ids = {"expense": 0, "income": 0}
+        self.totals = {"expense": (0, 0), "income": (0, 0)}
+
+    # Function to give the (rows, total) seen so far for expenses and income
+    # Compared with the ledger to notice edits and deletes, which need a rebuild
+    def signature(self):
+        return self.totals["expense"] + self.totals["income"]
+
+    # Function to get the row of a category in the history matrices, adding it on first use
+    def category_code(self, kind, name):
+        code = self.category_codes.get((kind, name))
+        if code is None:
+            code = self.category_codes[(kind, name)] = len(self.categories)
+            self.categories.append((kind, name))
+        return code
+
+    # Function to grow the history matrices to every category and to the months first..last
+    def extend(self, first, last):
+        import numpy as np
+
+        if self.first_month is None:
+            self.first_month = first
+        before = max(self.first_month - first, 0)
+        after = max(last - (self.first_month + self.monthly.shape[1] - 1), 0)
+        new_rows = len(self.categories) - self.monthly.shape[0]
+        if before or after or new_rows:
+            self.monthly = np.pad(self.monthly, ((0, new_rows), (before, after)))
+            self.day_of_month = np.pad(self.day_of_month, ((0, new_rows), (0, 0)))
+            self.first_month -= before
+
+    # Function to fold rows into the history
+    # Rows are (category, epoch day or None, amount, row count, highest id) per
+    # category and day; rows with a date SQLite cannot read are counted but not placed
+    def add_rows(self, kind, rows):
+        import numpy as np
+
+        if not rows:
+            return
+        count, total = self.totals[kind]
+        self.totals[kind] = (count + sum(row[3] for row in rows), total + sum(row[2] for row in rows))
+        self.last_ids[kind] = max(self.last_ids[kind], max(row[4] for row in rows))
+
+        dated = [row for row in rows if row[1] is not None]
+        if not dated:
+            return
+        codes = np.fromiter((self.category_code(kind, row[0]) for row in dated), dtype=np.int64, count=len(dated))
+        days = np.fromiter((row[1] for row in dated), dtype=np.int64, count=len(dated)).astype("datetime64[D]")
+        amounts = np.fromiter((row[2] for row in dated), dtype=np.int64, count=len(dated))
+        month_starts = days.astype("datetime64[M]")
+        months = month_starts.astype(np.int64)
+        self.extend(int(months.min()), int(months.max()))
+        np.add.at(self.monthly, (codes, months - self.first_month), amounts)
+        np.add.at(self.day_of_month, (codes, (days - month_starts.astype("datetime64[D]")).astype(np.int64)), amounts)
+
+    # Function to project every category day by day from tomorrow to the end of
+    # the month that is months after the current one
+    # Each category's monthly total is its exponentially smoothed level over the
+    # complete months, deseasonalized by calendar month once there are two years
+    # of history, times the seasonal index of the month ahead. Months are spread
+    # over their days by the category's own day-of-month profile, so rent stays
+    # on the first and salary on payday. The level is one weighted sum per
+    # category: weight a(1-a)^k for the month k months back, the rest on the first
+    # Amounts are floats in minor units; income is positive and expenses negative
+    def project(self, today, months):
+        import numpy as np
+
+        category_count = len(self.categories)
+        day = np.datetime64(today, "D")
+        current_month = int(day.astype("datetime64[M]").astype(np.int64))
+        first_month = current_month if self.first_month is None else self.first_month
+        complete = max(current_month - first_month, 0)
+        history = np.zeros((category_count, complete))
+        recorded = min(complete, self.monthly.shape[1])
+        history[:, :recorded] = self.monthly[:, :recorded]
+
+        seasonal = np.ones((category_count, 12))
+        level = np.zeros(category_count)
+        if complete:
+            calendar_months = (first_month + np.arange(complete)) % 12
+            if complete >= FORECAST_SEASONAL_MONTHS:
+                month_sums = history @ np.eye(12)[calendar_months]
+                month_means = month_sums / np.bincount(calendar_months, minlength=12)
+                overall = history.mean(axis=1, keepdims=True)
+                seasonal = np.divide(month_means, overall, out=np.ones_like(month_means), where=overall > 0)
+            factors = seasonal[:, calendar_months]
+            deseasonalized = np.divide(history, factors, out=np.zeros_like(history), where=factors > 0)
+            weights = self.smoothing * (1 - self.smoothing) ** np.arange(complete - 1, -1, -1)
+            weights[0] = (1 - self.smoothing) ** (complete - 1)
+            level = deseasonalized @ weights
+
+        horizon = current_month + np.arange(months + 1)
+        monthly_forecast = level[:, None] * seasonal[:, horizon % 12]
+
+        days = np.arange(day + 1, np.datetime64(int(horizon[-1]) + 1, "M").astype("datetime64[D]"))
+        day_months = days.astype("datetime64[M]")
+        month_index = day_months.astype(np.int64) - current_month
+        day_index = (days - day_months.astype("datetime64[D]")).astype(np.int64)
+        month_lengths = ((day_months + 1).astype("datetime64[D]") - day_months.astype("datetime64[D]")).astype(np.int64)
+
+        # Day-of-month shares for months of 28 to 31 days; later days fold into the last one
+        profiles = np.zeros((4, category_count, 31))
+        for length in range(28, 32):
+            profile = self.day_of_month[:, :length].astype(np.float64)
+            profile[:, length - 1] += self.day_of_month[:, length:].sum(axis=1)
+            totals = profile.sum(axis=1, keepdims=True)
+            profiles[length - 28, :, :length] = np.divide(
+                profile, totals, out=np.full_like(profile, 1.0 / length), where=totals > 0
+            )
+        shares = profiles[month_lengths - 28, :, day_index].T
+
+        signs = np.array([1.0 if kind == "income" else -1.0 for kind, _ in self.categories])
+        flows = monthly_forecast[:, month_index] * shares * signs[:, None]
+        cumulative = np.cumsum(flows, axis=1)
+        opening = self.totals["income"][1] - self.totals["expense"][1]
+        return {
+            "currency": self.currency,
+            "today": str(day),
+            "opening": opening,
+            "categories": list(self.categories),
+            "months": [str(np.datetime64(int(month), "M")) for month in horizon],
+            "monthly_forecast": monthly_forecast,
+            "month_flows": flows @ np.eye(months + 1)[month_index],
+            "month_ends": np.searchsorted(month_index, np.arange(months + 1), side="right") - 1,
+            "days": days,
+            "cumulative": cumulative,
+            "balance": opening + cumulative.sum(axis=0),
+        }
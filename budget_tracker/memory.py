@@ -0,0 +1,419 @@
+# Opt-in in-memory columnar copy of the ledger for repeated reads
+
+import sys
+import time
+
+from .money import normalize_category_name, to_minor_units
+from .query import PAGE_SIZE
+
+
+# Columns of the in-memory ledger and their NumPy types: order holds the row
+# positions in (date, id) order and sorted_key their day * MEMORY_KEY_SCALE + id
+MEMORY_COLUMNS = {
+    "id": "int64",
+    "amount": "int64",
+    "day": "int32",
+    "category": "int32",
+    "currency": "int16",
+    "order": "int64",
+    "sorted_key": "int64",
+}
+MEMORY_KEY_SCALE = 2**40
+
+
+# Function to turn a YYYY-MM-DD date into days since 1970-01-01
+# Raises ValueError for anything else
+def epoch_day(date):
+    import datetime
+
+    return datetime.date.fromisoformat(str(date)).toordinal() - 719163
+
+
+# Read-only view of one row of an in-memory ledger table
+# Only the table and the row position are stored; the fields are read from the
+# columns on access. Iterating gives (id, category, amount, date, currency)
+# like a SQLite row, so the listing functions take either
+class LedgerRecord:
+    __slots__ = ("table", "position")
+
+    def __init__(self, table, position):
+        self.table = table
+        self.position = position
+
+    @property
+    def id(self):
+        return int(self.table.arrays["id"][self.position])
+
+    @property
+    def category(self):
+        return self.table.categories[self.table.arrays["category"][self.position]]
+
+    @property
+    def amount(self):
+        return int(self.table.arrays["amount"][self.position])
+
+    @property
+    def date(self):
+        return self.table.date_text(int(self.table.arrays["day"][self.position]))
+
+    @property
+    def currency(self):
+        return self.table.currencies[self.table.arrays["currency"][self.position]]
+
+    def __iter__(self):
+        return iter((self.id, self.category, self.amount, self.date, self.currency))
+
+    def __len__(self):
+        return 5
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __repr__(self):
+        return f"LedgerRecord{tuple(self)}"
+
+
+# Columns of one in-memory ledger table, "expense" or "income"
+# Every column in MEMORY_COLUMNS is a NumPy array that grows by doubling, so
+# appending a few rows does not copy the table. Category names, currencies and
+# date strings are interned once and rows hold their codes. Rows are stored
+# in id order; order and sorted_key give the (date, id) order used for paging
+class LedgerColumns:
+    def __init__(self, kind):
+        import numpy as np
+
+        self.kind = kind
+        self.size = 0
+        self.arrays = {name: np.zeros(0, dtype=dtype) for name, dtype in MEMORY_COLUMNS.items()}
+        self.categories = []
+        self.category_codes = {}
+        self.currencies = []
+        self.currency_codes = {}
+        self.dates = {}
+        self.last_id = 0
+        self.regular = True
+        self.pending = False
+        self.sorted_categories = None
+
+    # Function to get the filled part of a column
+    def column(self, name):
+        return self.arrays[name][: self.size]
+
+    # Function to get the code of an interned name, adding it on first use
+    def intern(self, names, codes, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    # Function to turn an epoch day back into its YYYY-MM-DD string, interned per day
+    def date_text(self, day):
+        import numpy as np
+
+        text = self.dates.get(day)
+        if text is None:
+            text = self.dates[day] = str(np.datetime64(day, "D"))
+        return text
+
+    # Function to append rows of (id, category, amount, epoch day, currency, plain date)
+    # Rows must come in id order after every row already held. When they also
+    # sort after every held row by (date, id), as new entries usually do, the
+    # paging order is extended; otherwise it is sorted again
+    def append(self, rows):
+        import numpy as np
+
+        if not rows:
+            return
+        count = len(rows)
+        new = {
+            "id": np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+            "category": np.fromiter(
+                (self.intern(self.categories, self.category_codes, row[1]) for row in rows), dtype=np.int32, count=count
+            ),
+            "amount": np.fromiter((row[2] for row in rows), dtype=np.int64, count=count),
+            "day": np.fromiter((row[3] or 0 for row in rows), dtype=np.int32, count=count),
+            "currency": np.fromiter(
+                (self.intern(self.currencies, self.currency_codes, row[4]) for row in rows), dtype=np.int16, count=count
+            ),
+        }
+        self.regular = self.regular and all(row[5] for row in rows)
+        keys = new["day"].astype(np.int64) * MEMORY_KEY_SCALE + new["id"]
+
+        start, size = self.size, self.size + count
+        capacity = len(self.arrays["id"])
+        if size > capacity:
+            capacity = max(size, capacity * 2, 1024)
+            for name, array in self.arrays.items():
+                grown = np.zeros(capacity, dtype=array.dtype)
+                grown[:start] = array[:start]
+                self.arrays[name] = grown
+        for name, values in new.items():
+            self.arrays[name][start:size] = values
+
+        in_order = bool(np.all(keys[1:] >= keys[:-1])) and (start == 0 or keys[0] > self.arrays["sorted_key"][start - 1])
+        self.size = size
+        if in_order:
+            self.arrays["order"][start:size] = np.arange(start, size)
+            self.arrays["sorted_key"][start:size] = keys
+        else:
+            all_keys = self.column("day").astype(np.int64) * MEMORY_KEY_SCALE + self.column("id")
+            order = np.argsort(all_keys, kind="stable")
+            self.arrays["order"][:size] = order
+            self.arrays["sorted_key"][:size] = all_keys[order]
+        self.last_id = int(new["id"][-1])
+        self.sorted_categories = None
+
+    # Function to find the category codes whose normalized names are given
+    def category_codes_for(self, names):
+        wanted = {normalize_category_name(name) for name in names}
+        return [code for code, name in enumerate(self.categories) if normalize_category_name(name) in wanted]
+
+    # Function to count the bytes held by the columns and the interned strings
+    def memory_bytes(self):
+        strings = self.categories + self.currencies + list(self.dates.values())
+        interned = sum(sys.getsizeof(text) for text in strings)
+        interned += sys.getsizeof(self.category_codes) + sys.getsizeof(self.currency_codes) + sys.getsizeof(self.dates)
+        return {
+            "columns": sum(array.nbytes for array in self.arrays.values()),
+            "used": sum(array[: self.size].nbytes for array in self.arrays.values()),
+            "interned": interned,
+        }
+
+
+# In-memory copy of the live expenses and income tables for fast repeated reads
+# Write functions mark a table as appended, and rows with higher ids are folded
+# in on its next read, or invalidate it when rows were changed or deleted, and
+# it is loaded again on its next read. Anything the columns cannot answer
+# exactly, such as a date range reaching into archived years or a table with
+# dates that are not plain YYYY-MM-DD, returns None and the caller asks SQLite
+class InMemoryLedger:
+    def __init__(self, repository):
+        self.repository = repository
+        self.tables = {}
+        self.stats = {"loads": 0, "refreshes": 0, "load_seconds": 0.0}
+
+    # Function to note that rows were inserted into a table
+    def appended(self, kind):
+        table = self.tables.get(kind)
+        if table is not None:
+            table.pending = True
+
+    # Function to drop a table, or every table, so it is loaded again on its next read
+    def invalidate(self, kind=None):
+        if kind is None:
+            self.tables = {}
+        else:
+            self.tables.pop(kind, None)
+
+    # Function to read the rows of a table with an id above last_id, in id order
+    def read_rows(self, kind, last_id):
+        cursor = self.repository.cursor
+        if kind == "expense":
+            cursor.execute(
+                """
+                SELECT e.id, c.name, e.amount, CAST(julianday(e.date) - 2440587.5 AS INTEGER), e.currency,
+                       date(e.date) IS e.date
+                FROM expenses e JOIN categories c ON c.id = e.category_id
+                WHERE e.id > ?
+                ORDER BY e.id
+                """,
+                (last_id,),
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT id, category, amount, CAST(julianday(date) - 2440587.5 AS INTEGER), currency,
+                       date(date) IS date
+                FROM income
+                WHERE id > ?
+                ORDER BY id
+                """,
+                (last_id,),
+            )
+        return cursor.fetchall()
+
+    # Function to get the columns of a table, loading it or folding in new rows first
+    def table(self, kind):
+        table = self.tables.get(kind)
+        if table is None:
+            start = time.perf_counter()
+            table = LedgerColumns(kind)
+            table.append(self.read_rows(kind, 0))
+            self.tables[kind] = table
+            self.stats["loads"] += 1
+            self.stats["load_seconds"] += time.perf_counter() - start
+        elif table.pending:
+            table.pending = False
+            table.append(self.read_rows(kind, table.last_id))
+            self.stats["refreshes"] += 1
+        return table
+
+    # Function to answer a LedgerQuery from the columns
+    # Returns LedgerRecords in the order run_query gives, or None
+    def query(self, query):
+        import numpy as np
+
+        live_start = self.repository.live_start_date()
+        if live_start is not None and (query.start_date is None or query.start_date < live_start):
+            return None
+        table = self.table(query.kind)
+        if not table.regular:
+            return None
+        try:
+            start_day = None if query.start_date is None else epoch_day(query.start_date)
+            end_day = None if query.end_date is None else epoch_day(query.end_date)
+        except ValueError:
+            return None
+
+        days = table.column("day")
+        amounts = table.column("amount")
+        mask = np.ones(table.size, dtype=bool)
+        if query.category_names is not None:
+            mask &= np.isin(table.column("category"), table.category_codes_for(query.category_names))
+        currency = query.filter_currency()
+        if currency is not None:
+            mask &= table.column("currency") == table.currency_codes.get(currency, -1)
+        if start_day is not None:
+            mask &= days >= start_day
+        if end_day is not None:
+            mask &= days <= end_day
+        if query.min_amount is not None:
+            mask &= amounts >= to_minor_units(query.min_amount, currency)
+        if query.max_amount is not None:
+            mask &= amounts <= to_minor_units(query.max_amount, currency)
+
+        if query.sort_column == "date":
+            order = table.column("order")
+            positions = order[mask[order]]
+        else:
+            # Rows are stored in id order, so positions already sort by id
+            positions = np.flatnonzero(mask)
+            if query.sort_column == "amount":
+                if query.row_limit is not None and query.row_limit < len(positions):
+                    # Only rows up to the limit-th amount can make it, ties included
+                    values = amounts[positions]
+                    if query.descending:
+                        kth = len(values) - query.row_limit
+                        positions = positions[values >= np.partition(values, kth)[kth]]
+                    else:
+                        positions = positions[values <= np.partition(values, query.row_limit - 1)[query.row_limit - 1]]
+                positions = positions[np.lexsort((table.column("id")[positions], amounts[positions]))]
+        if query.descending:
+            positions = positions[::-1]
+        if query.row_limit is not None:
+            positions = positions[: query.row_limit]
+        return (LedgerRecord(table, position) for position in positions.tolist())
+
+    # Function to fetch one page ordered by (date, id), like fetch_ledger_page
+    # Archived rows are not held in memory, so pages that reach back into them
+    # are left to SQLite
+    # Returns a list of LedgerRecords, or None
+    def page(self, kind, after=None, before=None, page_size=PAGE_SIZE, category_name=None):
+        live_start = self.repository.live_start_date()
+        backwards = after is None and before is not None
+        if live_start is not None and (after[0] < live_start if after is not None else not backwards):
+            return None
+        rows = self.live_page(kind, after, before, page_size, category_name)
+        if rows is not None and live_start is not None and backwards and len(rows) < page_size:
+            return None
+        return rows
+
+    # Function to fetch one page of the live rows held in memory
+    # Returns a list of LedgerRecords, or None
+    def live_page(self, kind, after=None, before=None, page_size=PAGE_SIZE, category_name=None):
+        import numpy as np
+
+        table = self.table(kind)
+        if not table.regular:
+            return None
+        try:
+            bound = after if after is not None else before
+            key = None if bound is None else epoch_day(bound[0]) * MEMORY_KEY_SCALE + int(bound[1])
+        except ValueError:
+            return None
+
+        sorted_keys = table.column("sorted_key")
+        low, high = 0, table.size
+        if after is not None:
+            low = int(np.searchsorted(sorted_keys, key, side="right"))
+        elif before is not None:
+            high = int(np.searchsorted(sorted_keys, key, side="left"))
+        order = table.column("order")
+        backwards = after is None and before is not None
+        if not (category_name and kind == "income"):
+            positions = order[max(high - page_size, low):high] if backwards else order[low:min(low + page_size, high)]
+            return [LedgerRecord(table, position) for position in positions.tolist()]
+
+        # Scan outwards from the bound in growing windows until the page is full
+        if table.sorted_categories is None:
+            table.sorted_categories = table.column("category")[order]
+        codes = table.category_codes_for([category_name])
+        found = []
+        count = 0
+        window = page_size * 16
+        while count < page_size and low < high:
+            if backwards:
+                start = max(high - window, low)
+                matches = start + np.flatnonzero(np.isin(table.sorted_categories[start:high], codes))
+                found.insert(0, matches)
+                high = start
+            else:
+                end = min(low + window, high)
+                matches = low + np.flatnonzero(np.isin(table.sorted_categories[low:end], codes))
+                found.append(matches)
+                low = end
+            count += len(matches)
+            window *= 2
+        indexes = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        indexes = indexes[-page_size:] if backwards else indexes[:page_size]
+        return [LedgerRecord(table, position) for position in order[indexes].tolist()]
+
+    # Function to total one category's expenses in a month and currency
+    # Returns the total in minor units, or None
+    def monthly_spend(self, category_name, month, currency):
+        import numpy as np
+
+        live_start = self.repository.live_start_date()
+        if live_start is not None and f"{month}-01" < live_start:
+            return None
+        table = self.table("expense")
+        if not table.regular:
+            return None
+        try:
+            first_day = epoch_day(f"{month}-01")
+        except ValueError:
+            return None
+        next_month = np.datetime64(month, "M") + 1
+        last_day = int(next_month.astype("datetime64[D]").astype(np.int64)) - 1
+
+        # The month is one slice of the (date, id) order
+        sorted_keys = table.column("sorted_key")
+        low = np.searchsorted(sorted_keys, first_day * MEMORY_KEY_SCALE)
+        high = np.searchsorted(sorted_keys, (last_day + 1) * MEMORY_KEY_SCALE)
+        positions = table.column("order")[low:high]
+        mask = np.isin(table.column("category")[positions], table.category_codes_for([category_name]))
+        mask &= table.column("currency")[positions] == table.currency_codes.get(currency, -1)
+        return int(table.column("amount")[positions[mask]].sum())
+
+    # Function to list every expense with a positive amount in id order
+    # Returns LedgerRecords, or None
+    def pending_expenses(self):
+        import numpy as np
+
+        table = self.table("expense")
+        if not table.regular:
+            return None
+        return (LedgerRecord(table, position) for position in np.flatnonzero(table.column("amount") > 0).tolist())
+
+    # Function to report the rows and memory of every table
+    # Returns {kind: {"rows", "columns", "used", "interned", "bytes_per_row"}}
+    def memory_report(self):
+        report = {}
+        for kind in ("expense", "income"):
+            table = self.table(kind)
+            details = table.memory_bytes()
+            details["rows"] = table.size
+            details["bytes_per_row"] = (details["used"] + details["interned"]) / table.size if table.size else 0.0
+            report[kind] = details
+        return report
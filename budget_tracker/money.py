@@ -0,0 +1,83 @@
+# Money and name helpers shared by the whole package
+# Amounts are stored as integer minor units together with a currency code
+
+import decimal
+import hashlib
+
+
+# Money is stored as integers in the minor unit of its currency (cents for USD)
+# Entries, budgets and goals each carry an ISO 4217 currency code
+DEFAULT_CURRENCY = "USD"
+
+# Minor-unit digits of the currencies that do not use two
+CURRENCY_EXPONENTS = {
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    "CLP": 0, "ISK": 0, "JPY": 0, "KRW": 0, "PYG": 0, "UGX": 0, "VND": 0, "XAF": 0, "XOF": 0,
+}
+
+# Largest amount in minor units that fits SQLite's signed 64-bit INTEGER
+MAX_MINOR_UNITS = 2 ** 63 - 1
+
+
+# Function to normalize a category name the same way everywhere
+def normalize_category_name(name):
+    return str(name).strip().lower()
+
+
+# Function to check and normalize an ISO 4217 currency code
+# None or an empty string means DEFAULT_CURRENCY
+def normalize_currency(currency):
+    code = str(currency).strip().upper() if currency else DEFAULT_CURRENCY
+    if len(code) != 3 or not code.isalpha():
+        raise ValueError(f"'{currency}' is not a three-letter currency code.")
+    return code
+
+
+# Function to parse an amount typed or imported in major units
+# Floats go through their shortest repr, so 0.1 stays exactly 0.1
+# Returns a Decimal; raises ValueError for anything that is not a finite number
+def parse_amount(amount):
+    if isinstance(amount, decimal.Decimal):
+        value = amount
+    else:
+        try:
+            value = decimal.Decimal(str(amount).strip())
+        except decimal.InvalidOperation:
+            raise ValueError(f"'{amount}' is not a valid amount.") from None
+    if not value.is_finite():
+        raise ValueError(f"'{amount}' is not a valid amount.")
+    return value
+
+
+# Function to convert an amount in major units to integer minor units
+# Half a minor unit rounds away from zero
+# Raises ValueError for amounts that do not fit in MAX_MINOR_UNITS
+def to_minor_units(amount, currency=DEFAULT_CURRENCY):
+    exponent = CURRENCY_EXPONENTS.get(normalize_currency(currency), 2)
+    value = parse_amount(amount)
+    try:
+        minor_units = value.scaleb(exponent)
+        if minor_units.adjusted() < 19:
+            minor_units = int(minor_units.quantize(decimal.Decimal(1), rounding=decimal.ROUND_HALF_UP))
+    except decimal.InvalidOperation:
+        minor_units = None
+    if not isinstance(minor_units, int) or abs(minor_units) > MAX_MINOR_UNITS:
+        limit = format_money(MAX_MINOR_UNITS, currency)
+        raise ValueError(f"'{amount}' is out of range. Amounts must lie between -{limit} and {limit}.")
+    return minor_units
+
+
+# Function to format integer minor units as a major-unit string, e.g. 1250 -> "12.50"
+def format_money(minor_units, currency=DEFAULT_CURRENCY):
+    exponent = CURRENCY_EXPONENTS.get(normalize_currency(currency), 2)
+    return f"{decimal.Decimal(int(minor_units)).scaleb(-exponent):.{exponent}f}"
+
+
+# Function to fingerprint a transaction for duplicate detection
+# Hashes the kind, normalized category, minor-unit amount, currency, date and
+# optional reference into a signed 64-bit integer that fits an INTEGER column
+def transaction_fingerprint(kind, category, amount, currency, date, reference=None):
+    key = "\x1f".join(
+        (kind, normalize_category_name(category), str(int(amount)), currency, str(date).strip(), (reference or "").strip())
+    )
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
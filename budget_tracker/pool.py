@@ -0,0 +1,222 @@
+# Shared access to one ledger file from several threads
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from .money import normalize_category_name
+from .profiling import LedgerProfiler
+from .repository import BUSY_TIMEOUT, DATABASE_PATH, BudgetRepository
+
+
+# Largest number of queued writes the pool commits in one transaction
+WRITE_BATCH_SIZE = 500
+
+# Attempts and first back-off delay in seconds for writes that hit a locked database
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.05
+
+
+# Pool that lets several threads share one ledger file
+# Every thread reads through its own read-only repository, while all writes
+# are queued to a single writer thread that owns the only write connection
+# and commits them in batches; locked-database errors are retried with back-off
+# Budget alerts, when alert_sinks are given, are checked by the writer thread
+class LedgerPool:
+    def __init__(
+        self, path=DATABASE_PATH, profile=None, busy_timeout=BUSY_TIMEOUT, alert_sinks=None, instrument=False
+    ):
+        if path == ":memory:":
+            raise ValueError("A ledger pool needs a database file; ':memory:' cannot be shared between connections.")
+        self.path = path
+        self.profile = profile
+        self.busy_timeout = busy_timeout
+        self.alert_sinks = alert_sinks
+        self.instrument = instrument
+        self._profilers = []
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._ready = threading.Event()
+        self._writer_error = None
+        self._writer = threading.Thread(target=self._run_writer, name="ledger-writer", daemon=True)
+        self._writer.start()
+        self._ready.wait()
+        if self._writer_error is not None:
+            raise self._writer_error
+
+    # Function to get the calling thread's read-only repository
+    def reader(self):
+        repository = getattr(self._local, "repository", None)
+        if repository is None:
+            repository = BudgetRepository(self.path, self.profile, read_only=True, busy_timeout=self.busy_timeout)
+            self._local.repository = repository
+            with self._readers_lock:
+                self._readers.append(repository)
+                if self.instrument:
+                    self._profilers.append(repository.enable_profiling())
+        return repository
+
+    # Function to add up the instrumentation of every connection in the pool
+    # Returns a LedgerProfiler, or None when the pool is not instrumented
+    def metrics(self):
+        if not self.instrument:
+            return None
+        with self._readers_lock:
+            return LedgerProfiler.merge(self._profilers)
+
+    # Function to queue a write for the writer thread
+    # job is called with the writer's repository; returns a Future with its result
+    def submit(self, job, *args):
+        future = Future()
+        self._writes.put((future, job, args))
+        return future
+
+    # Function to queue a new expense; resolves to the new expense id
+    def add_expense(self, category_name, amount, date, currency=None):
+        return self.submit(_pool_add_expense, category_name, amount, date, currency)
+
+    # Function to queue a new income entry; resolves to the new income id
+    def add_income(self, category_name, amount, date, currency=None):
+        return self.submit(_pool_add_income, category_name, amount, date, currency)
+
+    # Function to queue a category budget
+    def set_budget(self, category_name, budget_amount, currency=None):
+        return self.submit(_pool_set_budget, category_name, budget_amount, currency)
+
+    # Function to queue a new category; resolves to the new category id
+    def add_category(self, name):
+        return self.submit(_pool_add_category, name)
+
+    # Function to queue a new financial goal; resolves to the new goal id
+    def set_financial_goal(
+        self, goal_name, target_amount, date, kind=None, category_name=None, start_date=None, currency=None
+    ):
+        return self.submit(
+            _pool_set_financial_goal, goal_name, target_amount, date, kind, category_name, start_date, currency
+        )
+
+    # Function to finish the queued writes and close every connection
+    def close(self):
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+        with self._readers_lock:
+            for repository in self._readers:
+                repository.close()
+            self._readers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    # Writer thread: drain the queue and commit each batch in one transaction
+    def _run_writer(self):
+        repository = BudgetRepository(self.path, self.profile, busy_timeout=self.busy_timeout)
+        if self.alert_sinks:
+            repository.enable_budget_alerts(self.alert_sinks)
+        if self.instrument:
+            with self._readers_lock:
+                self._profilers.append(repository.enable_profiling())
+        try:
+            repository.conn
+        except Exception as error:
+            self._writer_error = error
+            self._ready.set()
+            return
+        self._ready.set()
+
+        stopping = False
+        while not stopping:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [write for write in batch if write is not None]
+            if batch:
+                self._write_batch(repository, batch)
+        repository.close()
+
+    # Function to run one batch of writes, retrying while the database is locked
+    # Each job runs in its own savepoint, so a job that fails leaves nothing behind
+    # and only its own future fails; a locked database retries the whole batch
+    def _write_batch(self, repository, batch):
+        for attempt in range(WRITE_RETRIES):
+            results = []
+            try:
+                with repository.write_transaction():
+                    for future, job, args in batch:
+                        try:
+                            with repository.savepoint():
+                                results.append((future, job(repository, *args), None))
+                        except sqlite3.OperationalError as error:
+                            if _is_lock_error(error):
+                                raise
+                            results.append((future, None, error))
+                        except Exception as error:
+                            results.append((future, None, error))
+            except sqlite3.OperationalError as error:
+                if _is_lock_error(error) and attempt < WRITE_RETRIES - 1:
+                    time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+                    continue
+                for future, _, _ in batch:
+                    future.set_exception(error)
+                return
+            except Exception as error:
+                for future, _, _ in batch:
+                    future.set_exception(error)
+                return
+
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+            return
+
+
+# Function to tell a locked or busy database from other SQLite errors
+def _is_lock_error(error):
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+# Writer jobs used by LedgerPool; each runs inside the writer's transaction
+def _pool_add_expense(repository, category_name, amount, date, currency):
+    category_id = repository.get_category_id(category_name)
+    if category_id is None:
+        raise ValueError(f"Category '{category_name}' does not exist.")
+    return repository.record_expense(category_id, amount, date, currency)
+
+
+def _pool_add_income(repository, category_name, amount, date, currency):
+    return repository.record_income(normalize_category_name(category_name), amount, date, currency)
+
+
+def _pool_set_budget(repository, category_name, budget_amount, currency):
+    category_id = repository.get_category_id(category_name)
+    if category_id is None:
+        raise ValueError(f"Category '{category_name}' does not exist.")
+    return repository.record_budget(category_id, budget_amount, currency)
+
+
+def _pool_add_category(repository, name):
+    if not normalize_category_name(name):
+        raise ValueError("Category name must not be empty.")
+    if repository.get_category_id(name) is not None:
+        raise ValueError(f"Category '{name}' already exists.")
+    return repository.record_category(name)
+
+
+def _pool_set_financial_goal(repository, goal_name, target_amount, date, kind, category_name, start_date, currency):
+    return repository.record_goal(goal_name, target_amount, date, kind, category_name, start_date, currency)
@@ -0,0 +1,202 @@
+# Opt-in instrumentation of repository operations
+
+import bisect
+import functools
+import json
+import time
+
+
+# Upper bounds in seconds of the latency histogram buckets kept by the instrumentation layer
+PROFILE_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# SQLite virtual machine instructions between two progress callbacks while instrumentation is on
+PROFILE_PROGRESS_STEPS = 100
+
+
+# Opt-in instrumentation for one repository
+# Every @instrumented operation is timed into a latency histogram. The sqlite3
+# trace callback counts the SQL statements it runs, trigger bodies included,
+# and the progress handler counts the virtual machine instructions they take,
+# which grow with the rows SQLite scans. Counts are inclusive: add_expense also
+# counts the statements of the record_expense it calls. Work done outside any
+# operation, such as opening the database, is counted under "(other)"
+class LedgerProfiler:
+    def __init__(self, output=None, output_format=None):
+        self.output = output
+        self.output_format = output_format
+        self.operations = {}
+        self.active = []
+        self.other = self.operation("(other)")
+
+    # Function to get the counters of one operation, creating them on first use
+    def operation(self, name):
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = {
+                "calls": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "buckets": [0] * (len(PROFILE_LATENCY_BUCKETS) + 1),
+                "statements": {},
+                "vm_steps": 0,
+            }
+        return stats
+
+    # Function to install the callbacks on a connection
+    def attach(self, connection):
+        connection.set_trace_callback(self.trace)
+        connection.set_progress_handler(self.progress, PROFILE_PROGRESS_STEPS)
+
+    # Function to remove the callbacks from a connection
+    def detach(self, connection):
+        connection.set_trace_callback(None)
+        connection.set_progress_handler(None, 0)
+
+    # Trace callback: count one statement by its leading keyword
+    def trace(self, statement):
+        words = statement.split(None, 1)
+        if not words:
+            return
+        kind = "TRIGGER" if words[0].startswith("--") else words[0].upper()
+        for stats in self.active or (self.other,):
+            statements = stats["statements"]
+            statements[kind] = statements.get(kind, 0) + 1
+
+    # Progress callback: count the instructions run since the last call
+    # Returning 0 lets the statement carry on
+    def progress(self):
+        for stats in self.active or (self.other,):
+            stats["vm_steps"] += PROFILE_PROGRESS_STEPS
+        return 0
+
+    # Function to start timing an operation; returns its counters
+    def begin(self, name):
+        stats = self.operation(name)
+        self.active.append(stats)
+        return stats
+
+    # Function to record how long an operation took
+    def end(self, stats, seconds, failed=False):
+        self.active.pop()
+        stats["calls"] += 1
+        stats["errors"] += failed
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["buckets"][bisect.bisect_left(PROFILE_LATENCY_BUCKETS, seconds)] += 1
+
+    # Function to add up the counters of several profilers, e.g. one per pool connection
+    @staticmethod
+    def merge(profilers):
+        merged = LedgerProfiler()
+        for profiler in profilers:
+            for name, stats in list(profiler.operations.items()):
+                total = merged.operation(name)
+                for key in ("calls", "errors", "seconds", "vm_steps"):
+                    total[key] += stats[key]
+                total["max_seconds"] = max(total["max_seconds"], stats["max_seconds"])
+                total["buckets"] = [a + b for a, b in zip(total["buckets"], stats["buckets"])]
+                for kind, count in list(stats["statements"].items()):
+                    total["statements"][kind] = total["statements"].get(kind, 0) + count
+        return merged
+
+    # Function to report the counters as plain data, ready for json.dumps
+    # Bucket counts are cumulative, as in Prometheus
+    def to_dict(self):
+        operations = {}
+        for name, stats in sorted(self.operations.items()):
+            if not stats["calls"] and not stats["statements"] and not stats["vm_steps"]:
+                continue
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(PROFILE_LATENCY_BUCKETS + ("+Inf",), stats["buckets"]):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            operations[name] = {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "total_ms": stats["seconds"] * 1000,
+                "mean_ms": stats["seconds"] * 1000 / stats["calls"] if stats["calls"] else 0.0,
+                "max_ms": stats["max_seconds"] * 1000,
+                "latency_buckets": buckets,
+                "statements": sum(stats["statements"].values()),
+                "statements_by_kind": dict(sorted(stats["statements"].items())),
+                "vm_steps": stats["vm_steps"],
+            }
+        return {"operations": operations}
+
+    # Function to report the counters in the Prometheus text exposition format
+    def to_prometheus(self):
+        operations = self.to_dict()["operations"]
+        lines = [
+            "# HELP budget_tracker_operation_seconds Latency of ledger operations.",
+            "# TYPE budget_tracker_operation_seconds histogram",
+        ]
+        for name, stats in operations.items():
+            if not stats["calls"]:
+                continue
+            for bound, count in stats["latency_buckets"].items():
+                lines.append(f'budget_tracker_operation_seconds_bucket{{operation="{name}",le="{bound}"}} {count}')
+            lines.append(f'budget_tracker_operation_seconds_sum{{operation="{name}"}} {stats["total_ms"] / 1000}')
+            lines.append(f'budget_tracker_operation_seconds_count{{operation="{name}"}} {stats["calls"]}')
+        lines += [
+            "# HELP budget_tracker_operation_errors_total Ledger operations that raised an error.",
+            "# TYPE budget_tracker_operation_errors_total counter",
+        ]
+        for name, stats in operations.items():
+            if stats["calls"]:
+                lines.append(f'budget_tracker_operation_errors_total{{operation="{name}"}} {stats["errors"]}')
+        lines += [
+            "# HELP budget_tracker_sql_statements_total SQL statements run, trigger bodies included.",
+            "# TYPE budget_tracker_sql_statements_total counter",
+        ]
+        for name, stats in operations.items():
+            for kind, count in stats["statements_by_kind"].items():
+                lines.append(f'budget_tracker_sql_statements_total{{operation="{name}",statement="{kind}"}} {count}')
+        lines += [
+            "# HELP budget_tracker_vm_steps_total SQLite virtual machine instructions run.",
+            "# TYPE budget_tracker_vm_steps_total counter",
+        ]
+        for name, stats in operations.items():
+            lines.append(f'budget_tracker_vm_steps_total{{operation="{name}"}} {stats["vm_steps"]}')
+        return "\n".join(lines) + "\n"
+
+    # Function to render the counters as "json" or "prometheus" text
+    def dump(self, output_format="json"):
+        if output_format == "prometheus":
+            return self.to_prometheus()
+        return json.dumps(self.to_dict(), indent=2) + "\n"
+
+    # Function to write the counters to self.output, or print them when it is "-"
+    # The format defaults to Prometheus for .prom files and JSON otherwise
+    def write(self):
+        if not self.output:
+            return
+        output_format = self.output_format or ("prometheus" if str(self.output).endswith(".prom") else "json")
+        text = self.dump(output_format)
+        if self.output == "-":
+            print(text, end="")
+        else:
+            with open(self.output, "w", encoding="utf-8") as file:
+                file.write(text)
+
+
+# Decorator for the repository operations timed by LedgerProfiler
+# While instrumentation is off it costs one attribute check per call
+def instrumented(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.profiler
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        stats = profiler.begin(method.__name__)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = method(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            profiler.end(stats, time.perf_counter() - start, failed)
+
+    return wrapper
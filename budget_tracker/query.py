@@ -0,0 +1,162 @@
+# Composable expense and income queries and the printed ledger listing
+
+import functools
+
+from .money import DEFAULT_CURRENCY, format_money, normalize_category_name, normalize_currency
+
+
+# Number of rows shown per page by the expense and income browsers
+PAGE_SIZE = 20
+
+# Rows fetched per round trip while streaming query results and HTTP listings
+API_PAGE_SIZE = 1000
+
+
+# Format used for every ID / Category / Amount / Currency / Date listing
+LEDGER_ROW_FORMAT = "{:<5} {:<15} {:<12} {:<8} {:<10}"
+
+# Columns the query engine can sort by
+QUERY_SORT_COLUMNS = ("date", "amount", "id")
+
+
+# Composable filter over expenses or income
+# Each method narrows the query and returns it, so filters can be chained:
+# LedgerQuery("expense").between("2024-01-01", "2024-03-31").in_categories("rent").order_by("amount", True)
+class LedgerQuery:
+    def __init__(self, kind="expense"):
+        if kind not in ("expense", "income"):
+            raise ValueError(f"Unknown query kind '{kind}'. Use 'expense' or 'income'.")
+        self.kind = kind
+        self.start_date = None
+        self.end_date = None
+        self.category_names = None
+        self.currency = None
+        self.min_amount = None
+        self.max_amount = None
+        self.sort_column = "date"
+        self.descending = False
+        self.row_limit = None
+
+    # Keep rows dated from start to end, both inclusive; either may be None
+    def between(self, start=None, end=None):
+        self.start_date = start
+        self.end_date = end
+        return self
+
+    # Keep rows in any of the given categories
+    def in_categories(self, *names):
+        self.category_names = sorted({normalize_category_name(name) for name in names})
+        return self
+
+    # Keep rows recorded in one currency
+    def in_currency(self, currency):
+        self.currency = normalize_currency(currency)
+        return self
+
+    # Keep rows whose amount lies within the bounds, both inclusive; either may be None
+    # Bounds are in major units of the query currency. Amounts in different
+    # currencies cannot be compared, so without in_currency() only rows in
+    # DEFAULT_CURRENCY are kept
+    def amount_between(self, minimum=None, maximum=None):
+        self.min_amount = minimum
+        self.max_amount = maximum
+        return self
+
+    # Currency the rows are filtered on, or None to keep every currency
+    def filter_currency(self):
+        if self.currency is None and (self.min_amount is not None or self.max_amount is not None):
+            return DEFAULT_CURRENCY
+        return self.currency
+
+    # Sort by date, amount or id; ties are broken by id
+    def order_by(self, column, descending=False):
+        if column not in QUERY_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by '{column}'. Choose from: {', '.join(QUERY_SORT_COLUMNS)}.")
+        self.sort_column = column
+        self.descending = descending
+        return self
+
+    # Stop after the given number of rows
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    # Key describing which filters are set; queries with the same shape share SQL text
+    def shape(self):
+        return (
+            self.kind,
+            self.start_date is not None,
+            self.end_date is not None,
+            self.category_names is not None,
+            self.filter_currency() is not None,
+            self.min_amount is not None,
+            self.max_amount is not None,
+            self.sort_column,
+            self.descending,
+            self.row_limit is not None,
+        )
+
+
+# Function to build the SQL text for one query shape
+# Category sets are bound as a single JSON array through json_each, so the
+# text does not change with the number of categories and stays cached
+# With history=True the query reads the archive views instead of the live tables
+@functools.lru_cache(maxsize=None)
+def build_ledger_sql(shape, history=False):
+    kind, has_start, has_end, has_categories, has_currency, has_min, has_max, sort_column, descending, has_limit = shape
+    if kind == "expense":
+        sql = (
+            "SELECT e.id, c.name, e.amount, e.date, e.currency"
+            f" FROM {'ledger_expenses' if history else 'expenses'} e JOIN categories c ON c.id = e.category_id"
+        )
+        prefix = "e."
+        category_condition = "e.category_id IN (SELECT value FROM json_each(?))"
+    else:
+        sql = f"SELECT id, category, amount, date, currency FROM {'ledger_income' if history else 'income'}"
+        prefix = ""
+        category_condition = "category_key IN (SELECT value FROM json_each(?))"
+
+    conditions = []
+    if has_categories:
+        conditions.append(category_condition)
+    if has_currency:
+        conditions.append(f"{prefix}currency = ?")
+    if has_start:
+        conditions.append(f"{prefix}date >= ?")
+    if has_end:
+        conditions.append(f"{prefix}date <= ?")
+    if has_min:
+        conditions.append(f"{prefix}amount >= ?")
+    if has_max:
+        conditions.append(f"{prefix}amount <= ?")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    direction = "DESC" if descending else "ASC"
+    if sort_column == "id":
+        sql += f" ORDER BY {prefix}id {direction}"
+    else:
+        sql += f" ORDER BY {prefix}{sort_column} {direction}, {prefix}id {direction}"
+    if has_limit:
+        sql += " LIMIT ?"
+    return sql
+
+
+# Function to print ID / Category / Amount / Currency / Date rows one at a time
+# The header is only printed once the first row arrives
+# Returns the number of rows printed
+def print_ledger_rows(rows, empty_message, title=None):
+    count = 0
+    for row_id, category, amount, date, currency in rows:
+        if count == 0:
+            if title:
+                print(title)
+            print(LEDGER_ROW_FORMAT.format("ID", "Category", "Amount", "Currency", "Date"))
+            print("=" * 54)
+        print(LEDGER_ROW_FORMAT.format(row_id, category, format_money(amount, currency), currency, date))
+        count += 1
+
+    if count == 0:
+        print(empty_message)
+    return count
+
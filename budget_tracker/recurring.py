@@ -0,0 +1,106 @@
+# Schedules of recurring expense and income rules
+
+
+# Names accepted in the month and day-of-week fields of a recurring schedule
+# Days of the week count from Sunday = 0, as in cron
+RECURRING_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1
+    )
+}
+RECURRING_WEEKDAYS = {name: number for number, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+
+
+# Function to parse one field of a cron-like schedule into the values it allows
+# A field is *, a number or name, a range (1-5), a step (*/2, 1-31/7) or a
+# comma-separated list of those
+def parse_schedule_field(field, low, high, names=None):
+    names = names or {}
+
+    def value(text):
+        number = names.get(text)
+        if number is None:
+            number = int(text)
+        return number
+
+    values = set()
+    for part in field.strip().lower().split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+        if part == "*":
+            first, last = low, high
+        elif "-" in part:
+            first, last = (value(text) for text in part.split("-", 1))
+        else:
+            first = value(part)
+            last = high if step > 1 else first
+        if step < 1 or not low <= first <= last <= high:
+            raise ValueError(f"'{field}' is outside {low}-{high}.")
+        values.update(range(first, last + 1, step))
+    return frozenset(values)
+
+
+# Function to turn a recurring schedule into a test on dates
+# Schedules are "daily", "weekly" (on the start date's weekday), "monthly" (on
+# the start date's day, or the last day of shorter months) or a cron-like
+# "day-of-month month day-of-week" pattern, e.g. "1,15 * *", "L * *" (last day
+# of the month) or "* * mon-fri". As in cron, when both the day of the month and
+# the day of the week are restricted a date matching either one counts
+# Returns None for daily rules, otherwise a function taking a datetime.date
+def compile_recurring_schedule(schedule, start_date):
+    import calendar
+
+    schedule = str(schedule).strip().lower()
+    if schedule == "daily":
+        return None
+    if schedule == "weekly":
+        weekday = start_date.weekday()
+        return lambda day: day.weekday() == weekday
+    if schedule == "monthly":
+        day_of_month = start_date.day
+        return lambda day: day.day == day_of_month or (
+            day.day < day_of_month and day.day == calendar.monthrange(day.year, day.month)[1]
+        )
+
+    fields = schedule.split()
+    if len(fields) != 3:
+        raise ValueError(
+            f"Unknown schedule '{schedule}'. Use daily, weekly, monthly or 'day-of-month month day-of-week'."
+        )
+    day_field, month_field, weekday_field = fields
+    last_day = day_field == "l"
+    days = frozenset() if last_day else parse_schedule_field(day_field, 1, 31)
+    months = parse_schedule_field(month_field, 1, 12, RECURRING_MONTHS)
+    weekdays = frozenset(day % 7 for day in parse_schedule_field(weekday_field, 0, 7, RECURRING_WEEKDAYS))
+    days_restricted = day_field != "*"
+    weekdays_restricted = weekday_field != "*"
+
+    def matches(day):
+        if day.month not in months:
+            return False
+        if last_day:
+            day_matches = day.day == calendar.monthrange(day.year, day.month)[1]
+        else:
+            day_matches = day.day in days
+        weekday_matches = day.isoweekday() % 7 in weekdays
+        if days_restricted and weekdays_restricted:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+    return matches
+
+
+# Function to list the dates a recurring rule falls on from first to last, inclusive
+# Returns ISO date strings; nothing before the rule's start_date is included
+def recurring_occurrences(schedule, start_date, first, last):
+    import datetime
+
+    matches = compile_recurring_schedule(schedule, start_date)
+    first = max(first, start_date).toordinal()
+    days = map(datetime.date.fromordinal, range(first, last.toordinal() + 1))
+    if matches is not None:
+        days = filter(matches, days)
+    return [day.isoformat() for day in days]
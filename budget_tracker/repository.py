@@ -0,0 +1,2179 @@
+# BudgetRepository: every read and write of one ledger file
+
+import contextlib
+import csv
+import itertools
+import json
+import os
+import pathlib
+import sqlite3
+import time
+
+from .alerts import BUDGET_ALERT_THRESHOLDS, BudgetAlertMonitor
+from .forecast import FORECAST_MAX_MONTHS, FORECAST_MIN_MONTHS, CashFlowForecast
+from .memory import InMemoryLedger
+from .money import (
+    DEFAULT_CURRENCY,
+    format_money,
+    normalize_category_name,
+    normalize_currency,
+    parse_amount,
+    to_minor_units,
+    transaction_fingerprint,
+)
+from .profiling import LedgerProfiler, instrumented
+from .query import API_PAGE_SIZE, PAGE_SIZE, LedgerQuery, build_ledger_sql, print_ledger_rows
+from .recurring import compile_recurring_schedule, recurring_occurrences
+from .schema import ARCHIVE_FILE_FORMAT, ARCHIVE_TABLES, GOAL_PROGRESS_SQL, INDEXED_QUERIES, MIGRATIONS
+from .snapshot import SNAPSHOT_FORMAT_VERSION, SNAPSHOT_MANIFEST, SNAPSHOT_MISSING_DAY
+
+
+# Default sqlite database used by the menu and the command line
+DATABASE_PATH = "expense_tracker.db"
+
+
+# Storage profiles trade durability for write speed
+# cache_size is in KiB when negative, mmap_size is in bytes
+STORAGE_PROFILES = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -128000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_STORAGE_PROFILE = os.environ.get("BUDGET_TRACKER_PROFILE", "balanced")
+
+
+# Seconds a connection waits on a locked database before giving up
+BUSY_TIMEOUT = 5.0
+
+
+# Number of rows read and inserted per transaction during a bulk import
+IMPORT_CHUNK_SIZE = 5000
+
+# What bulk imports do with rows that match an entry already in the ledger:
+# insert them anyway, skip them, or insert them and report their row numbers
+DUPLICATE_MODES = ("allow", "skip", "flag")
+
+
+# Average number of days in a month (30.4375) as a fraction, so required
+# monthly rates can be worked out in whole minor units
+DAYS_PER_MONTH = (487, 16)
+
+
+# Prepared statements kept per connection; the query engine reuses the
+# same SQL text for every query with the same filter shape
+STATEMENT_CACHE_SIZE = 256
+
+
+# Function to read rows from a CSV or JSONL file in chunks
+# Each row must have 'category', 'amount' and 'date' fields
+# and may have 'currency' and 'reference' fields
+def read_import_chunks(path, chunk_size=IMPORT_CHUNK_SIZE):
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.lower().endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# Repository that owns one ledger database and its connection
+# Nothing is opened until the first query needs the connection, so
+# creating a repository is free; the path can also be ":memory:"
+class BudgetRepository:
+    def __init__(self, path=DATABASE_PATH, profile=None, read_only=False, busy_timeout=BUSY_TIMEOUT):
+        self.path = path
+        self.storage_profile = profile or DEFAULT_STORAGE_PROFILE
+        self.read_only = read_only
+        self.busy_timeout = busy_timeout
+        self._conn = None
+        self._cursor = None
+        self.transaction_depth = 0
+        self.category_cache = None
+        self.category_cache_stats = {"hits": 0, "misses": 0, "loads": 0}
+        self.budget_alerts = None
+        self.profiler = None
+        self.attached_archives = {}
+        self.forecasts = {}
+        self.memory = None
+
+    # Connection to the database, opened on first use
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.open()
+        return self._conn
+
+    # Cursor shared by the repository functions, created with the connection
+    @property
+    def cursor(self):
+        if self._cursor is None:
+            self.open()
+        return self._cursor
+
+    # Function to open the connection and bring the schema up to date
+    # Read-only repositories expect the schema to exist and never write to it
+    def open(self):
+        if self.read_only:
+            uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(
+                uri,
+                uri=True,
+                timeout=self.busy_timeout,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            self._cursor = self._conn.cursor()
+            if self.profiler is not None:
+                self.profiler.attach(self._conn)
+            self.apply_storage_profile()
+            self.attach_archives()
+            return
+
+        self._conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, cached_statements=STATEMENT_CACHE_SIZE
+        )
+        self._conn.create_function("transaction_fingerprint", 6, transaction_fingerprint, deterministic=True)
+        self._cursor = self._conn.cursor()
+        if self.profiler is not None:
+            self.profiler.attach(self._conn)
+        self.apply_storage_profile()
+        self.create_tables()
+        self.migrate_database()
+        self.attach_archives()
+
+    # Function to close the connection
+    # The repository can be used again afterwards and reopens on demand
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._cursor = None
+        self.transaction_depth = 0
+        self.category_cache = None
+        self.attached_archives = {}
+        self.forecasts = {}
+        if self.memory is not None:
+            self.memory.invalidate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    # Function to apply a storage profile to the current connection
+    def apply_storage_profile(self, name=None):
+        name = name or self.storage_profile
+        if name not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile '{name}'. Choose from: {', '.join(STORAGE_PROFILES)}.")
+
+        for pragma, value in STORAGE_PROFILES[name].items():
+            if self.read_only and pragma == "journal_mode":
+                continue
+            self.cursor.execute(f"PRAGMA {pragma} = {value}")
+            self.cursor.fetchall()
+        self.storage_profile = name
+
+    # Function used by the write functions instead of conn.commit()
+    # Commits straight away unless the write is part of a write_transaction() block
+    def commit_writes(self):
+        if self.transaction_depth == 0:
+            self.conn.commit()
+            if self.budget_alerts is not None:
+                self.budget_alerts.flush()
+
+    # Function to group several writes into one explicit transaction
+    # Used as a with-block; commits once at the end, or rolls everything back
+    # if an error escapes the block
+    @contextlib.contextmanager
+    def write_transaction(self):
+        if self.transaction_depth == 0:
+            self.conn.commit()
+            self.cursor.execute("BEGIN")
+        self.transaction_depth += 1
+        try:
+            yield
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.conn.rollback()
+                self.invalidate_category_cache()
+                if self.budget_alerts is not None:
+                    self.budget_alerts.discard()
+                if self.memory is not None:
+                    self.memory.invalidate()
+            raise
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            self.conn.commit()
+            if self.budget_alerts is not None:
+                self.budget_alerts.flush()
+
+    # Function to run part of a write_transaction() block that can fail on its own
+    # Used as a with-block; if an error escapes it, only its own writes are rolled
+    # back to the savepoint and the surrounding transaction carries on
+    @contextlib.contextmanager
+    def savepoint(self, name="job"):
+        with self.write_transaction():
+            pending = len(self.budget_alerts.pending) if self.budget_alerts is not None else 0
+            self.cursor.execute(f"SAVEPOINT {name}")
+            try:
+                yield
+            except BaseException:
+                self.cursor.execute(f"ROLLBACK TO {name}")
+                self.cursor.execute(f"RELEASE {name}")
+                self.invalidate_category_cache()
+                if self.budget_alerts is not None:
+                    del self.budget_alerts.pending[pending:]
+                    self.budget_alerts.invalidate()
+                if self.memory is not None:
+                    self.memory.invalidate()
+                raise
+            self.cursor.execute(f"RELEASE {name}")
+
+    # Function to load expenses and income into memory and answer reads from there
+    # Returns the InMemoryLedger so callers can read its memory report
+    def enable_memory_mode(self):
+        self.memory = InMemoryLedger(self)
+        for kind in ("expense", "income"):
+            self.memory.table(kind)
+        return self.memory
+
+    # Function to go back to reading everything from SQLite
+    def disable_memory_mode(self):
+        self.memory = None
+
+    # Function to start checking budgets on every expense write
+    # Returns the BudgetAlertMonitor so callers can read its stats
+    def enable_budget_alerts(self, sinks, thresholds=BUDGET_ALERT_THRESHOLDS):
+        self.budget_alerts = BudgetAlertMonitor(self, sinks, thresholds)
+        return self.budget_alerts
+
+    # Function to start timing operations and counting their SQL work
+    # output and output_format say where LedgerProfiler.write() puts the metrics
+    # Returns the LedgerProfiler so callers can dump its counters
+    def enable_profiling(self, output=None, output_format=None):
+        self.profiler = LedgerProfiler(output, output_format)
+        if self._conn is not None:
+            self.profiler.attach(self._conn)
+        return self.profiler
+
+    # Function to stop instrumentation and remove the sqlite3 callbacks
+    def disable_profiling(self):
+        if self.profiler is not None and self._conn is not None:
+            self.profiler.detach(self._conn)
+        self.profiler = None
+
+    # Function to create tables if they don't exist
+    def create_tables(self):
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expenses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER,
+                amount REAL NOT NULL,
+                date DATE NOT NULL,
+                FOREIGN KEY (category_id) REFERENCES categories (id)
+            )
+            """
+        )
+
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS income (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category TEXT NOT NULL,
+                amount REAL NOT NULL,
+                date DATE NOT NULL
+            )
+            """
+        )
+
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+            )
+            """
+        )
+
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS budgets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER,
+                budget_amount REAL NOT NULL,
+                FOREIGN KEY (category_id) REFERENCES categories (id)
+            )
+            """
+        )
+
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS financial_goals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                goal_name TEXT NOT NULL,
+                target_amount REAL NOT NULL,
+                progress_amount REAL,
+                date DATE NOT NULL
+            )
+            """
+        )
+
+        self.conn.commit()
+
+    # Function to upgrade the database schema in place
+    # Each migration runs in its own transaction together with the version bump
+    def migrate_database(self):
+        self.cursor.execute("PRAGMA user_version")
+        current_version = self.cursor.fetchone()[0]
+
+        for version, description, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            try:
+                self.conn.commit()
+                self.cursor.execute("BEGIN")
+                for statement in statements:
+                    self.cursor.execute(statement)
+                self.cursor.execute(f"PRAGMA user_version = {version}")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            current_version = version
+        return current_version
+
+    # Function to check that the hot queries are answered from an index
+    # Returns a list of (name, plan, uses_index) tuples
+    def check_query_plans(self):
+        results = []
+        for name, (query, params) in INDEXED_QUERIES.items():
+            self.cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+            plan = "; ".join(row[3] for row in self.cursor.fetchall())
+            uses_index = "USING" in plan and "INDEX" in plan
+            results.append((name, plan, uses_index))
+        return results
+
+    # Function to find an archive file from the path kept in the registry
+    # Relative paths are relative to the folder of the ledger
+    def archive_location(self, path):
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), path)
+
+    # Function to attach every archived year that is not attached yet
+    # The temporary views ledger_expenses and ledger_income are rebuilt whenever
+    # the set of attached years changes. ATTACH cannot run inside a transaction,
+    # so archives made by other connections are picked up at the next call outside one
+    def attach_archives(self):
+        if self.conn.in_transaction:
+            return
+        try:
+            self.cursor.execute("SELECT year, path FROM archives ORDER BY year")
+        except sqlite3.OperationalError:
+            # Read-only connection to a ledger that was never migrated
+            return
+        archives = self.cursor.fetchall()
+        if len(archives) == len(self.attached_archives):
+            return
+
+        for year, path in archives:
+            if year in self.attached_archives:
+                continue
+            location = self.archive_location(path)
+            if self.read_only:
+                location = pathlib.Path(location).resolve().as_uri() + "?mode=ro"
+            self.cursor.execute(f"ATTACH DATABASE ? AS archive_{year}", (location,))
+            self.attached_archives[year] = f"archive_{year}"
+        self.create_history_views()
+
+    # Function to (re)create the views that put the live tables and every archive together
+    def create_history_views(self):
+        columns = {
+            "expenses": "id, category_id, amount, currency, date",
+            "income": "id, category, category_key, amount, currency, date",
+        }
+        for table, column_list in columns.items():
+            self.cursor.execute(f"DROP VIEW IF EXISTS temp.ledger_{table}")
+            selects = [f"SELECT {column_list} FROM main.{table}"] + [
+                f"SELECT {column_list} FROM {schema}.{table}" for schema in self.attached_archives.values()
+            ]
+            self.cursor.execute(f"CREATE TEMP VIEW ledger_{table} AS " + " UNION ALL ".join(selects))
+
+    # Function to name the table that holds the whole history of "expenses" or "income"
+    # That is the live table while nothing is archived, otherwise its archive view
+    def history_table(self, table):
+        self.attach_archives()
+        return f"ledger_{table}" if self.attached_archives else table
+
+    # Function to give the first date that is never archived
+    # Archives only hold earlier dates, so queries from this date on read the live tables
+    # Returns None while nothing is archived
+    def live_start_date(self):
+        self.attach_archives()
+        if not self.attached_archives:
+            return None
+        return f"{max(self.attached_archives) + 1:04d}-01-01"
+
+    # Function to move every expense and income entry dated before before_year
+    # into one archive file per year
+    # Rows keep their ids, and the monthly rollup and goal progress stay as they
+    # are because the delete triggers are set aside while rows move. Each year
+    # moves in one transaction together with its registry row: with a rollback
+    # journal that is atomic across both files; in WAL mode each file is atomic
+    # on its own and running the archive again finishes an interrupted move
+    # Returns a list of (year, expense_rows, income_rows)
+    @instrumented
+    def archive_years(self, before_year):
+        if self.path == ":memory:":
+            raise ValueError("An in-memory ledger cannot be archived.")
+        self.attach_archives()
+        boundary = f"{int(before_year):04d}-01-01"
+        self.cursor.execute(
+            """
+            SELECT substr(date, 1, 4) FROM expenses WHERE date < ?
+            UNION
+            SELECT substr(date, 1, 4) FROM income WHERE date < ?
+            """,
+            (boundary, boundary),
+        )
+        years = sorted(int(year) for (year,) in self.cursor.fetchall() if year and year.isdigit())
+
+        # Every archive file stays attached, so check SQLite's limit before any row moves
+        new_years = [year for year in years if year not in self.attached_archives]
+        attach_limit = self.conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        free = attach_limit - len(self.attached_archives)
+        if len(new_years) > free:
+            advice = f" Archive before {new_years[free]} instead." if free > 0 else ""
+            raise ValueError(
+                f"Archiving before {before_year} needs {len(new_years)} new archive files, but SQLite attaches "
+                f"at most {attach_limit} and {len(self.attached_archives)} are in use.{advice}"
+            )
+
+        results = []
+        for year in years:
+            path = ARCHIVE_FILE_FORMAT.format(stem=pathlib.Path(self.path).stem, year=year)
+            schema = self.attached_archives.get(year)
+            if schema is None:
+                self.conn.commit()
+                schema = f"archive_{year}"
+                self.cursor.execute(f"ATTACH DATABASE ? AS {schema}", (self.archive_location(path),))
+                self.attached_archives[year] = schema
+            start, end = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+
+            with self.write_transaction():
+                for statement in ARCHIVE_TABLES:
+                    self.cursor.execute(statement.format(schema=schema))
+                self.cursor.execute(
+                    """
+                    SELECT name, sql FROM sqlite_master
+                    WHERE type = 'trigger' AND tbl_name IN ('expenses', 'income') AND sql LIKE '%AFTER DELETE%'
+                    """
+                )
+                delete_triggers = self.cursor.fetchall()
+                for name, _ in delete_triggers:
+                    self.cursor.execute(f"DROP TRIGGER main.{name}")
+
+                self.cursor.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {schema}.expenses (id, category_id, amount, currency, date, reference)
+                    SELECT id, category_id, amount, currency, date, reference FROM main.expenses
+                    WHERE date >= ? AND date < ?
+                    """,
+                    (start, end),
+                )
+                self.cursor.execute("DELETE FROM main.expenses WHERE date >= ? AND date < ?", (start, end))
+                expense_rows = self.cursor.rowcount
+                self.cursor.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {schema}.income (id, category, amount, currency, date, category_key, reference)
+                    SELECT id, category, amount, currency, date, category_key, reference FROM main.income
+                    WHERE date >= ? AND date < ?
+                    """,
+                    (start, end),
+                )
+                self.cursor.execute("DELETE FROM main.income WHERE date >= ? AND date < ?", (start, end))
+                income_rows = self.cursor.rowcount
+
+                for _, sql in delete_triggers:
+                    self.cursor.execute(sql)
+                self.cursor.execute(
+                    """
+                    INSERT INTO archives (year, path, expense_rows, income_rows) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (year) DO UPDATE SET
+                        expense_rows = expense_rows + excluded.expense_rows,
+                        income_rows = income_rows + excluded.income_rows,
+                        archived_at = CURRENT_TIMESTAMP
+                    """,
+                    (year, path, expense_rows, income_rows),
+                )
+            results.append((year, expense_rows, income_rows))
+
+        if results:
+            self.create_history_views()
+            if self.memory is not None:
+                self.memory.invalidate()
+        return results
+
+    # Function to list the archived years
+    # Returns a list of (year, path, expense_rows, income_rows, archived_at, file_bytes)
+    def list_archives(self):
+        self.cursor.execute("SELECT year, path, expense_rows, income_rows, archived_at FROM archives ORDER BY year")
+        archives = []
+        for year, path, expense_rows, income_rows, archived_at in self.cursor.fetchall():
+            location = self.archive_location(path)
+            size = os.path.getsize(location) if os.path.exists(location) else None
+            archives.append((year, path, expense_rows, income_rows, archived_at, size))
+        return archives
+
+    # Function to VACUUM every archive file and then the live ledger
+    # Archives are written once, so VACUUM packs them tightly; the live ledger
+    # gets back the pages that archiving freed
+    # Returns a list of (file, bytes_before, bytes_after)
+    def compact_archives(self):
+        self.attach_archives()
+        self.conn.commit()
+        self.cursor.execute("PRAGMA database_list")
+        files = {name: path for _, name, path in self.cursor.fetchall()}
+
+        results = []
+        for schema in list(self.attached_archives.values()) + ["main"]:
+            path = files.get(schema)
+            if not path:
+                continue
+            before = os.path.getsize(path)
+            self.cursor.execute(f"VACUUM {schema}")
+            if schema == "main":
+                self.cursor.execute("PRAGMA main.wal_checkpoint(TRUNCATE)")
+                self.cursor.fetchall()
+            results.append((path, before, os.path.getsize(path)))
+        return results
+
+    # Function to load every category into the cache
+    # Returns the cache so bulk callers can resolve names without counting
+    def load_category_map(self):
+        self.cursor.execute("SELECT id, name FROM categories")
+        self.category_cache = {normalize_category_name(name): category_id for category_id, name in self.cursor.fetchall()}
+        self.category_cache_stats["loads"] += 1
+        return self.category_cache
+
+    # Function to drop the cache after categories change behind its back
+    # The next lookup reloads it from the database
+    def invalidate_category_cache(self):
+        self.category_cache = None
+
+    # Function to record a category that was just inserted
+    def remember_category(self, name, category_id):
+        if self.category_cache is not None:
+            self.category_cache[normalize_category_name(name)] = category_id
+
+    # Function to map a category name to its id
+    # Returns None when the category does not exist
+    # Read-only repositories reload once on a miss, since another
+    # connection may have added the category since the cache was loaded
+    def get_category_id(self, name):
+        categories = self.category_cache if self.category_cache is not None else self.load_category_map()
+        category_id = categories.get(normalize_category_name(name))
+        if category_id is None and self.read_only:
+            category_id = self.load_category_map().get(normalize_category_name(name))
+        if category_id is None:
+            self.category_cache_stats["misses"] += 1
+        else:
+            self.category_cache_stats["hits"] += 1
+        return category_id
+
+    # Function to list the cached category names in the order they were added
+    def get_category_names(self):
+        categories = self.category_cache if self.category_cache is not None else self.load_category_map()
+        return sorted(categories, key=categories.get)
+
+    # Function to compare the cache with the categories table
+    # Returns a list of (name, cached_id, stored_id) differences
+    def check_category_cache(self):
+        categories = self.category_cache if self.category_cache is not None else self.load_category_map()
+        self.cursor.execute("SELECT id, name FROM categories")
+        stored = {normalize_category_name(name): category_id for category_id, name in self.cursor.fetchall()}
+        return [
+            (name, categories.get(name), stored.get(name))
+            for name in sorted(set(categories) | set(stored))
+            if categories.get(name) != stored.get(name)
+        ]
+
+    # Function to add a new expense category
+    # Check if the category already exists
+    # Insert a new category into the 'categories' table
+    @instrumented
+    def add_category(self, name):
+        try:
+            category_name = normalize_category_name(name)
+
+            if self.get_category_id(category_name) is None:
+                self.record_category(category_name)
+                print(f"Category '{name}' added successfully.")
+            else:
+                raise ValueError(f"Category '{name}' already exists.")
+        except ValueError as ve:
+            print(f"Error: {ve}")
+        except sqlite3.Error as se:
+            print(f"SQLite Error: {se}")
+
+    # Function to insert one category without any prompts or messages
+    # Returns the id of the new category
+    def record_category(self, name):
+        category_name = normalize_category_name(name)
+        self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (category_name,))
+        category_id = self.cursor.lastrowid
+        self.commit_writes()
+        self.remember_category(category_name, category_id)
+        return category_id
+
+    # Function to add a new expense
+    # Insert a new expense into the 'expenses' table
+    @instrumented
+    def add_expense(self, category_name, amount, date, currency=None):
+        try:
+            existing_category_id = self.get_category_id(category_name)
+
+            if existing_category_id is not None:
+                self.record_expense(existing_category_id, amount, date, currency)
+                print("Expense added successfully.")
+            else:
+                category_names = self.get_category_names()
+                print(f"Category '{category_name}' does not exist. Existing categories: {', '.join(category_names)}")
+
+                print("Existing Categories:")
+                for name in category_names:
+                    print(name)
+
+                add_category_choice = input("Enter 'yes' (case-sensitive) to add or any other key to cancel: ")
+                if add_category_choice.lower() == 'yes':
+                    self.add_category(category_name)
+                    self.add_expense(category_name, amount, date, currency)
+                else:
+                    print("Expense not added. Please add the category first.")
+        except ValueError as ve:
+            print(f"Error: {ve}")           
+        except sqlite3.Error as se:
+            print(f"SQLite Error: {se}")
+
+    # Function to insert one expense row without any prompts or messages
+    # The amount is in major units and is stored as integer minor units
+    # Returns the id of the new expense
+    @instrumented
+    def record_expense(self, category_id, amount, date, currency=None):
+        currency = normalize_currency(currency)
+        amount = to_minor_units(amount, currency)
+        self.cursor.execute(
+            "INSERT INTO expenses (category_id, amount, currency, date) VALUES (?, ?, ?, ?)",
+            (category_id, amount, currency, date),
+        )
+        expense_id = self.cursor.lastrowid
+        if self.budget_alerts is not None:
+            self.budget_alerts.record(category_id, currency, date, amount)
+        if self.memory is not None:
+            self.memory.appended("expense")
+        self.commit_writes()
+        return expense_id
+
+    # Function to update an expense amount
+    @instrumented
+    def update_expense_amount(self):
+        try:
+            self.cursor.execute("SELECT id, amount, currency FROM expenses")
+            expenses = self.cursor.fetchall()
+
+            if not expenses:
+                print("No expenses found.")
+                return
+            print("\nValid Expenses:")
+            print("{:5} {:10}".format("ID", "Amount"))
+            print("=" *25)
+            for expense in expenses:
+                print("{:5} {:10}".format(expense[0], format_money(expense[1], expense[2]) + " " + expense[2]))
+            currencies = {expense[0]: expense[2] for expense in expenses}
+
+            expense_id = input("Enter the ID of the expense to update: ")
+
+            try:
+                expense_id = int(expense_id)
+                new_amount = parse_amount(input("Enter the new expense amount: "))
+                self.cursor. execute(
+                    "UPDATE expenses SET amount = ? WHERE id = ?",
+                    (to_minor_units(new_amount, currencies.get(expense_id)), expense_id),
+                )
+                if self.budget_alerts is not None:
+                    self.budget_alerts.invalidate()
+                if self.memory is not None:
+                    self.memory.invalidate("expense")
+                self.commit_writes()
+                print("Expense amount updated successfully.")
+            except ValueError as ve:
+                print(f"Error: Invalid input for ID or new amount.")
+
+        except sqlite3.Error as se:
+            print(f"SQLite Error: {se}")
+
+    # Function to delete an expense category
+    @instrumented
+    def delete_expense_category_from_database(self, expense_name):
+        self.cursor.execute("SELECT id, name FROM categories ORDER BY id")
+        categories = self.cursor.fetchall()
+
+        if not categories:
+            print("No expense categories found.")
+            return
+
+        print("Current Expense Categories:")
+        print("{:<5} {:<15}".format("ID", "Expense Name"))
+        print("=" * 25)
+        for category in categories:
+            print("{:<5} {:<15}".format(category[0], category[1]))
+
+        try:
+            category_id = self.get_category_id(expense_name)
+            if category_id is None:
+                print(f"No expense category named '{normalize_category_name(expense_name)}' was found.")
+                return
+            self.cursor.execute("DELETE FROM expenses WHERE category_id = ?", (category_id,))
+            self.cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            if self.budget_alerts is not None:
+                self.budget_alerts.invalidate()
+            if self.memory is not None:
+                self.memory.invalidate("expense")
+            self.commit_writes()
+            self.invalidate_category_cache()
+            print(f"Expense '{normalize_category_name(expense_name)}' deleted successfully.")
+        except ValueError as ve:
+            print(f"Error: {ve}")
+        except sqlite3.Error as se:
+            print(f"SQLite Error: {se}")
+
+    # Function to stream expenses together with their category names
+    # A single JOIN replaces the per-row category lookup
+    # Rows are yielded straight from the cursor instead of fetchall()
+    def iter_expense_listing(self, where="", params=()):
+        listing_cursor = self.conn.cursor()
+        listing_cursor.execute(
+            f"""
+            SELECT e.id, c.name, e.amount, e.date, e.currency
+            FROM expenses e
+            JOIN categories c ON c.id = e.category_id
+            {where}
+            ORDER BY e.id
+            """,
+            params,
+        )
+        try:
+            yield from listing_cursor
+        finally:
+            listing_cursor.close()
+
+    # Function to run a LedgerQuery as one parameterized statement
+    # Rows are (id, category, amount, date, currency) with the amount in minor
+    # units, and are yielded lazily from the cursor; archived years are only
+    # read when the date range reaches back into them
+    def run_query(self, query):
+        if self.memory is not None:
+            records = self.memory.query(query)
+            if records is not None:
+                yield from records
+                return
+
+        params = []
+        if query.category_names is not None:
+            if query.kind == "expense":
+                category_ids = [self.get_category_id(name) for name in query.category_names]
+                params.append(json.dumps([category_id for category_id in category_ids if category_id is not None]))
+            else:
+                params.append(json.dumps(query.category_names))
+        currency = query.filter_currency()
+        if currency is not None:
+            params.append(currency)
+        for value in (query.start_date, query.end_date):
+            if value is not None:
+                params.append(value)
+        for value in (query.min_amount, query.max_amount):
+            if value is not None:
+                params.append(to_minor_units(value, currency))
+        if query.row_limit is not None:
+            params.append(query.row_limit)
+
+        # Archives only hold dates before live_start, so later ranges skip them
+        live_start = self.live_start_date()
+        history = live_start is not None and (query.start_date is None or query.start_date < live_start)
+
+        query_cursor = self.conn.cursor()
+        query_cursor.execute(build_ledger_sql(query.shape(), history), params)
+        try:
+            while True:
+                rows = query_cursor.fetchmany(API_PAGE_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            query_cursor.close()
+
+    # Function to fetch one page of expenses or income ordered by (date, id)
+    # Pages are found with keyset conditions on (date, id) instead of OFFSET,
+    # so every page costs the same however deep into the ledger it is
+    # Pass after=(date, id) for the next page or before=(date, id) for the previous one
+    # Archived years are read when the page starts before live_start_date(), or
+    # when a previous page runs out of live rows
+    @instrumented
+    def fetch_ledger_page(self, kind, after=None, before=None, page_size=PAGE_SIZE, category_name=None):
+        if self.memory is not None:
+            rows = self.memory.page(kind, after, before, page_size, category_name)
+            if rows is not None:
+                return rows
+
+        live_start = self.live_start_date()
+        backwards = before is not None and after is None
+        history = live_start is not None and (after[0] < live_start if after is not None else not backwards)
+        rows = self.read_ledger_page(kind, after, before, page_size, category_name, history)
+        if live_start is not None and backwards and not history and len(rows) < page_size:
+            rows = self.read_ledger_page(kind, after, before, page_size, category_name, True)
+        return rows
+
+    # Function to run the keyset query behind fetch_ledger_page
+    # With history=True it reads the archive views instead of the live tables
+    def read_ledger_page(self, kind, after, before, page_size, category_name, history=False):
+        if kind == "expense":
+            query = (
+                "SELECT e.id, c.name, e.amount, e.date, e.currency"
+                f" FROM {'ledger_expenses' if history else 'expenses'} e JOIN categories c ON c.id = e.category_id"
+            )
+            date_column, id_column = "e.date", "e.id"
+        else:
+            query = f"SELECT id, category, amount, date, currency FROM {'ledger_income' if history else 'income'}"
+            date_column, id_column = "date", "id"
+
+        conditions = []
+        params = []
+        if category_name and kind == "income":
+            conditions.append("category_key = ?")
+            params.append(category_name.strip().lower())
+        if after is not None:
+            conditions.append(f"({date_column}, {id_column}) > (?, ?)")
+            params.extend(after)
+        elif before is not None:
+            conditions.append(f"({date_column}, {id_column}) < (?, ?)")
+            params.extend(before)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        direction = "DESC" if before is not None and after is None else "ASC"
+        query += f" ORDER BY {date_column} {direction}, {id_column} {direction} LIMIT ?"
+        params.append(page_size)
+
+        self.cursor.execute(query, params)
+        rows = self.cursor.fetchall()
+        if direction == "DESC":
+            rows.reverse()
+        return rows
+
+    # Function to browse expenses or income one page at a time
+    # Supports next/previous pages, jumping to a date and changing the page size
+    def browse_ledger(self, kind, category_name=None, page_size=None):
+        page_size = page_size or PAGE_SIZE
+        empty_message = "No expenses found." if kind == "expense" else "No income entries found."
+
+        rows = self.fetch_ledger_page(kind, page_size=page_size, category_name=category_name)
+        if not rows:
+            print(empty_message)
+            return
+
+        while True:
+            print_ledger_rows(rows, "No entries on this page.")
+            choice = input("\n[n]ext, [p]revious, [j]ump to date, page [s]ize, [q]uit: ").strip().lower()
+
+            if choice == "n":
+                next_rows = rows and self.fetch_ledger_page(
+                    kind, after=(rows[-1][3], rows[-1][0]), page_size=page_size, category_name=category_name
+                )
+                if next_rows:
+                    rows = next_rows
+                else:
+                    print("Already on the last page.")
+
+            elif choice == "p":
+                previous_rows = rows and self.fetch_ledger_page(
+                    kind, before=(rows[0][3], rows[0][0]), page_size=page_size, category_name=category_name
+                )
+                if previous_rows:
+                    rows = previous_rows
+                else:
+                    print("Already on the first page.")
+
+            elif choice == "j":
+                date = input("Enter date to jump to (YYYY-MM-DD): ").strip()
+                rows = self.fetch_ledger_page(kind, after=(date, 0), page_size=page_size, category_name=category_name)
+
+            elif choice == "s":
+                try:
+                    new_page_size = int(input("Enter page size: "))
+                    if new_page_size < 1:
+                        raise ValueError
+                    page_size = new_page_size
+                    first_key = (rows[0][3], rows[0][0] - 1) if rows else None
+                    rows = self.fetch_ledger_page(kind, after=first_key, page_size=page_size, category_name=category_name)
+                except ValueError:
+                    print("Error: Please enter a positive whole number.")
+
+            elif choice == "q":
+                return
+
+            else:
+                print("Invalid choice. Please try again.")
+
+    # Function to track pending expenses
+    def track_pending_expenses(self):
+        pending_expenses = self.memory.pending_expenses() if self.memory is not None else None
+        if pending_expenses is None:
+            pending_expenses = self.iter_expense_listing("WHERE e.amount > 0")
+        print_ledger_rows(pending_expenses, "No pending expenses found.", "\nPending Expenses:")
+
+    # Function to view all expenses
+    @instrumented
+    def view_expenses(self, page_size=None):
+        print("View Expenses Function Called")
+        self.browse_ledger("expense", page_size=page_size)
+        print("View Expenses Function Completed")
+
+    # Function to view expenses by category
+    # Display available categories
+    # Get user input for the category name
+    # Fetch category_id for the given category_name
+    # Fetch expenses for the specified category_id
+    @instrumented
+    def view_expenses_by_category(self):
+        print("Available Categories:")
+        for name in self.get_category_names():
+            print(name)
+
+        category_name = input("Enter the name of the category: ")
+
+        if self.get_category_id(category_name) is not None:
+            found = False
+            for expense_id, _, amount, date, currency in self.run_query(
+                LedgerQuery("expense").in_categories(category_name).order_by("id")
+            ):
+                if not found:
+                    print(f"\nExpenses for category '{category_name}':")
+                    found = True
+                print(f"ID: {expense_id}, Amount: {format_money(amount, currency)} {currency}, Date: {date}")
+            if not found:
+                print(f"No expenses found for category '{category_name}'.")
+        else:
+            print(f"Category '{category_name}' not found.")
+
+    # Function to search expenses or income with several filters at once
+    # Blank answers leave a filter out
+    @instrumented
+    def search_ledger(self):
+        kind = "income" if input("Search (e)xpenses or (i)ncome? ").strip().lower().startswith("i") else "expense"
+        query = LedgerQuery(kind)
+        try:
+            start = input("From date (YYYY-MM-DD): ").strip()
+            end = input("To date (YYYY-MM-DD): ").strip()
+            query.between(start or None, end or None)
+            categories = [name for name in input("Categories (comma separated): ").split(",") if name.strip()]
+            if categories:
+                query.in_categories(*categories)
+            minimum = input("Minimum amount: ").strip()
+            maximum = input("Maximum amount: ").strip()
+            query.amount_between(parse_amount(minimum) if minimum else None, parse_amount(maximum) if maximum else None)
+            if minimum or maximum:
+                currency = input(f"Currency of the amounts (blank for {DEFAULT_CURRENCY}): ").strip()
+                query.in_currency(currency or None)
+            sort_column = input("Sort by (date, amount, id): ").strip().lower() or "date"
+            query.order_by(sort_column, input("Newest/largest first? (y/n): ").strip().lower() == "y")
+        except ValueError as ve:
+            print(f"Error: {ve}")
+            return
+        print_ledger_rows(self.run_query(query), "No matching entries found.")
+
+    # Function to add income
+    @instrumented
+    def add_income(self, category_name, amount, date, currency=None):
+        try:
+            category_name = category_name.lower()
+            self.record_income(category_name, amount, date, currency)
+            print(
+                f"Income entry of {amount} added successfully for category '{category_name}' on {date}."
+            )
+        except ValueError as ve:
+            print(f"Error: {ve}")
+        except sqlite3.IntegrityError as ie:
+            print(ie)
+
+    # Function to insert one income row without any prompts or messages
+    # The amount is in major units and is stored as integer minor units
+    # Returns the id of the new income entry
+    @instrumented
+    def record_income(self, category_name, amount, date, currency=None):
+        currency = normalize_currency(currency)
+        self.cursor.execute(
+            "INSERT INTO income (category, amount, currency, date) VALUES (?, ?, ?, ?)",
+            (category_name, to_minor_units(amount, currency), currency, date),
+        )
+        income_id = self.cursor.lastrowid
+        if self.memory is not None:
+            self.memory.appended("income")
+        self.commit_writes()
+        return income_id
+
+    # Function to view all income entries
+    @instrumented
+    def view_income(self, category_name=None, page_size=None):
+        self.browse_ledger("income", category_name, page_size)
+
+    # Function to view income by category
+    @instrumented
+    def view_income_by_category(self, category_name):
+        if self.memory is not None:
+            records = self.memory.query(LedgerQuery("income").in_categories(category_name))
+            if records is not None:
+                print_ledger_rows(records, "No income entries found for category '{}'.".format(category_name))
+                return
+
+        income_cursor = self.conn.cursor()
+        income_cursor.execute(
+            "SELECT id, category, amount, date, currency FROM income WHERE category_key = ?",
+            (category_name.strip().lower(),),
+        )
+        print_ledger_rows(
+            income_cursor, "No income entries found for category '{}'.".format(category_name)
+        )
+        income_cursor.close()
+
+    # Function to set budget for a catagory
+    @instrumented
+    def set_budget(self, category_name, budget_amount, currency=None):
+        try:
+            category_name = normalize_category_name(category_name)
+            category_id = self.get_category_id(category_name)
+            if category_id is None:
+                print(f"Category '{category_name}' does not exist. Please add the category first.")
+                return
+            self.record_budget(category_id, budget_amount, currency)
+            print(
+                f"Budget of {budget_amount} set successfully for category '{category_name}'."
+            )
+        except ValueError as ve:
+            print(f"Error: {ve}")
+        except sqlite3.Error as se:
+            print(f"SQLite Error: {se}")
+
+    # Function to store a category budget without any prompts or messages
+    # The amount is in major units and is stored as integer minor units
+    @instrumented
+    def record_budget(self, category_id, budget_amount, currency=None):
+        currency = normalize_currency(currency)
+        budget_amount = to_minor_units(budget_amount, currency)
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO budgets (category_id, budget_amount, currency) VALUES (?, ?, ?)",
+            (category_id, budget_amount, currency),
+        )
+        budget_id = self.cursor.lastrowid
+        if self.budget_alerts is not None:
+            self.budget_alerts.budget_changed(category_id, currency, budget_amount)
+        self.commit_writes()
+        return budget_id
+
+    # Function to view budget for a category
+    @instrumented
+    def view_budget(self, category_name):
+        category_name = normalize_category_name(category_name)
+        self.cursor.execute(
+            "SELECT budget_amount, currency FROM budgets WHERE category_id = ? ORDER BY id DESC LIMIT 1",
+            (self.get_category_id(category_name),),
+        )
+        budget_amount = self.cursor.fetchone()
+
+        if budget_amount is not None:
+            budget_amount, currency = budget_amount
+            spent = self.get_monthly_spend(category_name, currency=currency)
+            print(f"The budget for category '{category_name}' is: {format_money(budget_amount, currency)} {currency}")
+            print(f"Spent so far this month: {format_money(spent, currency)} {currency}")
+        else:
+            print(
+                f"Budget not set for category '{category_name}'. Please consider setting a budget for better financial management."
+            )
+
+    # Function to rebuild the monthly category rollup from the expenses table
+    def rebuild_monthly_totals(self):
+        expenses = self.history_table("expenses")
+        try:
+            self.cursor.execute("DELETE FROM monthly_category_totals")
+            self.cursor.execute(
+                f"""
+                INSERT INTO monthly_category_totals (category_id, month, currency, total, entry_count)
+                SELECT category_id, substr(date, 1, 7), currency, SUM(amount), COUNT(*)
+                FROM {expenses} WHERE category_id IS NOT NULL
+                GROUP BY category_id, substr(date, 1, 7), currency
+                """
+            )
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.cursor.execute("SELECT COUNT(*) FROM monthly_category_totals")
+        return self.cursor.fetchone()[0]
+
+    # Function to compare the monthly category rollup with a fresh aggregate
+    # Totals are integers, so they must match exactly
+    # Returns a list of (category_id, month, currency, rollup_total, actual_total) mismatches
+    def check_monthly_totals(self):
+        self.cursor.execute("SELECT category_id, month, currency, total, entry_count FROM monthly_category_totals")
+        rollup = {(row[0], row[1], row[2]): (row[3], row[4]) for row in self.cursor.fetchall()}
+
+        self.cursor.execute(
+            f"""
+            SELECT category_id, substr(date, 1, 7), currency, SUM(amount), COUNT(*)
+            FROM {self.history_table("expenses")} WHERE category_id IS NOT NULL
+            GROUP BY category_id, substr(date, 1, 7), currency
+            """
+        )
+        mismatches = []
+        for category_id, month, currency, total, entry_count in self.cursor.fetchall():
+            rollup_total, rollup_count = rollup.pop((category_id, month, currency), (None, 0))
+            if rollup_total != total or rollup_count != entry_count:
+                mismatches.append((category_id, month, currency, rollup_total, total))
+
+        for (category_id, month, currency), (rollup_total, _) in rollup.items():
+            mismatches.append((category_id, month, currency, rollup_total, None))
+        return mismatches
+
+    # Function to look up the spend of a category for one month in minor units
+    # The month defaults to the current one and is given as YYYY-MM
+    @instrumented
+    def get_monthly_spend(self, category_name, month=None, currency=None):
+        month = month or time.strftime("%Y-%m")
+        if self.memory is not None:
+            total = self.memory.monthly_spend(category_name, month, normalize_currency(currency))
+            if total is not None:
+                return total
+        self.cursor.execute(
+            "SELECT total FROM monthly_category_totals WHERE category_id = ? AND month = ? AND currency = ?",
+            (self.get_category_id(category_name), month, normalize_currency(currency)),
+        )
+        total = self.cursor.fetchone()
+        return total[0] if total is not None else 0
+
+    # Function to build the budget-vs-actual report for every category at once
+    # Budgets and month-to-date spend are loaded as columns in a single query
+    # and spend, remaining budget, burn rate and projected overrun are computed
+    # with NumPy over whole arrays instead of looping over categories
+    # Money columns are int64 minor units of one currency; rates are floored
+    @instrumented
+    def build_budget_report(self, month=None, today=None, currency=None):
+        import calendar
+        import datetime
+
+        import numpy as np
+
+        today = today or datetime.date.today()
+        month = month or today.strftime("%Y-%m")
+        year, month_number = (int(part) for part in month.split("-"))
+        days_in_month = calendar.monthrange(year, month_number)[1]
+        if (year, month_number) == (today.year, today.month):
+            days_elapsed = today.day
+        elif (year, month_number) < (today.year, today.month):
+            days_elapsed = days_in_month
+        else:
+            days_elapsed = 0
+        currency = normalize_currency(currency)
+
+        self.cursor.execute(
+            """
+            SELECT c.name, COALESCE(b.budget_amount, 0), COALESCE(t.total, 0)
+            FROM categories c
+            LEFT JOIN budgets b
+                ON b.id = (SELECT MAX(id) FROM budgets WHERE category_id = c.id AND currency = ?)
+            LEFT JOIN monthly_category_totals t
+                ON t.category_id = c.id AND t.month = ? AND t.currency = ?
+            WHERE b.id IS NOT NULL OR t.total IS NOT NULL
+            ORDER BY c.name
+            """,
+            (currency, month, currency),
+        )
+        rows = self.cursor.fetchall()
+        names = [row[0] for row in rows]
+        budget = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        spent = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+
+        remaining = budget - spent
+        if days_elapsed:
+            burn_rate = spent // days_elapsed
+            projected = spent * days_in_month // days_elapsed
+        else:
+            burn_rate = np.zeros_like(spent)
+            projected = spent.copy()
+        overrun = np.where(budget > 0, np.maximum(projected - budget, 0), 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent_used = np.where(budget > 0, spent / budget * 100.0, np.nan)
+
+        return {
+            "month": month,
+            "currency": currency,
+            "days_elapsed": days_elapsed,
+            "days_in_month": days_in_month,
+            "categories": names,
+            "budget": budget,
+            "spent": spent,
+            "remaining": remaining,
+            "burn_rate": burn_rate,
+            "projected": projected,
+            "overrun": overrun,
+            "percent_used": percent_used,
+        }
+
+    # Function to print the budget-vs-actual report
+    @instrumented
+    def view_budget_report(self, month=None, currency=None):
+        try:
+            report = self.build_budget_report(month, currency=currency)
+        except ImportError:
+            print("Error: The budget report needs NumPy. Install it with 'pip install numpy'.")
+            return
+        except ValueError:
+            print("Error: Please enter the month as YYYY-MM and a three-letter currency code.")
+            return
+
+        if not report["categories"]:
+            print(f"No budgets or expenses found for {report['month']}.")
+            return
+
+        row_format = "{:<15} {:>10} {:>10} {:>10} {:>9} {:>10} {:>7} {:<4}"
+        print(
+            f"\nBudget vs Actual for {report['month']} in {report['currency']}"
+            f" (day {report['days_elapsed']} of {report['days_in_month']})"
+        )
+        print(row_format.format("Category", "Budget", "Spent", "Remaining", "Per Day", "Projected", "Used %", ""))
+        print("=" * 82)
+        for index, name in enumerate(report["categories"]):
+            percent_used = report["percent_used"][index]
+            print(
+                row_format.format(
+                    name,
+                    format_money(report["budget"][index], report["currency"]),
+                    format_money(report["spent"][index], report["currency"]),
+                    format_money(report["remaining"][index], report["currency"]),
+                    format_money(report["burn_rate"][index], report["currency"]),
+                    format_money(report["projected"][index], report["currency"]),
+                    "-" if percent_used != percent_used else f"{percent_used:.0f}%",
+                    "OVER" if report["overrun"][index] > 0 else "",
+                )
+            )
+
+    # Function to read the expense or income rows with an id above last_id for a forecast
+    # Rows are totalled per category and day: (category, epoch day, amount, rows, highest id)
+    # The unary + keeps SQLite on the id range instead of walking a category index
+    def read_forecast_rows(self, kind, currency, last_id=0):
+        if kind == "expense":
+            self.cursor.execute(
+                f"""
+                SELECT COALESCE(c.name, ''), CAST(julianday(e.date) - 2440587.5 AS INTEGER) AS day,
+                       SUM(e.amount), COUNT(*), MAX(e.id)
+                FROM {self.history_table("expenses")} e LEFT JOIN categories c ON c.id = e.category_id
+                WHERE +e.category_id IS NOT NULL AND e.currency = ? AND e.id > ?
+                GROUP BY +e.category_id, day
+                """,
+                (currency, last_id),
+            )
+        else:
+            self.cursor.execute(
+                f"""
+                SELECT category_key, CAST(julianday(date) - 2440587.5 AS INTEGER) AS day,
+                       SUM(amount), COUNT(*), MAX(id)
+                FROM {self.history_table("income")}
+                WHERE currency = ? AND id > ?
+                GROUP BY +category_key, day
+                """,
+                (currency, last_id),
+            )
+        return self.cursor.fetchall()
+
+    # Function to count and total the expenses and income of one currency
+    # Expenses come from the monthly rollup, so this does not scan the ledger
+    def read_forecast_signature(self, currency):
+        self.cursor.execute(
+            "SELECT COALESCE(SUM(entry_count), 0), COALESCE(SUM(total), 0) FROM monthly_category_totals WHERE currency = ?",
+            (currency,),
+        )
+        expenses = self.cursor.fetchone()
+        self.cursor.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM {self.history_table('income')} WHERE currency = ?",
+            (currency,),
+        )
+        return tuple(expenses) + tuple(self.cursor.fetchone())
+
+    # Function to forecast the cash flow of every category for the coming months
+    # The history behind each currency's forecast is cached on the repository and
+    # only rows added since the last call are read. When the counts and totals
+    # no longer match the ledger, because an entry was edited or deleted, the
+    # history is read again from scratch
+    @instrumented
+    def build_cash_flow_forecast(self, months=6, today=None, currency=None):
+        import datetime
+
+        if not FORECAST_MIN_MONTHS <= months <= FORECAST_MAX_MONTHS:
+            raise ValueError(f"Forecasts cover {FORECAST_MIN_MONTHS} to {FORECAST_MAX_MONTHS} months.")
+        today = today or datetime.date.today()
+        currency = normalize_currency(currency)
+
+        forecast = self.forecasts.get(currency) or CashFlowForecast(currency)
+        for kind in ("expense", "income"):
+            forecast.add_rows(kind, self.read_forecast_rows(kind, currency, forecast.last_ids[kind]))
+        if forecast.signature() != self.read_forecast_signature(currency):
+            forecast = CashFlowForecast(currency)
+            for kind in ("expense", "income"):
+                forecast.add_rows(kind, self.read_forecast_rows(kind, currency))
+        self.forecasts[currency] = forecast
+        return forecast.project(today, months)
+
+    # Function to print the cash flow forecast month by month and per category
+    # With daily=True the projected balance of every day is printed as well
+    @instrumented
+    def view_cash_flow_forecast(self, months=6, currency=None, daily=False):
+        try:
+            forecast = self.build_cash_flow_forecast(months, currency=currency)
+        except ImportError:
+            print("Error: The forecast needs NumPy. Install it with 'pip install numpy'.")
+            return
+        except ValueError as ve:
+            print(f"Error: {ve}")
+            return
+
+        currency = forecast["currency"]
+        flows = forecast["month_flows"]
+        balance = forecast["balance"]
+        income_rows = [kind == "income" for kind, _ in forecast["categories"]]
+        print(
+            f"\nCash Flow Forecast in {currency} from {forecast['today']}"
+            f" (balance today {format_money(forecast['opening'], currency)})"
+        )
+        row_format = "{:<8} {:>12} {:>12} {:>12} {:>14}"
+        print(row_format.format("Month", "Income", "Expenses", "Net", "Balance"))
+        print("=" * 62)
+        for index, month in enumerate(forecast["months"]):
+            income = sum(flow for flow, is_income in zip(flows[:, index], income_rows) if is_income)
+            expenses = sum(-flow for flow, is_income in zip(flows[:, index], income_rows) if not is_income)
+            end = forecast["month_ends"][index]
+            print(
+                row_format.format(
+                    month,
+                    format_money(round(income), currency),
+                    format_money(round(expenses), currency),
+                    format_money(round(income - expenses), currency),
+                    format_money(round(balance[end]) if end >= 0 else forecast["opening"], currency),
+                )
+            )
+
+        print("\n{:<15} {:<8} {:>14}".format("Category", "Kind", f"Next {months} mo."))
+        print("=" * 39)
+        totals = flows.sum(axis=1)
+        for index in sorted(range(len(totals)), key=lambda index: -abs(totals[index])):
+            kind, name = forecast["categories"][index]
+            print("{:<15} {:<8} {:>14}".format(name, kind, format_money(round(totals[index]), currency)))
+
+        if daily:
+            print("\n{:<10} {:>14}".format("Date", "Balance"))
+            for day, amount in zip(forecast["days"], balance):
+                print("{:<10} {:>14}".format(str(day), format_money(round(amount), currency)))
+
+    # Function to set financial goals
+    # A goal linked to an expense or income category counts every entry in that
+    # category from start_date up to the goal date towards its progress
+    @instrumented
+    def set_financial_goals(
+        self, goal_name, target_amount, date, kind=None, category_name=None, start_date=None, currency=None
+    ):
+        try:
+            self.record_goal(goal_name, target_amount, date, kind, category_name, start_date, currency)
+        except ValueError as ve:
+            print(f"Error: {ve}")
+            return
+        print(
+            f"Financial goal '{goal_name}' of {target_amount} set successfully. Target date: {date}."
+        )
+
+    # Function to insert one financial goal without any prompts or messages
+    # Linked goals start with the progress already in the ledger; after that the
+    # goals_* triggers keep progress_amount current as entries are written
+    # Only entries in the goal's currency count towards it
+    # Returns the id of the new goal
+    @instrumented
+    def record_goal(
+        self, goal_name, target_amount, date, kind=None, category_name=None, start_date=None, currency=None
+    ):
+        import datetime
+
+        if kind not in (None, "expense", "income"):
+            raise ValueError(f"Unknown goal kind '{kind}'. Use 'expense' or 'income'.")
+        if kind is not None and not category_name:
+            raise ValueError("A linked goal needs a category.")
+        category_key = normalize_category_name(category_name) if kind else None
+        if kind is not None and start_date is None:
+            start_date = datetime.date.today().isoformat()
+        currency = normalize_currency(currency)
+        target_amount = to_minor_units(target_amount, currency)
+
+        progress_amount = 0
+        with self.write_transaction():
+            self.cursor.execute(
+                """
+                INSERT INTO financial_goals
+                (goal_name, target_amount, progress_amount, currency, date, kind, category_key, start_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (goal_name, target_amount, progress_amount, currency, date, kind, category_key, start_date),
+            )
+            goal_id = self.cursor.lastrowid
+            if kind is not None:
+                self.refresh_goal_progress(goal_id)
+        return goal_id
+
+    # Function to recompute the progress of linked goals from the ledger
+    # All goals are refreshed by one UPDATE over one aggregate query
+    # Returns the number of goals updated
+    @instrumented
+    def refresh_goal_progress(self, goal_id=None):
+        goal_filter = "" if goal_id is None else " AND g.id = ?"
+        params = () if goal_id is None else (goal_id, goal_id)
+        goal_progress_sql = GOAL_PROGRESS_SQL.format(
+            goal_filter=goal_filter, expenses=self.history_table("expenses"), income=self.history_table("income")
+        )
+        with self.write_transaction():
+            self.cursor.execute(
+                f"""
+                UPDATE financial_goals SET progress_amount = totals.progress
+                FROM ({goal_progress_sql}) AS totals
+                WHERE financial_goals.id = totals.goal_id
+                """,
+                params,
+            )
+            return self.cursor.rowcount
+
+    # Function to compare the stored progress of linked goals with a fresh aggregate
+    # Returns a list of (goal_id, stored_progress, actual_progress) mismatches
+    def check_goal_progress(self):
+        goal_progress_sql = GOAL_PROGRESS_SQL.format(
+            goal_filter="", expenses=self.history_table("expenses"), income=self.history_table("income")
+        )
+        self.cursor.execute(
+            f"""
+            SELECT g.id, g.progress_amount, totals.progress
+            FROM financial_goals g
+            JOIN ({goal_progress_sql}) AS totals ON totals.goal_id = g.id
+            """
+        )
+        return [
+            (goal_id, stored, actual)
+            for goal_id, stored, actual in self.cursor.fetchall()
+            if stored != actual
+        ]
+
+    # Function to work out percent complete, required monthly rate and ETA of every goal
+    # The ETA extends the rate seen since the goal started; unlinked goals have none
+    # Money values are minor units of the goal currency; the monthly rate is rounded up
+    # Returns a list of dicts ordered by goal id
+    @instrumented
+    def build_goal_report(self, today=None):
+        import datetime
+
+        today = today or datetime.date.today()
+        self.cursor.execute(
+            """
+            SELECT id, goal_name, target_amount, progress_amount, currency, date, kind, category_key, start_date
+            FROM financial_goals ORDER BY id
+            """
+        )
+        report = []
+        for goal_id, name, target, progress, currency, date, kind, category_key, start_date in self.cursor.fetchall():
+            remaining = max(target - progress, 0)
+            try:
+                target_date = datetime.date.fromisoformat(date)
+            except (TypeError, ValueError):
+                target_date = None
+
+            monthly_rate = None
+            if target_date is not None:
+                days_left = (target_date - today).days
+                month_days, month_parts = DAYS_PER_MONTH
+                if days_left > 0:
+                    monthly_rate = -(-remaining * month_days // (days_left * month_parts))
+                else:
+                    monthly_rate = remaining
+
+            eta = None
+            if remaining == 0:
+                eta = today
+            elif kind is not None and progress > 0:
+                try:
+                    days_elapsed = max((today - datetime.date.fromisoformat(start_date)).days, 1)
+                except (TypeError, ValueError):
+                    days_elapsed = None
+                if days_elapsed:
+                    eta = today + datetime.timedelta(days=round(remaining / (progress / days_elapsed)))
+
+            report.append(
+                {
+                    "id": goal_id,
+                    "name": name,
+                    "linked_to": f"{kind}:{category_key}" if kind else None,
+                    "target": target,
+                    "progress": progress,
+                    "currency": currency,
+                    "percent": progress / target * 100 if target else 100.0,
+                    "monthly_rate": monthly_rate,
+                    "date": date,
+                    "eta": eta,
+                }
+            )
+        return report
+
+    # Function to list the latest budget of every category and currency
+    # Returns a list of (category, budget_amount, currency) tuples with amounts in minor units
+    @instrumented
+    def list_budgets(self):
+        self.cursor.execute(
+            """
+            SELECT c.name, b.budget_amount, b.currency
+            FROM budgets b
+            JOIN categories c ON c.id = b.category_id
+            WHERE b.id = (SELECT MAX(id) FROM budgets WHERE category_id = b.category_id AND currency = b.currency)
+            ORDER BY c.name, b.currency
+            """
+        )
+        return self.cursor.fetchall()
+
+    # Function to list the financial goals
+    # Returns a list of (id, goal_name, target_amount, progress_amount, date, currency)
+    # tuples with amounts in minor units
+    @instrumented
+    def list_goals(self):
+        self.cursor.execute(
+            "SELECT id, goal_name, target_amount, progress_amount, date, currency FROM financial_goals ORDER BY id"
+        )
+        return self.cursor.fetchall()
+
+    # Function to view progress towards financial goals
+    @instrumented
+    def view_progress_towards_goals(self):
+        goals = self.build_goal_report()
+
+        if not goals:
+            print("No goals in progress.")
+            return
+
+        row_format = "{:<4} {:<15} {:<18} {:>10} {:>10} {:>6} {:>10} {:<10} {:<10}"
+        print(row_format.format("ID", "Goal", "Linked To", "Target", "Progress", "Done", "Per Month", "Date", "ETA"))
+        print("=" * 101)
+        for goal in goals:
+            if goal["progress"] >= goal["target"]:
+                eta = "Reached"
+            else:
+                eta = goal["eta"].isoformat() if goal["eta"] else "-"
+            print(
+                row_format.format(
+                    goal["id"],
+                    goal["name"],
+                    goal["linked_to"] or "-",
+                    format_money(goal["target"], goal["currency"]),
+                    format_money(goal["progress"], goal["currency"]),
+                    f"{goal['percent']:.0f}%",
+                    "-" if goal["monthly_rate"] is None else format_money(goal["monthly_rate"], goal["currency"]),
+                    goal["date"],
+                    eta,
+                )
+            )
+
+    # Function to add a recurring expense or income rule
+    @instrumented
+    def add_recurring_rule(
+        self, name, kind, category_name, amount, schedule, start_date, end_date=None, currency=None
+    ):
+        try:
+            rule_id = self.record_recurring_rule(
+                name, kind, category_name, amount, schedule, start_date, end_date, currency
+            )
+        except ValueError as ve:
+            print(f"Error: {ve}")
+            return
+        except sqlite3.Error as se:
+            print(f"SQLite Error: {se}")
+            return
+        print(f"Recurring {kind} '{name}' ({schedule}) added with ID {rule_id}.")
+
+    # Function to insert one recurring rule without any prompts or messages
+    # Nothing is posted until run_recurring_rules() catches the rule up
+    # Returns the id of the new rule
+    def record_recurring_rule(
+        self, name, kind, category_name, amount, schedule, start_date, end_date=None, currency=None
+    ):
+        import datetime
+
+        if kind not in ("expense", "income"):
+            raise ValueError(f"Unknown rule kind '{kind}'. Use 'expense' or 'income'.")
+        category_name = normalize_category_name(category_name)
+        if not category_name:
+            raise ValueError("A recurring rule needs a category.")
+        start = datetime.date.fromisoformat(str(start_date))
+        if end_date and datetime.date.fromisoformat(str(end_date)) < start:
+            raise ValueError("The end date is before the start date.")
+        compile_recurring_schedule(schedule, start)
+        currency = normalize_currency(currency)
+
+        self.cursor.execute(
+            """
+            INSERT INTO recurring_rules
+            (name, kind, category, amount, currency, schedule, start_date, end_date, next_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                name,
+                kind,
+                category_name,
+                to_minor_units(amount, currency),
+                currency,
+                str(schedule).strip().lower(),
+                start.isoformat(),
+                end_date or None,
+                start.isoformat(),
+            ),
+        )
+        rule_id = self.cursor.lastrowid
+        self.commit_writes()
+        return rule_id
+
+    # Function to delete a recurring rule; entries it already posted are kept
+    # Returns True when the rule existed
+    def delete_recurring_rule(self, rule_id):
+        self.cursor.execute("DELETE FROM recurring_rules WHERE id = ?", (rule_id,))
+        deleted = self.cursor.rowcount > 0
+        self.commit_writes()
+        return deleted
+
+    # Function to list the recurring rules
+    # Returns a list of (id, name, kind, category, amount, currency, schedule,
+    # start_date, end_date, next_date) tuples with amounts in minor units
+    def list_recurring_rules(self):
+        self.cursor.execute(
+            """
+            SELECT id, name, kind, category, amount, currency, schedule, start_date, end_date, next_date
+            FROM recurring_rules ORDER BY id
+            """
+        )
+        return self.cursor.fetchall()
+
+    # Function to view the recurring rules
+    def view_recurring_rules(self):
+        rules = self.list_recurring_rules()
+
+        if not rules:
+            print("No recurring rules found.")
+            return
+
+        row_format = "{:<4} {:<15} {:<8} {:<15} {:>12} {:<8} {:<12} {:<10} {:<10}"
+        print(row_format.format("ID", "Name", "Kind", "Category", "Amount", "Currency", "Schedule", "Ends", "Next"))
+        print("=" * 102)
+        for rule_id, name, kind, category, amount, currency, schedule, _, end_date, next_date in rules:
+            print(
+                row_format.format(
+                    rule_id, name, kind, category, format_money(amount, currency), currency, schedule, end_date or "-", next_date
+                )
+            )
+
+    # Function to post every occurrence of every recurring rule that is due
+    # Each rule remembers next_date, the first day it has not been posted for;
+    # all missed occurrences up to today are inserted with executemany and every
+    # next_date is moved past today in the same transaction. A crash leaves the
+    # watermarks and the entries unchanged together, and a second scheduler that
+    # read the same rules fails to commit, so nothing is ever posted twice
+    # Returns the number of rules caught up and entries posted
+    @instrumented
+    def run_recurring_rules(self, today=None):
+        import datetime
+
+        today = today or datetime.date.today()
+        start = time.perf_counter()
+        expenses = []
+        income = []
+        with self.write_transaction():
+            self.cursor.execute(
+                """
+                SELECT id, kind, category, amount, currency, schedule, start_date, end_date, next_date
+                FROM recurring_rules
+                WHERE next_date <= ? AND (end_date IS NULL OR next_date <= end_date)
+                ORDER BY id
+                """,
+                (today.isoformat(),),
+            )
+            rules = self.cursor.fetchall()
+
+            for rule_id, kind, category, amount, currency, schedule, start_date, end_date, next_date in rules:
+                last = today if end_date is None else min(today, datetime.date.fromisoformat(end_date))
+                dates = recurring_occurrences(
+                    schedule,
+                    datetime.date.fromisoformat(start_date),
+                    datetime.date.fromisoformat(next_date),
+                    last,
+                )
+                if kind == "income":
+                    income.extend((category, amount, currency, date) for date in dates)
+                    continue
+                category_id = self.get_category_id(category)
+                if category_id is None:
+                    category_id = self.record_category(category)
+                expenses.extend((category_id, amount, currency, date) for date in dates)
+
+            if self.budget_alerts is not None:
+                for category_id, amount, currency, date in expenses:
+                    self.budget_alerts.record(category_id, currency, date, amount, written=False)
+            self.cursor.executemany(
+                "INSERT INTO expenses (category_id, amount, currency, date) VALUES (?, ?, ?, ?)", expenses
+            )
+            self.cursor.executemany(
+                "INSERT INTO income (category, amount, currency, date) VALUES (?, ?, ?, ?)", income
+            )
+            if self.memory is not None:
+                self.memory.appended("expense")
+                self.memory.appended("income")
+            next_date = (today + datetime.timedelta(days=1)).isoformat()
+            self.cursor.executemany(
+                "UPDATE recurring_rules SET next_date = ? WHERE id = ?", [(next_date, rule[0]) for rule in rules]
+            )
+        return {
+            "rules": len(rules),
+            "expenses": len(expenses),
+            "income": len(income),
+            "seconds": time.perf_counter() - start,
+        }
+
+    # Function to bulk import expenses or income from a CSV or JSONL file
+    # Rows are inserted with executemany inside one write_transaction() per chunk,
+    # which joins the caller's transaction when there is one
+    # Unknown expense categories are created unless create_categories is False
+    # Optional 'currency' and 'reference' fields set the currency and bank reference of each row
+    # With duplicates set to "skip" or "flag", rows are matched one-for-one against
+    # entries already in the ledger by fingerprint: one indexed lookup per distinct
+    # fingerprint per chunk, then a dictionary lookup per row. Overlapping exports
+    # therefore add only their new rows, while two identical rows within one file
+    # both count as new unless the ledger already has them
+    @instrumented
+    def bulk_import(
+        self, path, kind="expense", chunk_size=IMPORT_CHUNK_SIZE, create_categories=True, duplicates="allow"
+    ):
+        if kind not in ("expense", "income"):
+            raise ValueError(f"Unknown import kind '{kind}'. Use 'expense' or 'income'.")
+        if duplicates not in DUPLICATE_MODES:
+            raise ValueError(f"Unknown duplicates mode '{duplicates}'. Use one of: {', '.join(DUPLICATE_MODES)}.")
+
+        category_map = self.load_category_map() if kind == "expense" else None
+        imported = 0
+        skipped = 0
+        row_number = 0
+        duplicate_rows = []
+        unmatched = {}
+        start = time.perf_counter()
+        if duplicates != "allow":
+            self.fill_fingerprints(kind)
+
+        for chunk in read_import_chunks(path, chunk_size):
+            with self.write_transaction():
+                values = []
+                row_numbers = []
+                for row in chunk:
+                    row_number += 1
+                    try:
+                        category_name = normalize_category_name(row["category"])
+                        currency = normalize_currency(row.get("currency"))
+                        amount = to_minor_units(row["amount"], currency)
+                        date = str(row["date"]).strip()
+                        reference = str(row.get("reference") or "").strip() or None
+                    except (KeyError, TypeError, ValueError):
+                        skipped += 1
+                        continue
+
+                    if not category_name or not date:
+                        skipped += 1
+                        continue
+
+                    fingerprint = transaction_fingerprint(kind, category_name, amount, currency, date, reference)
+                    if kind == "income":
+                        values.append((category_name, amount, currency, date, reference, fingerprint))
+                        row_numbers.append(row_number)
+                        continue
+
+                    category_id = category_map.get(category_name)
+                    if category_id is None:
+                        if not create_categories:
+                            skipped += 1
+                            continue
+                        self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (category_name,))
+                        category_id = self.cursor.lastrowid
+                        self.remember_category(category_name, category_id)
+                    values.append((category_id, amount, currency, date, reference, fingerprint))
+                    row_numbers.append(row_number)
+
+                if duplicates != "allow":
+                    # Each fingerprint is looked up once per import: until then no row
+                    # of this import carries it, so the count is of earlier entries only
+                    unseen = list({row[-1] for row in values if row[-1] not in unmatched})
+                    stored = self.count_fingerprints(kind, unseen) if unseen else {}
+                    for fingerprint in unseen:
+                        unmatched[fingerprint] = stored.get(fingerprint, 0)
+                    kept = []
+                    for number, row in zip(row_numbers, values):
+                        if unmatched[row[-1]] > 0:
+                            unmatched[row[-1]] -= 1
+                            duplicate_rows.append(number)
+                            if duplicates == "skip":
+                                continue
+                        kept.append(row)
+                    values = kept
+
+                if kind == "expense":
+                    if self.budget_alerts is not None:
+                        for category_id, amount, currency, date, _, _ in values:
+                            self.budget_alerts.record(category_id, currency, date, amount, written=False)
+                    self.cursor.executemany(
+                        """
+                        INSERT INTO expenses (category_id, amount, currency, date, reference, fingerprint)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        values,
+                    )
+                else:
+                    self.cursor.executemany(
+                        """
+                        INSERT INTO income (category, amount, currency, date, reference, fingerprint)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        values,
+                    )
+            if self.memory is not None:
+                self.memory.appended(kind)
+            imported += len(values)
+
+        seconds = time.perf_counter() - start
+        return {
+            "rows": imported,
+            "skipped": skipped,
+            "duplicates": len(duplicate_rows),
+            "duplicate_rows": duplicate_rows,
+            "seconds": seconds,
+            "rows_per_sec": imported / seconds if seconds > 0 else 0.0,
+        }
+
+    # Function to fingerprint every row that does not have a fingerprint yet
+    # Only bulk imports fingerprint rows as they are written, and editing a row
+    # clears its fingerprint; everything else is caught up here, which on the
+    # first call is a one-time backfill. The rows
+    # without one sit together at the front of idx_expenses_fingerprint
+    # Returns the number of rows fingerprinted
+    @instrumented
+    def fill_fingerprints(self, kind):
+        with self.write_transaction():
+            if kind == "expense":
+                self.cursor.execute(
+                    """
+                    UPDATE expenses SET fingerprint = transaction_fingerprint(
+                        'expense',
+                        COALESCE((SELECT name FROM categories WHERE id = expenses.category_id), ''),
+                        amount, currency, date, reference
+                    )
+                    WHERE fingerprint IS NULL
+                    """
+                )
+            else:
+                self.cursor.execute(
+                    """
+                    UPDATE income SET fingerprint = transaction_fingerprint('income', category, amount, currency, date, reference)
+                    WHERE fingerprint IS NULL
+                    """
+                )
+            return self.cursor.rowcount
+
+    # Function to count the stored entries behind each of the given fingerprints
+    # Returns a dictionary of fingerprint -> count, without fingerprints that have no entries
+    def count_fingerprints(self, kind, fingerprints):
+        table = "expenses" if kind == "expense" else "income"
+        self.cursor.execute(
+            f"""
+            SELECT fingerprint, COUNT(*) FROM {table}
+            WHERE fingerprint IN (SELECT value FROM json_each(?))
+            GROUP BY fingerprint
+            """,
+            (json.dumps(list(fingerprints)),),
+        )
+        return dict(self.cursor.fetchall())
+
+    # Function to find groups of identical entries already in the ledger
+    # Equal fingerprints are grouped in one pass over idx_expenses_fingerprint, so
+    # the scan grows linearly with the ledger instead of comparing every pair of
+    # rows; the rows of each group are then compared field by field, so a hash
+    # collision is never reported as a duplicate
+    # Returns a list of (ids, category, amount, currency, date, reference) with the lowest id first
+    @instrumented
+    def find_duplicates(self, kind="expense"):
+        if not self.read_only:
+            self.fill_fingerprints(kind)
+        if kind == "expense":
+            rows_sql = """
+                SELECT e.fingerprint, e.id, COALESCE(c.name, ''), e.amount, e.currency, e.date, e.reference
+                FROM expenses e LEFT JOIN categories c ON c.id = e.category_id
+                WHERE e.fingerprint IN ({groups})
+                ORDER BY e.fingerprint, e.id
+            """
+            table = "expenses"
+        else:
+            rows_sql = """
+                SELECT fingerprint, id, category_key, amount, currency, date, reference
+                FROM income
+                WHERE fingerprint IN ({groups})
+                ORDER BY fingerprint, id
+            """
+            table = "income"
+        self.cursor.execute(
+            rows_sql.format(
+                groups=f"SELECT fingerprint FROM {table} WHERE fingerprint IS NOT NULL "
+                "GROUP BY fingerprint HAVING COUNT(*) > 1"
+            )
+        )
+
+        groups = []
+        for _, rows in itertools.groupby(self.cursor.fetchall(), key=lambda row: row[0]):
+            identical = {}
+            for _, row_id, category, amount, currency, date, reference in rows:
+                key = (normalize_category_name(category), amount, currency, date, (reference or "").strip())
+                identical.setdefault(key, []).append(row_id)
+            for (category, amount, currency, date, reference), ids in identical.items():
+                if len(ids) > 1:
+                    groups.append((ids, category, amount, currency, date, reference or None))
+        groups.sort()
+        return groups
+
+    # Function to delete every duplicate but the first entry of each group
+    # The rollup and goal triggers keep their totals in step with the deletes
+    # Returns the number of entries deleted
+    @instrumented
+    def remove_duplicates(self, kind="expense"):
+        table = "expenses" if kind == "expense" else "income"
+        extra_ids = [(row_id,) for group in self.find_duplicates(kind) for row_id in group[0][1:]]
+        with self.write_transaction():
+            self.cursor.executemany(f"DELETE FROM {table} WHERE id = ?", extra_ids)
+        if self.memory is not None:
+            self.memory.invalidate(kind)
+        return len(extra_ids)
+
+    # Function to export expenses and income as a columnar snapshot directory
+    # Each table is streamed in chunks straight into memory-mapped .npy files:
+    # id int64, amount int64 (minor units), day int32 (epoch days), and category
+    # and currency int32 codes into the table's dictionaries. The manifest is
+    # written last, so an interrupted export is never loadable
+    @instrumented
+    def export_snapshot(self, directory, chunk_size=IMPORT_CHUNK_SIZE):
+        import numpy as np
+
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest_path = directory / SNAPSHOT_MANIFEST
+        if manifest_path.exists():
+            manifest_path.unlink()
+
+        expenses = self.history_table("expenses")
+        income = self.history_table("income")
+        sources = {
+            "expenses": (
+                expenses,
+                f"""
+                SELECT id, category_id, amount, CAST(julianday(date) - 2440587.5 AS INTEGER), currency
+                FROM {expenses} ORDER BY id
+                """,
+                "SELECT id, name FROM categories",
+            ),
+            "income": (
+                income,
+                f"""
+                SELECT id, category_key, amount, CAST(julianday(date) - 2440587.5 AS INTEGER), currency
+                FROM {income} ORDER BY id
+                """,
+                None,
+            ),
+        }
+        manifest = {"version": SNAPSHOT_FORMAT_VERSION, "tables": {}}
+        start = time.perf_counter()
+
+        # Read both tables from one snapshot of the database
+        started_transaction = not self.conn.in_transaction
+        if started_transaction:
+            self.cursor.execute("BEGIN")
+        try:
+            for table, (source, row_sql, names_sql) in sources.items():
+                self.cursor.execute(f"SELECT COUNT(*) FROM {source}")
+                row_count = self.cursor.fetchone()[0]
+                names_by_key = dict(self.cursor.execute(names_sql).fetchall()) if names_sql else {}
+                codes = {}
+                dictionary = []
+                currency_codes = {}
+
+                columns = {
+                    "id": np.int64,
+                    "amount": np.int64,
+                    "day": np.int32,
+                    "category": np.int32,
+                    "currency": np.int32,
+                }
+                arrays = {
+                    column: np.lib.format.open_memmap(
+                        directory / f"{table}.{column}.npy", mode="w+", dtype=dtype, shape=(row_count,)
+                    )
+                    for column, dtype in columns.items()
+                }
+
+                export_cursor = self.conn.cursor()
+                export_cursor.execute(row_sql)
+                offset = 0
+                while True:
+                    rows = export_cursor.fetchmany(chunk_size)
+                    if not rows or offset >= row_count:
+                        break
+                    rows = rows[: row_count - offset]
+                    end = offset + len(rows)
+                    row_ids, keys, amounts, days, currencies = zip(*rows)
+                    category_codes = []
+                    for key in keys:
+                        code = codes.get(key)
+                        if code is None:
+                            code = codes[key] = len(dictionary)
+                            dictionary.append(names_by_key.get(key, key))
+                        category_codes.append(code)
+                    arrays["id"][offset:end] = row_ids
+                    arrays["amount"][offset:end] = amounts
+                    arrays["day"][offset:end] = [SNAPSHOT_MISSING_DAY if day is None else day for day in days]
+                    arrays["category"][offset:end] = category_codes
+                    arrays["currency"][offset:end] = [
+                        currency_codes.setdefault(currency, len(currency_codes)) for currency in currencies
+                    ]
+                    offset = end
+                export_cursor.close()
+
+                for array in arrays.values():
+                    array.flush()
+                del arrays
+                manifest["tables"][table] = {
+                    "rows": offset,
+                    "categories": dictionary,
+                    "currencies": list(currency_codes),
+                }
+        finally:
+            if started_transaction:
+                self.conn.rollback()
+
+        manifest["seconds"] = time.perf_counter() - start
+        manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        return manifest
+
+    # Add sample data
+    # Every sample row is only inserted when the ledger, archives included,
+    # does not have it yet, since the menu calls this each time it starts
+    def add_sample_data(self):
+        def insert_category(name):
+            if self.get_category_id(name) is None:
+                self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (normalize_category_name(name),))
+                self.remember_category(name, self.cursor.lastrowid)
+
+        def insert_expense(category_name, amount, date):
+            category_id = self.get_category_id(category_name)
+            if category_id is None:
+                return
+            values = (category_id, to_minor_units(amount), DEFAULT_CURRENCY, date)
+            self.cursor.execute(
+                f"SELECT COUNT(*) FROM {self.history_table('expenses')} WHERE category_id = ? AND amount = ? AND currency = ? AND date = ?",
+                values,
+            )
+            if self.cursor.fetchone()[0] == 0:
+                self.cursor.execute("INSERT INTO expenses (category_id, amount, currency, date) VALUES (?, ?, ?, ?)", values)
+
+        def insert_income(category_name, amount, date):
+            values = (normalize_category_name(category_name), to_minor_units(amount), DEFAULT_CURRENCY, date)
+            self.cursor.execute(
+                f"SELECT COUNT(*) FROM {self.history_table('income')} WHERE category_key = ? AND amount = ? AND currency = ? AND date = ?",
+                values,
+            )
+            if self.cursor.fetchone()[0] == 0:
+                self.cursor.execute("INSERT INTO income (category, amount, currency, date) VALUES (?, ?, ?, ?)", values)
+
+        def insert_budget(category_name, budget_amount):
+            category_id = self.get_category_id(category_name)
+            self.cursor.execute(
+                "SELECT COUNT(*) FROM budgets WHERE category_id = ? AND currency = ?", (category_id, DEFAULT_CURRENCY)
+            )
+            if self.cursor.fetchone()[0] == 0:
+                self.cursor.execute(
+                    "INSERT INTO budgets (category_id, budget_amount, currency) VALUES (?, ?, ?)",
+                    (category_id, to_minor_units(budget_amount), DEFAULT_CURRENCY),
+                )
+
+        def insert_goal(goal_name, target_amount, date):
+            goal_name_lower = goal_name.lower()
+
+            self.cursor.execute(
+                "SELECT COUNT(*) FROM financial_goals WHERE goal_name = ?", (goal_name_lower,)
+            )
+            goal_exists = self.cursor.fetchone()[0] > 0
+
+            if not goal_exists:
+                self.cursor.execute(
+                    """
+                    INSERT INTO financial_goals (goal_name, target_amount, progress_amount, currency, date)
+                    VALUES (?, ?, 0, ?, ?)
+                    """,
+                    (goal_name, to_minor_units(target_amount), DEFAULT_CURRENCY, date),
+                )
+        insert_category("utilities")
+        insert_category("salary")
+        insert_goal("vacation", 15000.0, "2024-06-30")
+
+        insert_expense("utilities", 1200.0, "2024-01-19")
+        insert_income("salary", 45000.0, "2024-01-25")
+
+        insert_category("groceries")
+        insert_category("entertainment")
+
+        insert_budget("groceries", 3000.00)
+        insert_budget("entertainment", 1500.0)
+
+        if self.memory is not None:
+            self.memory.appended("expense")
+            self.memory.appended("income")
+        self.commit_writes()
@@ -0,0 +1,548 @@
+# Schema of a ledger file: the versioned migrations, the yearly archive tables
+# and the SQL kept next to the indexes it relies on
+
+from .query import PAGE_SIZE
+
+
+# Closed years can be moved out of the live tables into one archive file per
+# year, written next to the ledger, e.g. expense_tracker_2021.db
+ARCHIVE_FILE_FORMAT = "{stem}_{year}.db"
+
+# Tables and indexes of an archive file; {schema} is the name it is attached as
+ARCHIVE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.expenses (
+        id INTEGER PRIMARY KEY,
+        category_id INTEGER,
+        amount INTEGER NOT NULL,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        date DATE NOT NULL,
+        reference TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.income (
+        id INTEGER PRIMARY KEY,
+        category TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        date DATE NOT NULL,
+        category_key TEXT COLLATE NOCASE,
+        reference TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_expenses_category_date ON expenses (category_id, date, amount)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_expenses_date ON expenses (date, category_id, amount)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_income_category_date ON income (category_key, date, amount)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_income_date ON income (date, category_key, amount)",
+]
+
+
+# Schema migrations applied in order on top of create_tables()
+# PRAGMA user_version records the last migration applied to a database file
+MIGRATIONS = [
+    (
+        1,
+        "Add secondary indexes for category and date filters",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses (category_id, date, amount)",
+            "CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date, category_id, amount)",
+            "CREATE INDEX IF NOT EXISTS idx_budgets_category ON budgets (category_id, budget_amount)",
+        ],
+    ),
+    (
+        2,
+        "Add normalized income category column",
+        [
+            "ALTER TABLE income ADD COLUMN category_key TEXT COLLATE NOCASE",
+            "UPDATE income SET category_key = LOWER(TRIM(category))",
+            """
+            CREATE TRIGGER IF NOT EXISTS income_category_key_insert AFTER INSERT ON income
+            WHEN NEW.category_key IS NULL
+            BEGIN
+                UPDATE income SET category_key = LOWER(TRIM(NEW.category)) WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS income_category_key_update AFTER UPDATE OF category ON income
+            BEGIN
+                UPDATE income SET category_key = LOWER(TRIM(NEW.category)) WHERE id = NEW.id;
+            END
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_income_category_date ON income (category_key, date, amount)",
+            "CREATE INDEX IF NOT EXISTS idx_income_date ON income (date, category_key, amount)",
+        ],
+    ),
+    (
+        3,
+        "Add (date, id) indexes for keyset pagination",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_expenses_page ON expenses (date, id)",
+            "CREATE INDEX IF NOT EXISTS idx_income_page ON income (date, id)",
+            "CREATE INDEX IF NOT EXISTS idx_income_category_page ON income (category_key, date, id)",
+        ],
+    ),
+    (
+        4,
+        "Add monthly category rollup maintained by triggers",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS monthly_category_totals (
+                category_id INTEGER NOT NULL,
+                month TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                entry_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (category_id, month)
+            ) WITHOUT ROWID
+            """,
+            """
+            INSERT INTO monthly_category_totals (category_id, month, total, entry_count)
+            SELECT category_id, substr(date, 1, 7), SUM(amount), COUNT(*)
+            FROM expenses WHERE category_id IS NOT NULL
+            GROUP BY category_id, substr(date, 1, 7)
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS expenses_rollup_insert AFTER INSERT ON expenses
+            WHEN NEW.category_id IS NOT NULL
+            BEGIN
+                INSERT INTO monthly_category_totals (category_id, month, total, entry_count)
+                VALUES (NEW.category_id, substr(NEW.date, 1, 7), NEW.amount, 1)
+                ON CONFLICT (category_id, month) DO UPDATE
+                SET total = total + excluded.total, entry_count = entry_count + 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS expenses_rollup_delete AFTER DELETE ON expenses
+            WHEN OLD.category_id IS NOT NULL
+            BEGIN
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, entry_count = entry_count - 1
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7);
+                DELETE FROM monthly_category_totals
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7) AND entry_count <= 0;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS expenses_rollup_update AFTER UPDATE OF category_id, amount, date ON expenses
+            BEGIN
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, entry_count = entry_count - 1
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7);
+                DELETE FROM monthly_category_totals
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7) AND entry_count <= 0;
+                INSERT INTO monthly_category_totals (category_id, month, total, entry_count)
+                SELECT NEW.category_id, substr(NEW.date, 1, 7), NEW.amount, 1
+                WHERE NEW.category_id IS NOT NULL
+                ON CONFLICT (category_id, month) DO UPDATE
+                SET total = total + excluded.total, entry_count = entry_count + 1;
+            END
+            """,
+        ],
+    ),
+    (
+        5,
+        "Link financial goals to ledger categories and keep their progress current",
+        [
+            "ALTER TABLE financial_goals ADD COLUMN kind TEXT",
+            "ALTER TABLE financial_goals ADD COLUMN category_key TEXT COLLATE NOCASE",
+            "ALTER TABLE financial_goals ADD COLUMN start_date DATE",
+            "CREATE INDEX IF NOT EXISTS idx_goals_link ON financial_goals (kind, category_key, start_date, date)",
+            """
+            CREATE TRIGGER IF NOT EXISTS goals_expense_insert AFTER INSERT ON expenses
+            WHEN NEW.category_id IS NOT NULL
+            BEGIN
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) + NEW.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = NEW.category_id)
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS goals_expense_delete AFTER DELETE ON expenses
+            WHEN OLD.category_id IS NOT NULL
+            BEGIN
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) - OLD.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = OLD.category_id)
+                AND OLD.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS goals_expense_update AFTER UPDATE OF category_id, amount, date ON expenses
+            BEGIN
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) - OLD.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = OLD.category_id)
+                AND OLD.date BETWEEN start_date AND date;
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) + NEW.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = NEW.category_id)
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS goals_income_insert AFTER INSERT ON income
+            BEGIN
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) + NEW.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(NEW.category))
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS goals_income_delete AFTER DELETE ON income
+            BEGIN
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) - OLD.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(OLD.category))
+                AND OLD.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS goals_income_update AFTER UPDATE OF category, amount, date ON income
+            BEGIN
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) - OLD.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(OLD.category))
+                AND OLD.date BETWEEN start_date AND date;
+                UPDATE financial_goals SET progress_amount = COALESCE(progress_amount, 0) + NEW.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(NEW.category))
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+        ],
+    ),
+    (
+        6,
+        "Store money as integer minor units with a currency code",
+        [
+            """
+            CREATE TABLE expenses_minor (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER,
+                amount INTEGER NOT NULL,
+                currency TEXT NOT NULL DEFAULT 'USD',
+                date DATE NOT NULL,
+                FOREIGN KEY (category_id) REFERENCES categories (id)
+            )
+            """,
+            """
+            INSERT INTO expenses_minor (id, category_id, amount, date)
+            SELECT id, category_id, CAST(ROUND(amount * 100) AS INTEGER), date FROM expenses
+            """,
+            "DROP TABLE expenses",
+            "ALTER TABLE expenses_minor RENAME TO expenses",
+            """
+            CREATE TABLE income_minor (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                currency TEXT NOT NULL DEFAULT 'USD',
+                date DATE NOT NULL,
+                category_key TEXT COLLATE NOCASE
+            )
+            """,
+            """
+            INSERT INTO income_minor (id, category, amount, date, category_key)
+            SELECT id, category, CAST(ROUND(amount * 100) AS INTEGER), date, category_key FROM income
+            """,
+            "DROP TABLE income",
+            "ALTER TABLE income_minor RENAME TO income",
+            """
+            CREATE TABLE budgets_minor (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER,
+                budget_amount INTEGER NOT NULL,
+                currency TEXT NOT NULL DEFAULT 'USD',
+                FOREIGN KEY (category_id) REFERENCES categories (id)
+            )
+            """,
+            """
+            INSERT INTO budgets_minor (id, category_id, budget_amount)
+            SELECT id, category_id, CAST(ROUND(budget_amount * 100) AS INTEGER) FROM budgets
+            """,
+            "DROP TABLE budgets",
+            "ALTER TABLE budgets_minor RENAME TO budgets",
+            """
+            CREATE TABLE financial_goals_minor (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                goal_name TEXT NOT NULL,
+                target_amount INTEGER NOT NULL,
+                progress_amount INTEGER NOT NULL DEFAULT 0,
+                currency TEXT NOT NULL DEFAULT 'USD',
+                date DATE NOT NULL,
+                kind TEXT,
+                category_key TEXT COLLATE NOCASE,
+                start_date DATE
+            )
+            """,
+            """
+            INSERT INTO financial_goals_minor
+            (id, goal_name, target_amount, progress_amount, date, kind, category_key, start_date)
+            SELECT id, goal_name, CAST(ROUND(target_amount * 100) AS INTEGER),
+                CAST(ROUND(COALESCE(progress_amount, 0) * 100) AS INTEGER), date, kind, category_key, start_date
+            FROM financial_goals
+            """,
+            "DROP TABLE financial_goals",
+            "ALTER TABLE financial_goals_minor RENAME TO financial_goals",
+            "DROP TABLE monthly_category_totals",
+            """
+            CREATE TABLE monthly_category_totals (
+                category_id INTEGER NOT NULL,
+                month TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                entry_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (category_id, month, currency)
+            ) WITHOUT ROWID
+            """,
+            """
+            INSERT INTO monthly_category_totals (category_id, month, currency, total, entry_count)
+            SELECT category_id, substr(date, 1, 7), currency, SUM(amount), COUNT(*)
+            FROM expenses WHERE category_id IS NOT NULL
+            GROUP BY category_id, substr(date, 1, 7), currency
+            """,
+            "CREATE INDEX idx_expenses_category_date ON expenses (category_id, date, amount, currency)",
+            "CREATE INDEX idx_expenses_date ON expenses (date, category_id, amount, currency)",
+            "CREATE INDEX idx_expenses_page ON expenses (date, id)",
+            "CREATE INDEX idx_income_category_date ON income (category_key, date, amount, currency)",
+            "CREATE INDEX idx_income_date ON income (date, category_key, amount, currency)",
+            "CREATE INDEX idx_income_page ON income (date, id)",
+            "CREATE INDEX idx_income_category_page ON income (category_key, date, id)",
+            "CREATE INDEX idx_budgets_category ON budgets (category_id, budget_amount)",
+            "CREATE INDEX idx_goals_link ON financial_goals (kind, category_key, start_date, date)",
+            """
+            CREATE TRIGGER income_category_key_insert AFTER INSERT ON income
+            WHEN NEW.category_key IS NULL
+            BEGIN
+                UPDATE income SET category_key = LOWER(TRIM(NEW.category)) WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER income_category_key_update AFTER UPDATE OF category ON income
+            BEGIN
+                UPDATE income SET category_key = LOWER(TRIM(NEW.category)) WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER expenses_rollup_insert AFTER INSERT ON expenses
+            WHEN NEW.category_id IS NOT NULL
+            BEGIN
+                INSERT INTO monthly_category_totals (category_id, month, currency, total, entry_count)
+                VALUES (NEW.category_id, substr(NEW.date, 1, 7), NEW.currency, NEW.amount, 1)
+                ON CONFLICT (category_id, month, currency) DO UPDATE
+                SET total = total + excluded.total, entry_count = entry_count + 1;
+            END
+            """,
+            """
+            CREATE TRIGGER expenses_rollup_delete AFTER DELETE ON expenses
+            WHEN OLD.category_id IS NOT NULL
+            BEGIN
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, entry_count = entry_count - 1
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7) AND currency = OLD.currency;
+                DELETE FROM monthly_category_totals
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7) AND currency = OLD.currency
+                AND entry_count <= 0;
+            END
+            """,
+            """
+            CREATE TRIGGER expenses_rollup_update AFTER UPDATE OF category_id, amount, currency, date ON expenses
+            BEGIN
+                UPDATE monthly_category_totals
+                SET total = total - OLD.amount, entry_count = entry_count - 1
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7) AND currency = OLD.currency;
+                DELETE FROM monthly_category_totals
+                WHERE category_id = OLD.category_id AND month = substr(OLD.date, 1, 7) AND currency = OLD.currency
+                AND entry_count <= 0;
+                INSERT INTO monthly_category_totals (category_id, month, currency, total, entry_count)
+                SELECT NEW.category_id, substr(NEW.date, 1, 7), NEW.currency, NEW.amount, 1
+                WHERE NEW.category_id IS NOT NULL
+                ON CONFLICT (category_id, month, currency) DO UPDATE
+                SET total = total + excluded.total, entry_count = entry_count + 1;
+            END
+            """,
+            """
+            CREATE TRIGGER goals_expense_insert AFTER INSERT ON expenses
+            WHEN NEW.category_id IS NOT NULL
+            BEGIN
+                UPDATE financial_goals SET progress_amount = progress_amount + NEW.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = NEW.category_id)
+                AND currency = NEW.currency
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER goals_expense_delete AFTER DELETE ON expenses
+            WHEN OLD.category_id IS NOT NULL
+            BEGIN
+                UPDATE financial_goals SET progress_amount = progress_amount - OLD.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = OLD.category_id)
+                AND currency = OLD.currency
+                AND OLD.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER goals_expense_update AFTER UPDATE OF category_id, amount, currency, date ON expenses
+            BEGIN
+                UPDATE financial_goals SET progress_amount = progress_amount - OLD.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = OLD.category_id)
+                AND currency = OLD.currency
+                AND OLD.date BETWEEN start_date AND date;
+                UPDATE financial_goals SET progress_amount = progress_amount + NEW.amount
+                WHERE kind = 'expense'
+                AND category_key = (SELECT name FROM categories WHERE id = NEW.category_id)
+                AND currency = NEW.currency
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER goals_income_insert AFTER INSERT ON income
+            BEGIN
+                UPDATE financial_goals SET progress_amount = progress_amount + NEW.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(NEW.category))
+                AND currency = NEW.currency
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER goals_income_delete AFTER DELETE ON income
+            BEGIN
+                UPDATE financial_goals SET progress_amount = progress_amount - OLD.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(OLD.category))
+                AND currency = OLD.currency
+                AND OLD.date BETWEEN start_date AND date;
+            END
+            """,
+            """
+            CREATE TRIGGER goals_income_update AFTER UPDATE OF category, amount, currency, date ON income
+            BEGIN
+                UPDATE financial_goals SET progress_amount = progress_amount - OLD.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(OLD.category))
+                AND currency = OLD.currency
+                AND OLD.date BETWEEN start_date AND date;
+                UPDATE financial_goals SET progress_amount = progress_amount + NEW.amount
+                WHERE kind = 'income'
+                AND category_key = LOWER(TRIM(NEW.category))
+                AND currency = NEW.currency
+                AND NEW.date BETWEEN start_date AND date;
+            END
+            """,
+        ],
+    ),
+    (
+        7,
+        "Add recurring transaction rules",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS recurring_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL CHECK (kind IN ('expense', 'income')),
+                category TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                currency TEXT NOT NULL DEFAULT 'USD',
+                schedule TEXT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE,
+                next_date DATE NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_recurring_rules_next ON recurring_rules (next_date)",
+        ],
+    ),
+    (
+        8,
+        "Add registry of yearly archive files",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS archives (
+                year INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                expense_rows INTEGER NOT NULL DEFAULT 0,
+                income_rows INTEGER NOT NULL DEFAULT 0,
+                archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    (
+        9,
+        "Add transaction references and duplicate fingerprints",
+        [
+            "ALTER TABLE expenses ADD COLUMN reference TEXT",
+            "ALTER TABLE expenses ADD COLUMN fingerprint INTEGER",
+            "ALTER TABLE income ADD COLUMN reference TEXT",
+            "ALTER TABLE income ADD COLUMN fingerprint INTEGER",
+            "CREATE INDEX IF NOT EXISTS idx_expenses_fingerprint ON expenses (fingerprint)",
+            "CREATE INDEX IF NOT EXISTS idx_income_fingerprint ON income (fingerprint)",
+        ],
+    ),
+    (
+        10,
+        "Clear stale fingerprints when a fingerprinted column is edited",
+        [
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_expenses_fingerprint_update
+            AFTER UPDATE OF category_id, amount, currency, date, reference ON expenses
+            WHEN OLD.fingerprint IS NOT NULL
+            BEGIN
+                UPDATE expenses SET fingerprint = NULL WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_income_fingerprint_update
+            AFTER UPDATE OF category, amount, currency, date, reference ON income
+            WHEN OLD.fingerprint IS NOT NULL
+            BEGIN
+                UPDATE income SET fingerprint = NULL WHERE id = NEW.id;
+            END
+            """,
+        ],
+    ),
+]
+
+
+# Progress of every linked goal recomputed from the ledger in one aggregate query
+# Expense goals total their category in idx_expenses_category_date, income goals
+# total theirs in idx_income_category_date; {goal_filter} narrows it to one goal
+# and {expenses} and {income} name the tables or archive views to read
+GOAL_PROGRESS_SQL = """
+    SELECT g.id AS goal_id, COALESCE(SUM(e.amount), 0) AS progress
+    FROM financial_goals g
+    LEFT JOIN categories c ON g.category_key = c.name
+    LEFT JOIN {expenses} e
+        ON e.category_id = c.id AND e.date BETWEEN g.start_date AND g.date AND e.currency = g.currency
+    WHERE g.kind = 'expense'{goal_filter}
+    GROUP BY g.id
+    UNION ALL
+    SELECT g.id, COALESCE(SUM(i.amount), 0)
+    FROM financial_goals g
+    LEFT JOIN {income} i
+        ON i.category_key = g.category_key AND i.date BETWEEN g.start_date AND g.date AND i.currency = g.currency
+    WHERE g.kind = 'income'{goal_filter}
+    GROUP BY g.id
+"""
+
+
+# Hot queries whose plans must use an index
+INDEXED_QUERIES = {
+    "expenses by category": ("SELECT id, amount, date FROM expenses WHERE category_id = ?", (1,)),
+    "expenses by date range": (
+        "SELECT id, category_id, amount FROM expenses WHERE date BETWEEN ? AND ?",
+        ("2024-01-01", "2024-01-31"),
+    ),
+    "income by category": ("SELECT id, amount, date FROM income WHERE category_key = ?", ("salary",)),
+    "budget by category": ("SELECT budget_amount FROM budgets WHERE category_id = ?", (1,)),
+    "expenses next page": (
+        "SELECT id, amount FROM expenses WHERE (date, id) > (?, ?) ORDER BY date, id LIMIT ?",
+        ("2024-01-01", 0, PAGE_SIZE),
+    ),
+}
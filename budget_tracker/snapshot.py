@@ -0,0 +1,65 @@
+# Columnar snapshots: one .npy file per column plus a manifest
+
+import json
+import pathlib
+
+from .money import DEFAULT_CURRENCY, normalize_currency
+
+
+# Columnar snapshots: one .npy file per column plus a manifest
+# Dates are stored as days since 1970-01-01; unparseable dates get SNAPSHOT_MISSING_DAY
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_MANIFEST = "manifest.json"
+SNAPSHOT_MISSING_DAY = -(2 ** 31)
+
+
+# Function to open a columnar snapshot without reading it into memory
+# Every column comes back as a read-only memory map, so NumPy aggregations
+# work straight on the file pages
+def load_snapshot(directory):
+    import numpy as np
+
+    directory = pathlib.Path(directory)
+    manifest = json.loads((directory / SNAPSHOT_MANIFEST).read_text(encoding="utf-8"))
+    if manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')}.")
+
+    snapshot = {}
+    for table, details in manifest["tables"].items():
+        columns = {"categories": details["categories"], "currencies": details["currencies"]}
+        for column in ("id", "amount", "day", "category", "currency"):
+            columns[column] = np.load(directory / f"{table}.{column}.npy", mmap_mode="r")
+        snapshot[table] = columns
+    return snapshot
+
+
+# Function to total a snapshot table by category and by month for one currency
+# Totals are summed as int64 minor units with np.add.at, so they stay exact
+# Returns {category name: {"YYYY-MM": total}}
+def summarize_snapshot(snapshot, table="expenses", currency=DEFAULT_CURRENCY):
+    import numpy as np
+
+    columns = snapshot[table]
+    currency = normalize_currency(currency)
+    valid = columns["day"] != SNAPSHOT_MISSING_DAY
+    if currency in columns["currencies"]:
+        valid &= columns["currency"] == columns["currencies"].index(currency)
+    else:
+        valid &= False
+    months = columns["day"][valid].astype("datetime64[D]").astype("datetime64[M]")
+    month_numbers = months.astype(np.int64)
+    first_month = int(month_numbers.min()) if len(month_numbers) else 0
+    month_count = int(month_numbers.max()) - first_month + 1 if len(month_numbers) else 0
+    category_count = len(columns["categories"])
+
+    cells = columns["category"][valid].astype(np.int64) * month_count + (month_numbers - first_month)
+    totals = np.zeros(category_count * month_count, dtype=np.int64)
+    np.add.at(totals, cells, columns["amount"][valid])
+    totals = totals.reshape(category_count, month_count)
+
+    summary = {}
+    for code, name in enumerate(columns["categories"]):
+        for month_offset in np.flatnonzero(totals[code]):
+            month = str(np.datetime64(first_month + int(month_offset), "M"))
+            summary.setdefault(name, {})[month] = int(totals[code, month_offset])
+    return summary
@@ -0,0 +1,42 @@
+# Shared fixtures for the budget_tracker tests
+
+import os
+import sys
+
+import pytest
+
+# Import the package from the repository root these tests live in
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_tracker import BudgetRepository
+
+
+# Path of a new ledger file in the test's temporary directory
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / "ledger.db")
+
+
+# Repository on a new ledger file, closed after the test
+@pytest.fixture
+def repository(ledger_path):
+    with BudgetRepository(ledger_path, profile="fast") as repository:
+        yield repository
+
+
+# Slow tests, such as full-size runs and timing checks, only run with --run-slow
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="Also run the tests marked slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: full-size or timing test, only run with --run-slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow test, run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
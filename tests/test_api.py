@@ -0,0 +1,68 @@
+# HTTP API error handling, driven over a real socket
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from budget_tracker import BudgetRepository, LedgerServer
+
+
+# Start a server on the ledger, send one raw request with Connection: close
+# and return everything the server wrote before it closed the connection
+def exchange(ledger_path, request):
+    async def run():
+        server = await LedgerServer(ledger_path, "127.0.0.1", 0).start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(request.encode("latin-1"))
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout=10)
+            writer.close()
+            return response
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def api_ledger(repository, ledger_path):
+    category_id = repository.record_category("groceries")
+    repository.record_expense(category_id, "12.50", "2024-06-01")
+    repository.close()
+    return ledger_path
+
+
+@pytest.mark.parametrize(
+    "query, message",
+    [
+        ("limit=x", "Query parameter 'limit' must be a positive whole number."),
+        ("limit=0", "Query parameter 'limit' must be a positive whole number."),
+        ("from=June", "Query parameter 'from' must be a date in YYYY-MM-DD format."),
+    ],
+)
+def test_bad_query_parameters_get_400(api_ledger, query, message):
+    response = exchange(api_ledger, f"GET /expenses?{query} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 400 ")
+    assert json.loads(body) == {"error": message}
+
+
+def test_listing_streams_rows(api_ledger):
+    response = exchange(api_ledger, "GET /expenses?limit=5&from=2024-01-01 HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 200 ")
+    assert b'"amount": "12.50"' in response
+    assert response.endswith(b"0\r\n\r\n")
+
+
+def test_failed_stream_drops_the_connection(api_ledger, monkeypatch):
+    def broken_page(self, *args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(BudgetRepository, "fetch_ledger_page", broken_page)
+    response = exchange(api_ledger, "GET /expenses HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 200 ")
+    assert response.count(b"HTTP/1.1") == 1
+    assert not response.endswith(b"0\r\n\r\n")
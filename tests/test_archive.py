@@ -0,0 +1,63 @@
+# Archiving closed years into attached per-year ledger files
+
+import sqlite3
+
+import pytest
+
+
+# Add one expense and one income entry in the middle of every year
+def fill_years(repository, first_year, last_year):
+    category_id = repository.record_category("groceries")
+    with repository.write_transaction():
+        for year in range(first_year, last_year + 1):
+            repository.record_expense(category_id, "10.00", f"{year}-06-15")
+            repository.record_income("salary", "100.00", f"{year}-06-15")
+
+
+def test_archive_stops_before_the_attach_limit(repository):
+    fill_years(repository, 2004, 2024)
+    attach_limit = repository.conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+    with pytest.raises(ValueError, match=f"Archive before {2004 + attach_limit} instead"):
+        repository.archive_years(2025)
+    assert repository.list_archives() == []
+    repository.cursor.execute("SELECT COUNT(*) FROM expenses")
+    assert repository.cursor.fetchone()[0] == 21
+
+    assert len(repository.archive_years(2004 + attach_limit)) == attach_limit
+    with pytest.raises(ValueError, match="are in use"):
+        repository.archive_years(2025)
+    repository.cursor.execute(f"SELECT COUNT(*) FROM {repository.history_table('expenses')}")
+    assert repository.cursor.fetchone()[0] == 21
+
+
+# Page through a whole ledger forwards and backwards, as View Expenses and View Income do
+def page_through(repository, kind, page_size):
+    forwards = []
+    rows = repository.fetch_ledger_page(kind, page_size=page_size)
+    while rows:
+        forwards.extend(tuple(row) for row in rows)
+        rows = repository.fetch_ledger_page(kind, after=(rows[-1][3], rows[-1][0]), page_size=page_size)
+
+    backwards = []
+    rows = repository.fetch_ledger_page(kind, before=("9999-12-31", 0), page_size=page_size)
+    while rows:
+        backwards[:0] = [tuple(row) for row in rows]
+        rows = repository.fetch_ledger_page(kind, before=(rows[0][3], rows[0][0]), page_size=page_size)
+    return forwards, backwards
+
+
+@pytest.mark.parametrize("in_memory", [False, True], ids=["sqlite", "memory"])
+def test_pages_include_archived_years(repository, in_memory):
+    fill_years(repository, 2018, 2024)
+    expected = {kind: page_through(repository, kind, 3)[0] for kind in ("expense", "income")}
+    assert len(expected["expense"]) == len(expected["income"]) == 7
+
+    repository.archive_years(2022)
+    if in_memory:
+        pytest.importorskip("numpy")
+        repository.enable_memory_mode()
+    for kind in ("expense", "income"):
+        assert page_through(repository, kind, 3) == (expected[kind], expected[kind])
+        jumped = repository.fetch_ledger_page(kind, after=("2019-01-01", 0), page_size=2)
+        assert [row[3] for row in jumped] == ["2019-06-15", "2020-06-15"]
@@ -0,0 +1,60 @@
+# The category cache must agree with the categories table after every
+# kind of change, including changes made behind its back and rollbacks
+
+import pytest
+
+from budget_tracker import normalize_category_name
+
+
+def test_cache_follows_added_renamed_and_deleted_categories(repository, capsys):
+    repository.add_category("Groceries")
+    groceries_id = repository.get_category_id("groceries")
+    rent_id = repository.record_category("rent")
+    assert repository.get_category_names() == ["groceries", "rent"]
+    assert repository.check_category_cache() == []
+
+    # Rename with plain SQL, then tell the cache
+    repository.cursor.execute("UPDATE categories SET name = ? WHERE id = ?", ("food", groceries_id))
+    repository.commit_writes()
+    repository.invalidate_category_cache()
+    assert repository.get_category_id("groceries") is None
+    assert repository.get_category_id("Food") == groceries_id
+    assert repository.check_category_cache() == []
+
+    repository.record_expense(rent_id, "900", "2024-06-01")
+    repository.delete_expense_category_from_database(" RENT ")
+    assert "deleted successfully" in capsys.readouterr().out
+    assert repository.get_category_id("rent") is None
+    assert repository.get_category_names() == ["food"]
+    assert repository.check_category_cache() == []
+
+    repository.delete_expense_category_from_database("rent")
+    assert "No expense category named 'rent' was found." in capsys.readouterr().out
+    assert repository.check_category_cache() == []
+
+
+def test_cache_is_reloaded_after_a_rollback(repository):
+    repository.record_category("groceries")
+    assert repository.get_category_id("groceries") is not None
+
+    with pytest.raises(RuntimeError):
+        with repository.write_transaction():
+            repository.record_category("travel")
+            repository.cursor.execute("DELETE FROM categories WHERE name = 'groceries'")
+            assert repository.get_category_id("travel") is not None
+            raise RuntimeError("roll the transaction back")
+
+    assert repository.get_category_id("travel") is None
+    assert repository.get_category_id("groceries") is not None
+    assert repository.check_category_cache() == []
+
+
+def test_cache_spots_changes_made_behind_its_back(repository):
+    repository.record_category("groceries")
+    repository.get_category_names()
+    repository.cursor.execute("INSERT INTO categories (name) VALUES ('travel')")
+    repository.commit_writes()
+
+    assert repository.check_category_cache() == [(normalize_category_name("travel"), None, 2)]
+    repository.invalidate_category_cache()
+    assert repository.check_category_cache() == []
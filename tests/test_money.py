@@ -0,0 +1,88 @@
+# Money totals must stay exact: SQLite, the monthly rollup and NumPy all
+# add whole minor units, so each total equals the Python integer sum
+
+import random
+
+import pytest
+
+from budget_tracker import (
+    IMPORT_CHUNK_SIZE,
+    MAX_MINOR_UNITS,
+    format_money,
+    load_snapshot,
+    summarize_snapshot,
+    to_minor_units,
+)
+
+
+ENTRIES = 5000
+
+# Size of the full run, only made with --run-slow
+FULL_SIZE_ENTRIES = 10000000
+
+
+# Fill the ledger with random minor-unit amounts and return their exact sum
+# Rows go in chunks of IMPORT_CHUNK_SIZE so the full-size run stays small in memory
+def fill_random_expenses(repository, entries=ENTRIES, categories=10, seed=2024):
+    generator = random.Random(seed)
+    with repository.write_transaction():
+        category_ids = [repository.record_category(f"category {number}") for number in range(categories)]
+    dates = [f"{year}-{month:02d}-{day:02d}" for year in range(2015, 2025) for month in range(1, 13) for day in range(1, 29)]
+    expected_total = 0
+    for offset in range(0, entries, IMPORT_CHUNK_SIZE):
+        count = min(IMPORT_CHUNK_SIZE, entries - offset)
+        amounts = [int(generator.random() * 99999999) + 1 for _ in range(count)]
+        expected_total += sum(amounts)
+        with repository.write_transaction():
+            repository.cursor.executemany(
+                "INSERT INTO expenses (category_id, amount, currency, date) VALUES (?, ?, 'USD', ?)",
+                zip(generator.choices(category_ids, k=count), amounts, generator.choices(dates, k=count)),
+            )
+    return expected_total
+
+
+# Check every total against the Python integer sum; NumPy totals need NumPy
+def assert_totals_exact(repository, expected_total, snapshot_path=None):
+    repository.cursor.execute("SELECT SUM(amount) FROM expenses")
+    assert repository.cursor.fetchone()[0] == expected_total
+    repository.cursor.execute("SELECT SUM(total) FROM monthly_category_totals")
+    assert repository.cursor.fetchone()[0] == expected_total
+    assert repository.check_monthly_totals() == []
+
+    if snapshot_path is not None:
+        repository.export_snapshot(snapshot_path)
+        snapshot = load_snapshot(snapshot_path)
+        assert int(snapshot["expenses"]["amount"].sum()) == expected_total
+        assert sum(sum(months.values()) for months in summarize_snapshot(snapshot).values()) == expected_total
+
+
+def test_sqlite_and_rollup_totals_are_exact(repository):
+    assert_totals_exact(repository, fill_random_expenses(repository))
+
+
+def test_snapshot_totals_are_exact(repository, tmp_path):
+    pytest.importorskip("numpy")
+    assert_totals_exact(repository, fill_random_expenses(repository), tmp_path / "snapshot")
+
+
+@pytest.mark.slow
+def test_totals_are_exact_over_ten_million_entries(repository, tmp_path):
+    pytest.importorskip("numpy")
+    assert_totals_exact(repository, fill_random_expenses(repository, FULL_SIZE_ENTRIES), tmp_path / "snapshot")
+
+
+def test_decimal_amounts_round_trip():
+    assert to_minor_units("0.1") + to_minor_units("0.2") == to_minor_units("0.3")
+    assert format_money(to_minor_units("1234.56")) == "1234.56"
+    assert to_minor_units("1234", "JPY") == 1234
+
+
+@pytest.mark.parametrize("amount", ["1e30", "1e999", "-1e999", "92233720368547758.08"])
+def test_out_of_range_amounts_raise_value_error(amount):
+    with pytest.raises(ValueError, match="out of range"):
+        to_minor_units(amount)
+
+
+def test_largest_amount_fits():
+    assert to_minor_units(format_money(MAX_MINOR_UNITS)) == MAX_MINOR_UNITS
+    assert to_minor_units("9223372036854775807", "JPY") == MAX_MINOR_UNITS
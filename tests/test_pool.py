@@ -0,0 +1,152 @@
+# LedgerPool under load: reader threads run while several threads queue
+# writes, every write must land exactly once, and reads must scale with threads
+
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from budget_tracker import LedgerPool, format_money
+
+
+WRITES = 2000
+SUBMITTERS = 4
+READERS = 4
+
+
+def test_concurrent_readers_and_writes(repository, ledger_path):
+    repository.record_category("groceries")
+    repository.close()
+
+    with LedgerPool(ledger_path) as pool:
+        stop = threading.Event()
+        problems = []
+        reads = [0] * READERS
+
+        # Each read sees one snapshot: the rollup always matches the expenses
+        # table and the number of expenses never goes down
+        def read_loop(index):
+            reader = pool.reader()
+            last_count = 0
+            while not stop.is_set():
+                reader.cursor.execute(
+                    """
+                    SELECT (SELECT COUNT(*) FROM expenses),
+                           (SELECT COALESCE(SUM(amount), 0) FROM expenses),
+                           (SELECT COALESCE(SUM(total), 0) FROM monthly_category_totals)
+                    """
+                )
+                count, total, rollup_total = reader.cursor.fetchone()
+                if total != rollup_total or count < last_count:
+                    problems.append((count, last_count, total, rollup_total))
+                last_count = count
+                reader.fetch_ledger_page("expense", after=("2024-06-01", 0))
+                reads[index] += 1
+
+        # Amounts 0.01 to WRITES / 100 tell the writes apart
+        def submit_loop(offset, futures):
+            for number in range(offset, WRITES, SUBMITTERS):
+                futures.append(pool.add_expense("groceries", format_money(number + 1), "2024-06-01"))
+
+        futures = [[] for _ in range(SUBMITTERS)]
+        readers = [threading.Thread(target=read_loop, args=(index,)) for index in range(READERS)]
+        submitters = [
+            threading.Thread(target=submit_loop, args=(offset, futures[offset])) for offset in range(SUBMITTERS)
+        ]
+        for thread in readers + submitters:
+            thread.start()
+        for thread in submitters:
+            thread.join()
+        expense_ids = [future.result(timeout=30) for submitted in futures for future in submitted]
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+    assert problems == []
+    assert all(reads)
+    assert len(set(expense_ids)) == WRITES
+
+    with repository:
+        repository.cursor.execute("SELECT amount FROM expenses ORDER BY amount")
+        assert [row[0] for row in repository.cursor.fetchall()] == list(range(1, WRITES + 1))
+        assert repository.check_monthly_totals() == []
+
+
+def test_failing_job_leaves_nothing_behind(repository, ledger_path):
+    repository.record_category("groceries")
+    repository.close()
+
+    def failing_job(writer):
+        writer.record_expense(writer.get_category_id("groceries"), "99.99", "2024-06-01")
+        raise ValueError("job failed after writing")
+
+    # An SQLite error that is not about locking fails only its own job too
+    def broken_sql_job(writer):
+        writer.record_expense(writer.get_category_id("groceries"), "88.88", "2024-06-01")
+        writer.cursor.execute("SELECT * FROM no_such_table")
+
+    with LedgerPool(ledger_path) as pool:
+        before = pool.add_expense("groceries", "1.00", "2024-06-01")
+        failed = pool.submit(failing_job)
+        broken = pool.submit(broken_sql_job)
+        after = pool.add_expense("groceries", "2.00", "2024-06-01")
+        missing = pool.add_expense("no such category", "3.00", "2024-06-01")
+
+        assert before.result(timeout=30) and after.result(timeout=30)
+        with pytest.raises(ValueError, match="job failed"):
+            failed.result(timeout=30)
+        with pytest.raises(sqlite3.OperationalError, match="no such table"):
+            broken.result(timeout=30)
+        with pytest.raises(ValueError, match="does not exist"):
+            missing.result(timeout=30)
+
+    with repository:
+        repository.cursor.execute("SELECT amount FROM expenses ORDER BY amount")
+        assert [row[0] for row in repository.cursor.fetchall()] == [100, 200]
+        assert repository.check_monthly_totals() == []
+
+
+# Reads per second with 1 and with several reader threads while a writer keeps inserting
+# SQLite releases the GIL while it runs a statement, so on several cores the
+# readers must get more done together than one reader alone
+@pytest.mark.slow
+@pytest.mark.skipif((os.cpu_count() or 1) < 2, reason="needs more than one CPU")
+def test_reads_scale_with_reader_threads(repository, ledger_path, seconds=1.0):
+    category_id = repository.record_category("groceries")
+    with repository.write_transaction():
+        for number in range(50000):
+            repository.record_expense(category_id, format_money(number % 5000 + 1), f"2024-{number % 12 + 1:02d}-15")
+    repository.close()
+
+    reads_per_second = {}
+    for thread_count in (1, min(os.cpu_count(), 4)):
+        with LedgerPool(ledger_path) as pool:
+            stop = threading.Event()
+            reads = [0] * thread_count
+
+            def read_loop(index):
+                reader = pool.reader()
+                while not stop.is_set():
+                    reader.cursor.execute("SELECT COUNT(*), SUM(amount) FROM expenses WHERE amount > ?", (index,))
+                    reader.cursor.fetchone()
+                    reads[index] += 1
+
+            def write_loop():
+                while not stop.is_set():
+                    pool.add_expense("groceries", "1.00", "2024-06-01").result(timeout=30)
+
+            threads = [threading.Thread(target=read_loop, args=(index,)) for index in range(thread_count)]
+            threads.append(threading.Thread(target=write_loop))
+            for thread in threads:
+                thread.start()
+            time.sleep(seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        reads_per_second[thread_count] = sum(reads) / seconds
+
+    single, *_, several = reads_per_second.values()
+    print(f"Reads/sec by reader threads: {reads_per_second}")
+    assert several > single * 1.3, reads_per_second
@@ -0,0 +1,40 @@
+# LedgerQuery filters, run through SQLite and the in-memory ledger
+
+import pytest
+
+from budget_tracker import LedgerQuery
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def mixed_currency_ledger(request, repository):
+    category_id = repository.record_category("travel")
+    with repository.write_transaction():
+        for amount, currency in (("12.00", "USD"), ("150.00", "USD"), ("1200", "JPY"), ("12.000", "KWD")):
+            repository.record_expense(category_id, amount, "2024-06-01", currency)
+    if request.param == "memory":
+        pytest.importorskip("numpy")
+        repository.enable_memory_mode()
+    return repository
+
+
+# Returns (amount in minor units, currency) of every matching row
+def amounts(repository, query):
+    return [(row[2], row[4]) for row in repository.run_query(query.order_by("id"))]
+
+
+def test_amount_bounds_without_currency_keep_default_currency_rows(mixed_currency_ledger):
+    query = LedgerQuery("expense").amount_between(10, 20)
+    assert amounts(mixed_currency_ledger, query) == [(1200, "USD")]
+
+
+def test_amount_bounds_use_the_query_currency(mixed_currency_ledger):
+    assert amounts(mixed_currency_ledger, LedgerQuery("expense").in_currency("jpy").amount_between(1000, 2000)) == [
+        (1200, "JPY")
+    ]
+    assert amounts(mixed_currency_ledger, LedgerQuery("expense").amount_between(10, 20).in_currency("KWD")) == [
+        (12000, "KWD")
+    ]
+
+
+def test_queries_without_bounds_keep_every_currency(mixed_currency_ledger):
+    assert len(amounts(mixed_currency_ledger, LedgerQuery("expense"))) == 4
@@ -0,0 +1,30 @@
+# The hot queries listed in INDEXED_QUERIES must be answered from an index
+
+import pytest
+
+from budget_tracker import INDEXED_QUERIES
+
+
+# Add a few categories, budgets and rows so the planner has statistics to use
+def fill_ledger(repository):
+    with repository.write_transaction():
+        for number in range(5):
+            category_id = repository.record_category(f"category {number}")
+            repository.record_budget(category_id, "500")
+            for day in range(1, 29):
+                repository.record_expense(category_id, "12.34", f"2024-01-{day:02d}")
+                repository.record_income("salary", "1000", f"2024-01-{day:02d}")
+    repository.cursor.execute("ANALYZE")
+
+
+@pytest.mark.parametrize("filled", [False, True], ids=["empty", "filled"])
+def test_hot_queries_use_an_index(repository, filled):
+    if filled:
+        fill_ledger(repository)
+
+    results = repository.check_query_plans()
+    assert [name for name, _, _ in results] == list(INDEXED_QUERIES)
+    for name, plan, uses_index in results:
+        assert uses_index, f"{name}: {plan}"
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, f"{name}: {plan}"
+        assert "SCAN" not in plan, f"{name}: {plan}"